@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# /api/live/ (the deck count event stream) is served outside Django's
+# request cycle so an open stream does not hold a worker thread.
+from flashcards.live import LiveUpdatesApp  # noqa: E402
+
+application = LiveUpdatesApp(django_application)
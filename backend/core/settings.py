@@ -53,11 +53,21 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "flashcards.authentication.TimedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
+    # orjson when installed, DRF's own JSON otherwise (see flashcards.fastjson)
+    "DEFAULT_RENDERER_CLASSES": [
+        "flashcards.fastjson.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "flashcards.fastjson.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.CursorPagination",
     "PAGE_SIZE": 40,
@@ -70,11 +80,14 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "flashcards.middleware.RequestTimingMiddleware",
+    "flashcards.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "flashcards.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -166,6 +179,110 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG
 # Allow credentials for CORS
 CORS_ALLOW_CREDENTIALS = True
 
+# "responses" holds per-user collection versions and cached list bodies
+# (flashcards.response_cache). locmem is per process; gunicorn.conf.py
+# switches it to the file-based cache so all workers agree, and
+# django.core.cache.backends.redis.RedisCache works with any Redis-compatible
+# server.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {
+        "BACKEND": os.getenv(
+            "RESPONSE_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("RESPONSE_CACHE_LOCATION", "flashcards-responses"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+RESPONSE_CACHE = {
+    "ALIAS": "responses",
+    "TIMEOUT": 24 * 60 * 60,
+}
+
+# Who may scrape /metrics (flashcards.metrics): Prometheus sending
+# `Authorization: Bearer $METRICS_TOKEN`, or clients connecting from
+# METRICS_ALLOWED_IPS (comma-separated; REMOTE_ADDR, so not behind a proxy
+# on the same host). With neither set the endpoint answers 403.
+METRICS = {
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+    "ALLOWED_IPS": [
+        ip.strip()
+        for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",")
+        if ip.strip()
+    ],
+}
+
+# Per-request timing (flashcards.middleware.RequestTimingMiddleware).
+# SAMPLE_RATE is the fraction of requests instrumented; sampled requests slower
+# than SLOW_REQUEST_MS are logged as warnings with their TOP_SQL most repeated
+# statements. Every sampled request is logged at INFO; set
+# REQUEST_TIMING_LOG_LEVEL=INFO to see them, the default only shows slow ones.
+REQUEST_TIMING = {
+    "ENABLED": os.getenv("REQUEST_TIMING_ENABLED", "True") == "True",
+    "SAMPLE_RATE": float(os.getenv("REQUEST_TIMING_SAMPLE_RATE", "1.0")),
+    "SLOW_REQUEST_MS": float(os.getenv("REQUEST_TIMING_SLOW_MS", "500")),
+    "TOP_SQL": 5,
+}
+
+# Sampling profiler (flashcards.profiling). Collapsed-stack files land in
+# OUTPUT_DIR; `kill -USR2 <pid>` samples a worker for SIGNAL_SECONDS.
+PROFILING = {
+    "OUTPUT_DIR": os.getenv("PROFILING_OUTPUT_DIR", BASE_DIR / "data" / "profiles"),
+    "DEFAULT_HZ": 100,
+    "MAX_SECONDS": 60,
+    "SIGNAL_ENABLED": os.getenv("PROFILING_SIGNAL_ENABLED", "True") == "True",
+    "SIGNAL_SECONDS": 30,
+}
+
+# Process-local Starter Deck cache (flashcards.starter). Workers compare the
+# token in VERSION_FILE on every request; import_anki and starter card edits
+# replace it.
+STARTER_DECK = {
+    "VERSION_FILE": os.getenv(
+        "STARTER_DECK_VERSION_FILE", BASE_DIR / "data" / "starter_deck.version"
+    ),
+    "MAX_PAGES": 512,
+}
+
+# Deck count event stream (flashcards.live), served by core/asgi.py. With
+# BROKER_DIR set, workers on this host relay changes to each other through
+# Unix sockets in that directory.
+LIVE_UPDATES = {
+    "PATH": "/api/live/",
+    "BROKER_DIR": os.getenv("LIVE_BROKER_DIR"),
+    "HEARTBEAT_SECONDS": 15,
+}
+
+# Expression indexes over Card.data (flashcards.datafields) for the fields card
+# types declare in indexed_fields; only the MAX_INDEXES fields declared by the
+# most owners get one, each owner declaring at most MAX_PER_OWNER. Indexes are
+# created by migrate and `manage.py ensure_data_indexes` (run it from cron).
+DATA_FIELDS = {
+    "MAX_INDEXES": 16,
+    "MAX_PER_OWNER": 4,
+}
+
+# Deck and card type deletes (flashcards.deletion): chunked raw DELETEs of
+# CHUNK_SIZE rows. With SOFT_DELETE the request only hides the rows and a
+# background thread purges them (gunicorn.conf.py turns it on).
+DELETION = {
+    "CHUNK_SIZE": 2000,
+    "SOFT_DELETE": os.getenv("DELETION_SOFT_DELETE", "False") == "True",
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "flashcards.timing": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_TIMING_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
 # DATABASES = {
 #     "default": dj_database_url.config(default=os.getenv("DATABASE_URL"))
 # }
@@ -27,6 +27,9 @@ from flashcards.views import (
     CardGenerationAPIView,
     MeView,
     CardTypeViewSet,
+    ProfileView,
+    DailyActivityView,
+    metrics_view,
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -54,6 +57,9 @@ urlpatterns = [
     path("api/", include(router.urls)),
     path("api/generate_card/", CardGenerationAPIView.as_view(), name="generate-card"),
     path("api/me/", MeView.as_view(), name="me"),
+    path("api/activity/", DailyActivityView.as_view(), name="activity"),
+    path("api/admin/profile/", ProfileView.as_view(), name="admin-profile"),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 from django.urls import path, include
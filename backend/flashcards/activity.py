@@ -0,0 +1,93 @@
+"""
+Daily review rollups (DailyUserActivity).
+
+``record_review`` is an atomic upsert: an UPDATE with F() increments, falling
+back to an INSERT for the first review of the day and to the UPDATE again if
+a concurrent request inserted the row first.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DailyUserActivity, UserCard
+
+RATING_COUNTERS = {
+    "again": "again_count",
+    "hard": "hard_count",
+    "good": "good_count",
+    "easy": "easy_count",
+}
+# A single review longer than this is a tab left open, not study time.
+MAX_TIME_SPENT_MS = 30 * 60 * 1000
+
+
+def record_review(user_id, rating, first_review=False, time_spent_ms=0, day=None):
+    day = day or timezone.localdate()
+    time_spent_ms = min(max(int(time_spent_ms or 0), 0), MAX_TIME_SPENT_MS)
+    increments = {
+        "reviews": 1,
+        RATING_COUNTERS[rating]: 1,
+        "new_introduced": 1 if first_review else 0,
+        "time_spent_ms": time_spent_ms,
+    }
+    updates = {field: F(field) + n for field, n in increments.items() if n}
+    rows = DailyUserActivity.objects.filter(user_id=user_id, date=day)
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyUserActivity.objects.create(user_id=user_id, date=day, **increments)
+    except IntegrityError:
+        rows.update(**updates)
+
+
+def activity_range(user, start, end):
+    """Rows for ``start``..``end`` inclusive, in date order (one range scan)."""
+    return DailyUserActivity.objects.filter(
+        user=user, date__gte=start, date__lte=end
+    ).order_by("date")
+
+
+def rebuild_from_usercards(user_ids=None, batch_size=2000, force=False):
+    """
+    Rebuild rollups from scheduling state. Only each card's latest review is
+    recoverable: it happened ``interval`` days before ``due_date`` with rating
+    ``last_rating``, and was the card's first review if ``repetitions == 1``.
+    Time spent is not recoverable and is left at zero.
+
+    That is lossy, so only days without a row are filled in; ``force``
+    replaces the existing rows, accurate counts included, instead. Returns
+    the number of rows written.
+    """
+    usercards = UserCard.objects.exclude(last_rating="")
+    existing = DailyUserActivity.objects.all()
+    if user_ids is not None:
+        usercards = usercards.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    rows = defaultdict(lambda: DailyUserActivity())
+    for user_id, due_date, interval, rating, repetitions in usercards.values_list(
+        "user_id", "due_date", "interval", "last_rating", "repetitions"
+    ).iterator(chunk_size=batch_size):
+        if rating not in RATING_COUNTERS:
+            continue
+        day = timezone.localdate(due_date - timedelta(days=interval))
+        row = rows[(user_id, day)]
+        row.user_id, row.date = user_id, day
+        row.reviews += 1
+        setattr(row, RATING_COUNTERS[rating], getattr(row, RATING_COUNTERS[rating]) + 1)
+        if repetitions == 1:
+            row.new_introduced += 1
+
+    with transaction.atomic():
+        if force:
+            existing.delete()
+        else:
+            kept = set(existing.values_list("user_id", "date"))
+            rows = {key: row for key, row in rows.items() if key not in kept}
+        DailyUserActivity.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
@@ -2,8 +2,14 @@ from django.apps import AppConfig
 
 
 class FlashcardsConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'flashcards'
-    
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "flashcards"
+
     def ready(self):
         import flashcards.signals
+        from flashcards import live, profiling, stats
+
+        stats.deck_stats_changed.connect(live.notify, dispatch_uid="live-notify")
+
+        if profiling.profiling_setting("SIGNAL_ENABLED"):
+            profiling.install_signal_handler()
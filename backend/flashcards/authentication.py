@@ -0,0 +1,11 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .instrumentation import span
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reports its time in the "auth" span."""
+
+    def authenticate(self, request):
+        with span("auth"):
+            return super().authenticate(request)
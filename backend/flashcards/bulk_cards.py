@@ -0,0 +1,188 @@
+"""
+Bulk edits of a selection of cards: move them to another deck, add or
+remove tags (deletes are ``deletion.purge_cards``).
+
+The selection is read once into a list of ids, so that statements which
+change what a filter matches (retagging, moving) don't change the selection
+halfway, and then every statement runs over chunks of those ids:
+
+* move: one UPDATE of ``deck_id``; the cards' UserCards move with them.
+* add_tags: one UPDATE appending the missing tags to ``Card.tags`` and one
+  INSERT … SELECT of the missing tag index links.
+* remove_tags: one UPDATE cutting the tags out of ``Card.tags`` and one
+  DELETE of their links.
+
+Updates send no signals, so the stats rebuild and cache invalidation happen
+here; the search index follows through its triggers.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Exists, OuterRef, Value, When
+from django.db.models.functions import Concat, Length, Replace, Substr
+from django.db.models.lookups import GreaterThan
+from rest_framework.exceptions import ValidationError
+
+from . import facets, response_cache, starter, stats
+from .filters import tag_q
+
+CHUNK_SIZE = 2000
+OPS = ("move", "add_tags", "remove_tags", "delete")
+# keys of a ``filter`` selection besides ``data.<field>``
+FILTER_KEYS = ("deck", "tags", "tags_mode", "difficulties")
+
+
+def _selection(cards):
+    """``(card_ids, deck_ids)`` of the ``cards`` queryset."""
+    rows = list(cards.order_by("id").values_list("id", "deck_id"))
+    return [card_id for card_id, _ in rows], {deck_id for _, deck_id in rows}
+
+
+def _chunks(ids, chunk_size):
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start : start + chunk_size]
+
+
+def _changed(deck_ids):
+    from .models import Deck
+
+    facets.bump_decks(deck_ids)
+    response_cache.bump(
+        set(Deck.all_objects.filter(id__in=deck_ids).values_list("owner_id", flat=True))
+    )
+    if starter.starter_deck_id() in deck_ids:
+        starter.invalidate()
+
+
+def incompatible_types(cards, target):
+    """
+    The card types of ``cards`` whose fields differ from those of the
+    ``target`` deck's type: their cards' data would not validate there.
+    """
+    from .models import CardType
+
+    fields = set(target.card_type.fields or [])
+    types = CardType.all_objects.filter(
+        id__in=cards.order_by().values("deck__card_type_id")
+    ).exclude(id=target.card_type_id)
+    return [t for t in types if set(t.fields or []) != fields]
+
+
+def move_cards(cards, target, chunk_size=CHUNK_SIZE):
+    """
+    Move ``cards`` into the ``target`` deck (check ``incompatible_types``
+    first). Returns the number of cards moved.
+    """
+    from .models import Card
+
+    with transaction.atomic():
+        card_ids, deck_ids = _selection(cards.exclude(deck_id=target.id))
+        for ids in _chunks(card_ids, chunk_size):
+            Card.objects.filter(id__in=ids).update(deck=target)
+        if card_ids:
+            # all users' UserCards moved with the cards
+            stats.rebuild(deck_ids=[*deck_ids, target.id])
+    if card_ids:
+        _changed({*deck_ids, target.id})
+    return len(card_ids)
+
+
+def _has_tag(name):
+    from .models import Card
+
+    return Exists(
+        Card.tag_index.through.objects.filter(card_id=OuterRef("pk"), tag__name=name)
+    )
+
+
+def add_tags(cards, tags, chunk_size=CHUNK_SIZE):
+    """
+    Add the normalized ``tags`` to every card of ``cards`` missing any of
+    them. Returns the number of cards changed.
+    """
+    from .models import Card, Tag
+
+    max_length = Card._meta.get_field("tags").max_length
+    appended = Concat(
+        "tags",
+        *[
+            Case(
+                When(_has_tag(name), then=Value("")),
+                default=Value(f",{name}"),
+                output_field=CharField(),
+            )
+            for name in tags
+        ],
+        output_field=CharField(),
+    )
+    # a card without tags gets no leading comma
+    new_tags = Case(
+        When(tags="", then=Substr(appended, 2)),
+        default=appended,
+        output_field=CharField(),
+    )
+    with transaction.atomic():
+        lacking = cards.exclude(tag_q(Card, tags, "all"))
+        if lacking.filter(GreaterThan(Length(new_tags), max_length)).exists():
+            raise ValidationError(
+                {"tags": f"Card tags would be longer than {max_length} characters."}
+            )
+        card_ids, deck_ids = _selection(lacking)
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in tags], ignore_conflicts=True
+        )
+        tag_ids = list(Tag.objects.filter(name__in=tags).values_list("id", flat=True))
+        for ids in _chunks(card_ids, chunk_size):
+            Card.objects.filter(id__in=ids).update(tags=new_tags)
+            _insert_links(ids, tag_ids)
+    if card_ids:
+        _changed(deck_ids)
+    return len(card_ids)
+
+
+def _insert_links(card_ids, tag_ids):
+    """Link every card of ``card_ids`` to every tag of ``tag_ids`` it lacks."""
+    from .models import Card, Tag
+
+    table = Card.tag_index.through._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (card_id, tag_id)
+            SELECT c.id, t.id
+            FROM {Card._meta.db_table} AS c, {Tag._meta.db_table} AS t
+            WHERE c.id IN ({", ".join(["%s"] * len(card_ids))})
+              AND t.id IN ({", ".join(["%s"] * len(tag_ids))})
+              AND NOT EXISTS (
+                  SELECT 1 FROM {table} AS l
+                  WHERE l.card_id = c.id AND l.tag_id = t.id
+              )
+            """,
+            [*card_ids, *tag_ids],
+        )
+
+
+def remove_tags(cards, tags, chunk_size=CHUNK_SIZE):
+    """
+    Remove the normalized ``tags`` from every card of ``cards`` carrying
+    any of them. Returns the number of cards changed.
+    """
+    from .models import Card
+
+    # ",a,b,c," with each tag replaced by a single comma, e.g. ",a,c,"
+    cut = Concat(Value(","), "tags", Value(","), output_field=CharField())
+    for name in tags:
+        cut = Replace(cut, Value(f",{name},"), Value(","))
+    new_tags = Case(
+        When(GreaterThan(Length(cut), 1), then=Substr(cut, 2, Length(cut) - 2)),
+        default=Value(""),
+        output_field=CharField(),
+    )
+    with transaction.atomic():
+        card_ids, deck_ids = _selection(cards.filter(tag_q(Card, tags, "any")))
+        links = Card.tag_index.through.objects.filter(tag__name__in=tags)
+        for ids in _chunks(card_ids, chunk_size):
+            Card.objects.filter(id__in=ids).update(tags=new_tags)
+            links.filter(card_id__in=ids).delete()
+    if card_ids:
+        _changed(deck_ids)
+    return len(card_ids)
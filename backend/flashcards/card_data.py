@@ -0,0 +1,150 @@
+"""
+Reshaping Card.data after a CardType's fields change.
+
+Every card of the type ends up with exactly the type's fields, in order:
+missing ones are added as "", others are dropped, and ``renames`` carries
+values over from an old key. The work is set-based: one UPDATE per chunk of
+card ids, building the new object in SQL (``json_object`` on SQLite,
+``jsonb_build_object`` on PostgreSQL) and touching only cards whose keys
+differ. Other databases, and SQLite with a field name containing ``"``,
+stream the cards with ``iterator()`` and ``bulk_update`` them per chunk.
+
+All chunks run in one transaction. UPDATEs send no signals, so the affected
+decks' caches are invalidated here.
+"""
+
+from django.db import connection, transaction
+
+from . import facets, response_cache, starter
+
+CHUNK_SIZE = 2000
+
+
+def new_data(data, fields, renames=None):
+    """The reshaped copy of one card's ``data``."""
+    data = data or {}
+    old = {new: old for old, new in (renames or {}).items()}
+    return {f: data.get(f, data.get(old.get(f), "")) for f in fields}
+
+
+def _sources(fields, renames):
+    old = {new: old for old, new in (renames or {}).items()}
+    return [(f, old.get(f, f)) for f in fields]
+
+
+def _sqlite_update(fields, renames):
+    """``(set_sql, set_params, where_sql, where_params)`` for SQLite."""
+
+    def path(key):
+        return f'$."{key}"'
+
+    pairs, params = [], []
+    for field, source in _sources(fields, renames):
+        pairs.append("%s, json(coalesce(data -> %s, data -> %s, '\"\"'))")
+        params += [field, path(field), path(source)]
+    set_sql = f"json_object({', '.join(pairs)})"
+    # rows with a field missing or a key that is not a field
+    missing = " OR ".join(["json_type(data, %s) IS NULL"] * len(fields))
+    extra = (
+        "EXISTS (SELECT 1 FROM json_each(data) WHERE key NOT IN "
+        f"({', '.join(['%s'] * len(fields))}))"
+    )
+    where_sql = f"({missing} OR {extra})"
+    return set_sql, params, where_sql, [path(f) for f in fields] + list(fields)
+
+
+def _postgresql_update(fields, renames):
+    pairs, params = [], []
+    for field, source in _sources(fields, renames):
+        pairs.append("%s, coalesce(data -> %s, data -> %s, '\"\"'::jsonb)")
+        params += [field, field, source]
+    set_sql = f"jsonb_build_object({', '.join(pairs)})"
+    where_sql = "(NOT (data ?& %s) OR (data - %s) <> '{}'::jsonb)"
+    return set_sql, params, where_sql, [list(fields), list(fields)]
+
+
+def _set_based(fields, renames):
+    if connection.vendor == "postgresql":
+        return _postgresql_update(fields, renames)
+    if connection.vendor == "sqlite" and not any(
+        '"' in f for f in [*fields, *(renames or {})]
+    ):
+        return _sqlite_update(fields, renames)
+    return None
+
+
+def reshape_cards(card_type, renames=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Reshape the data of every card of ``card_type`` to its current fields.
+    ``renames`` maps old field names to new ones. ``progress(done, total)``
+    is called after each chunk. Returns the number of cards changed.
+    """
+    from .models import Card
+
+    fields = list(card_type.fields or [])
+    cards = Card.objects.filter(deck__card_type=card_type)
+    total = cards.count()
+    deck_ids = list(card_type.decks.values_list("id", flat=True))
+    statement = _set_based(fields, renames) if fields else None
+    changed = done = 0
+    last_id = 0
+    with transaction.atomic():
+        while True:
+            ids = list(
+                cards.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            if statement is not None:
+                changed += _update_chunk(card_type.id, ids[0], ids[-1], *statement)
+            else:
+                chunk = cards.filter(id__gte=ids[0], id__lte=ids[-1])
+                changed += _bulk_update_chunk(chunk, fields, renames)
+            last_id = ids[-1]
+            done += len(ids)
+            if progress:
+                progress(done, total)
+        if changed:
+            _changed(card_type, deck_ids)
+    return changed
+
+
+def _update_chunk(
+    card_type_id, first_id, last_id, set_sql, set_params, where_sql, where_params
+):
+    from .models import Card, Deck
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Card._meta.db_table} SET data = {set_sql}
+            WHERE id BETWEEN %s AND %s
+              AND deck_id IN (SELECT id FROM {Deck._meta.db_table} WHERE card_type_id = %s)
+              AND {where_sql}
+            """,
+            [*set_params, first_id, last_id, card_type_id, *where_params],
+        )
+        return cursor.rowcount
+
+
+def _bulk_update_chunk(chunk, fields, renames):
+    from .models import Card
+
+    updated = []
+    for card in chunk.only("id", "data").iterator(chunk_size=CHUNK_SIZE):
+        data = new_data(card.data, fields, renames)
+        if data != card.data:
+            card.data = data
+            updated.append(card)
+    Card.objects.bulk_update(updated, ["data"])
+    return len(updated)
+
+
+def _changed(card_type, deck_ids):
+    facets.bump_decks(deck_ids)
+    response_cache.bump([card_type.owner_id])
+    starter_deck_id = starter.starter_deck_id()
+    if starter_deck_id in deck_ids:
+        starter.invalidate()
@@ -0,0 +1,174 @@
+"""
+Set-based deck copies.
+
+``clone_deck`` copies a deck into a user's collection with a fixed number of
+statements however large it is: the cards with one INSERT … SELECT, then
+their tag links and the user's UserCards with one INSERT … SELECT each,
+matching new cards to old ones by position (row_number() over the ids,
+which the card INSERT assigns in source id order). Inserts send no signals,
+so the stats rebuild and cache invalidation happen here; the search index
+follows through its triggers.
+"""
+
+from django.db import connection, transaction
+
+from . import response_cache, stats
+
+CARD_COLUMNS = [
+    "data",
+    "problem",
+    "difficulty",
+    "category",
+    "hint",
+    "pseudo",
+    "solution",
+    "complexity",
+    "tags",
+    "random_key",
+]
+PROGRESS_COLUMNS = [
+    "ease_factor",
+    "interval",
+    "repetitions",
+    "due_date",
+    "last_rating",
+    "status",
+]
+
+
+def unique_name(queryset, name, max_length=100):
+    """``name``, or ``name (copy)``, ``name (copy 2)``, … unused in ``queryset``."""
+    taken = set(queryset.values_list("name", flat=True))
+    candidate, n = name, 1
+    while candidate in taken:
+        suffix = " (copy)" if n == 1 else f" (copy {n})"
+        candidate = name[: max_length - len(suffix)] + suffix
+        n += 1
+    return candidate
+
+
+def clone_card_type(card_type, owner, reuse=True):
+    """
+    The owner's card type with the same name and fields (with ``reuse``), or
+    a new copy of ``card_type``.
+    """
+    from .models import CardType
+
+    mine = CardType.objects.filter(owner=owner)
+    same = mine.filter(name=card_type.name).first() if reuse else None
+    if same is not None and same.fields == card_type.fields:
+        return same
+    return CardType.objects.create(
+        owner=owner,
+        name=unique_name(mine, card_type.name),
+        description=card_type.description,
+        fields=card_type.fields,
+        layout=card_type.layout,
+        indexed_fields=card_type.indexed_fields,
+    )
+
+
+def _matched(source_id, target_id):
+    """SQL yielding (old_id, new_id) pairs of the source and cloned cards."""
+    from .models import Card
+
+    table = Card._meta.db_table
+    return (
+        f"""
+        SELECT src.id AS old_id, dst.id AS new_id
+        FROM (SELECT id, row_number() OVER (ORDER BY id) AS n
+              FROM {table} WHERE deck_id = %s) AS src
+        JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n
+              FROM {table} WHERE deck_id = %s) AS dst ON dst.n = src.n
+        """,
+        [source_id, target_id],
+    )
+
+
+def _progress(copy_progress):
+    """SELECT list and params for the scheduling columns of the new UserCards."""
+    from .models import UserCard
+
+    fresh = {
+        f.name: f.get_default()
+        for f in UserCard._meta.get_fields()
+        if f.name in PROGRESS_COLUMNS
+    }
+    fresh["due_date"] = connection.ops.adapt_datetimefield_value(fresh["due_date"])
+    # the LEFT JOIN on the owner's UserCards finds nothing without copy_progress
+    template = "coalesce(uc.{}, %s)" if copy_progress else "%s"
+    return (
+        ", ".join(template.format(c) for c in PROGRESS_COLUMNS),
+        [fresh[c] for c in PROGRESS_COLUMNS],
+    )
+
+
+def clone_deck(deck, owner, name=None, copy_card_type=None, copy_progress=False):
+    """
+    Copy ``deck`` with all of its cards into ``owner``'s collection and give
+    ``owner`` a UserCard for every copied card. ``copy_card_type`` copies
+    the card type as well, into a new type; a type that isn't ``owner``'s is
+    always copied, as a deck may only use its owner's types, but then an
+    earlier copy of it is reused. ``copy_progress`` carries over
+    ``owner``'s scheduling state of the original cards instead of starting
+    them as new. Returns the new deck.
+    """
+    from .models import Card, Deck, UserCard
+
+    reuse_card_type = not copy_card_type
+    if deck.card_type.owner_id != owner.id:
+        copy_card_type = True
+    card_table = Card._meta.db_table
+    tag_table = Card.tag_index.through._meta.db_table
+    usercard_table = UserCard._meta.db_table
+    columns = ", ".join(CARD_COLUMNS)
+
+    with transaction.atomic():
+        card_type = (
+            clone_card_type(deck.card_type, owner, reuse=reuse_card_type)
+            if copy_card_type
+            else deck.card_type
+        )
+        clone = Deck.objects.create(
+            name=unique_name(
+                Deck.all_objects.filter(owner=owner, card_type=card_type),
+                name or deck.name,
+            ),
+            owner=owner,
+            card_type=card_type,
+            description=deck.description,
+            tags=deck.tags,
+        )
+        matched, matched_params = _matched(deck.id, clone.id)
+        progress, progress_params = _progress(copy_progress)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {card_table} (deck_id, {columns})
+                SELECT %s, {columns} FROM {card_table}
+                WHERE deck_id = %s ORDER BY id
+                """,
+                [clone.id, deck.id],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {tag_table} (card_id, tag_id)
+                SELECT m.new_id, t.tag_id
+                FROM ({matched}) AS m JOIN {tag_table} AS t ON t.card_id = m.old_id
+                """,
+                matched_params,
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {usercard_table}
+                    (user_id, card_id, {", ".join(PROGRESS_COLUMNS)})
+                SELECT %s, m.new_id, {progress}
+                FROM ({matched}) AS m
+                LEFT JOIN {usercard_table} AS uc
+                    ON uc.card_id = m.old_id AND uc.user_id = %s
+                """,
+                [owner.id, *progress_params, *matched_params, owner.id],
+            )
+        stats.rebuild(user_ids=[owner.id], deck_ids=[clone.id])
+        response_cache.bump([owner.id])
+    return clone
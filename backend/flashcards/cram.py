@@ -0,0 +1,47 @@
+"""
+Random "cram" sampling without ORDER BY RANDOM().
+
+Every card carries a uniform ``random_key`` that is indexed together with its
+deck. A cram session derives a start point from its seed and walks the deck
+in key order from there, wrapping around at 1.0, so each page is an index
+range scan of ``n`` rows however large the deck is. The key of the last card
+served is the cursor for the next page; that is how cards already served in
+the session are excluded, and once the walk is back at the start point the
+deck is exhausted.
+"""
+
+import random
+
+from django.db.models import Q
+
+MAX_PAGE_SIZE = 200
+
+
+def new_seed():
+    return str(random.randrange(2**31))
+
+
+def start_key(seed):
+    return random.Random(seed).random()
+
+
+def remaining_ranges(start, after=None, field="card__random_key"):
+    """Key ranges still to be served, in walk order."""
+    if after is None:
+        return [Q(**{f"{field}__gte": start}), Q(**{f"{field}__lt": start})]
+    if after >= start:
+        return [Q(**{f"{field}__gt": after}), Q(**{f"{field}__lt": start})]
+    return [Q(**{f"{field}__gt": after, f"{field}__lt": start})]
+
+
+def sample(queryset, seed, n, after=None, field="card__random_key"):
+    """
+    The next ``n`` rows of ``queryset`` in the session's walk order after the
+    key ``after`` (None for the first page), as a list.
+    """
+    rows = []
+    for key_range in remaining_ranges(start_key(seed), after, field):
+        if len(rows) >= n:
+            break
+        rows.extend(queryset.filter(key_range).order_by(field)[: n - len(rows)])
+    return rows
@@ -0,0 +1,180 @@
+"""
+Indexed filter and sort columns derived from Card.data.
+
+A CardType lists in ``indexed_fields`` the fields of its cards that can be
+filtered and sorted on (the Default type declares difficulty and category).
+The fields declared by the most owners get an expression index on
+``(lower(data->>field), deck_id)``, created and dropped by
+``ensure_indexes``: after every migrate (SQLite drops indexes it does not
+know about when a migration rebuilds flashcards_card) and from the
+``ensure_data_indexes`` command, run periodically. Saving a card type does
+no index work; its new fields are filterable right away, by a scan until
+the next run. Each owner may declare at most MAX_PER_OWNER fields across
+their card types, and a field counts once per owner, so no one user decides
+which fields of the shared table get the MAX_INDEXES indexes. ``DataValue`` is the indexed expression; queries have to
+use it as-is for the database to pick the index, so the JSON path is
+inlined rather than passed as a parameter.
+
+``?data.<field>=a,b`` on the card list matches any of the values,
+case-insensitively, and ``?ordering=data.<field>`` (or ``-data.<field>``)
+sorts by it. Fields nobody declared can be filtered on too, but that scans
+the cards.
+"""
+
+import hashlib
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import F, Func, Q, TextField
+from django.db.models.lookups import In
+from rest_framework.exceptions import ValidationError
+
+DATA_FIELDS_DEFAULTS = {
+    "MAX_INDEXES": 16,
+    "MAX_PER_OWNER": 4,
+}
+INDEX_PREFIX = "card_data_"
+PARAM_PREFIX = "data."
+SORT_ALIAS = "data_sort"
+# inlined into SQL, so no quotes, backslashes or "%"
+_FIELD = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_ -]{0,63}$")
+
+
+def data_fields_setting(name):
+    return getattr(settings, "DATA_FIELDS", {}).get(name, DATA_FIELDS_DEFAULTS[name])
+
+
+def valid_field(name):
+    return isinstance(name, str) and bool(_FIELD.match(name)) and "__" not in name
+
+
+class DataValue(Func):
+    """``data ->> field``, lowercased, '' when missing."""
+
+    template = "COALESCE(LOWER(JSON_EXTRACT(%(expressions)s, '$.\"%(key)s\"')), '')"
+    output_field = TextField()
+
+    def __init__(self, field, prefix=""):
+        if not valid_field(field):
+            raise ValueError(f"Invalid data field name: {field!r}")
+        super().__init__(F(f"{prefix}data"), key=field)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="COALESCE(LOWER(%(expressions)s ->> '%(key)s'), '')",
+            **extra_context,
+        )
+
+
+def data_q(field, values, prefix=""):
+    """Q for cards whose ``field`` is any of ``values`` (ignoring case)."""
+    return Q(In(DataValue(field, prefix), [str(v).lower() for v in values]))
+
+
+def filter_params(params):
+    """
+    ``[(field, values)]`` for the ``data.<field>`` query parameters, or the
+    keys of a JSON filter object.
+    """
+    from .filters import split_param
+
+    filters = []
+    for key in params:
+        if not key.startswith(PARAM_PREFIX):
+            continue
+        field = key[len(PARAM_PREFIX) :]
+        if not valid_field(field):
+            raise ValidationError({key: "Not a valid field name."})
+        values = params.getlist(key) if hasattr(params, "getlist") else params[key]
+        if not isinstance(values, list):
+            values = [values]
+        values = split_param(",".join(str(v) for v in values), lower=True)
+        if values:
+            filters.append((field, values))
+    return filters
+
+
+def sort_param(value):
+    """``(field, descending)`` for ``ordering=[-]data.<field>``, else None."""
+    value = value or ""
+    descending = value.startswith("-")
+    value = value.lstrip("-")
+    if not value.startswith(PARAM_PREFIX):
+        return None
+    field = value[len(PARAM_PREFIX) :]
+    if not valid_field(field):
+        raise ValidationError({"ordering": "Not a valid field name."})
+    return field, descending
+
+
+def index_name(field):
+    return INDEX_PREFIX + hashlib.sha1(field.encode()).hexdigest()[:16]
+
+
+def index_for(field):
+    return models.Index(DataValue(field), F("deck"), name=index_name(field))
+
+
+def owner_fields(owner, exclude=None):
+    """The fields ``owner`` declares in ``indexed_fields`` of their card types."""
+    from .models import CardType
+
+    types = CardType.objects.filter(owner=owner)
+    if exclude is not None:
+        types = types.exclude(pk=exclude.pk)
+    return {
+        f
+        for fields in types.values_list("indexed_fields", flat=True)
+        for f in fields or ()
+    }
+
+
+def declared_fields(using="default"):
+    """The ``indexed_fields`` declared by the most owners, up to MAX_INDEXES."""
+    from .models import CardType
+
+    declared = set()
+    for owner_id, fields in CardType.objects.using(using).values_list(
+        "owner_id", "indexed_fields"
+    ):
+        declared.update((owner_id, f) for f in fields or () if valid_field(f))
+    counts = Counter(f for _, f in declared)
+    ranked = sorted(counts, key=lambda f: (-counts[f], f))
+    return ranked[: data_fields_setting("MAX_INDEXES")]
+
+
+def existing_indexes(conn=connection):
+    from .models import Card
+
+    with conn.cursor() as cursor:
+        constraints = conn.introspection.get_constraints(cursor, Card._meta.db_table)
+    return {name for name in constraints if name.startswith(INDEX_PREFIX)}
+
+
+def ensure_indexes(conn=connection):
+    """
+    Create the indexes of declared fields that are missing and drop those
+    of fields no card type declares any more. Returns ``(created, dropped)``
+    index names.
+    """
+    from .models import Card
+
+    wanted = {index_name(f): f for f in declared_fields(conn.alias)}
+    existing = existing_indexes(conn)
+    created = sorted(set(wanted) - existing)
+    dropped = sorted(existing - set(wanted))
+    if not created and not dropped:
+        return [], []
+    # plain statements rather than `with schema_editor()`, which SQLite
+    # refuses inside a transaction
+    editor = conn.schema_editor(collect_sql=True)
+    with conn.cursor() as cursor:
+        for name in dropped:
+            cursor.execute(f"DROP INDEX IF EXISTS {conn.ops.quote_name(name)}")
+        for name in created:
+            cursor.execute(str(index_for(wanted[name]).create_sql(Card, editor)))
+    return created, dropped
@@ -0,0 +1,196 @@
+"""
+Fast deletes of decks and card types.
+
+``Deck.delete()`` makes Django's collector load every Card and UserCard of
+the deck to cascade, which for a large deck means gigabytes of objects and
+minutes of locks. ``purge_decks`` deletes in dependency order with raw
+DELETEs instead: UserCards in chunks of ids, then the cards (with their tag
+links) in chunks, then the stats, tag links and deck rows. Every chunk is
+its own short transaction, and purging is idempotent, so an interrupted
+purge is simply run again. The search index follows through its triggers.
+The signal handlers the cascade would have run are replaced by one call
+each at the end: stats rebuild (which notifies live streams), facet,
+response and Starter Deck cache invalidation. ``purge_cards`` deletes a
+selection of cards the same way, but in one transaction.
+
+With DELETION["SOFT_DELETE"] the request only marks the rows (``deleted_at``,
+hidden by the default managers) and frees their names; the purge runs in a
+background thread once the transaction commits. ``purge_deleted`` (also a
+management command) finishes whatever a restarted worker left behind.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from . import facets, response_cache, starter, stats
+
+DELETION_DEFAULTS = {
+    "CHUNK_SIZE": 2000,
+    "SOFT_DELETE": False,
+}
+
+logger = logging.getLogger("flashcards.deletion")
+
+
+def deletion_setting(name):
+    return getattr(settings, "DELETION", {}).get(name, DELETION_DEFAULTS[name])
+
+
+def _raw_delete(queryset):
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def _chunks(queryset, chunk_size):
+    """Successive lists of up to ``chunk_size`` ids of ``queryset``."""
+    while True:
+        ids = list(queryset.order_by().values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+
+
+def purge_decks(deck_ids, chunk_size=None):
+    """
+    Delete the decks ``deck_ids`` with everything that depends on them.
+    Returns the number of cards deleted.
+    """
+    from .models import Card, Deck, UserCard
+
+    chunk_size = chunk_size or deletion_setting("CHUNK_SIZE")
+    deck_ids = list(deck_ids)
+    owner_ids = set(
+        Deck.all_objects.filter(id__in=deck_ids).values_list("owner_id", flat=True)
+    )
+    was_starter = starter.starter_deck_id() in deck_ids
+    cards = 0
+    for ids in _chunks(UserCard.objects.filter(card__deck_id__in=deck_ids), chunk_size):
+        with transaction.atomic():
+            _raw_delete(UserCard.objects.filter(id__in=ids))
+    for ids in _chunks(Card.objects.filter(deck_id__in=deck_ids), chunk_size):
+        with transaction.atomic():
+            _raw_delete(Card.tag_index.through.objects.filter(card_id__in=ids))
+            cards += _raw_delete(Card.objects.filter(id__in=ids))
+    with transaction.atomic():
+        # no UserCards left, so this drops the decks' stats and notifies
+        stats.rebuild(deck_ids=deck_ids)
+        _raw_delete(Deck.tag_index.through.objects.filter(deck_id__in=deck_ids))
+        _raw_delete(Deck.all_objects.filter(id__in=deck_ids))
+    facets.bump_decks(deck_ids)
+    response_cache.bump(owner_ids)
+    if was_starter:
+        starter.invalidate()
+    return cards
+
+
+def purge_cards(cards, chunk_size=None):
+    """
+    Delete the cards of the ``cards`` queryset with their UserCards and tag
+    links. Returns the number of cards deleted.
+    """
+    from .models import Card, Deck, UserCard
+
+    chunk_size = chunk_size or deletion_setting("CHUNK_SIZE")
+    with transaction.atomic():
+        rows = list(cards.order_by("id").values_list("id", "deck_id"))
+        card_ids = [card_id for card_id, _ in rows]
+        deck_ids = sorted({deck_id for _, deck_id in rows})
+        for start in range(0, len(card_ids), chunk_size):
+            ids = card_ids[start : start + chunk_size]
+            _raw_delete(UserCard.objects.filter(card_id__in=ids))
+            _raw_delete(Card.tag_index.through.objects.filter(card_id__in=ids))
+            _raw_delete(Card.objects.filter(id__in=ids))
+        if card_ids:
+            stats.rebuild(deck_ids=deck_ids)
+    if card_ids:
+        facets.bump_decks(deck_ids)
+        response_cache.bump(
+            set(
+                Deck.all_objects.filter(id__in=deck_ids).values_list(
+                    "owner_id", flat=True
+                )
+            )
+        )
+        if starter.starter_deck_id() in deck_ids:
+            starter.invalidate()
+    return len(card_ids)
+
+
+def soft_delete(deck_ids=(), card_type_ids=()):
+    """
+    Hide the decks and card types and rename them so that their names can
+    be reused right away; ``purge_deleted`` removes them later.
+    """
+    from .models import CardType, Deck
+
+    now = timezone.now()
+    tombstone = Concat(Value("deleted-"), Cast("id", CharField()))
+    decks = Deck.all_objects.filter(id__in=deck_ids)
+    owner_ids = set(decks.values_list("owner_id", flat=True))
+    was_starter = starter.starter_deck_id() in deck_ids
+    decks.update(deleted_at=now, name=tombstone)
+    types = CardType.all_objects.filter(id__in=card_type_ids)
+    owner_ids |= set(types.values_list("owner_id", flat=True))
+    types.update(deleted_at=now, name=tombstone)
+    response_cache.bump(owner_ids)
+    if was_starter:
+        starter.invalidate()
+
+
+def purge_deleted(chunk_size=None):
+    """Purge every soft-deleted deck, then the card types left without decks."""
+    from .models import CardType, Deck
+
+    deck_ids = list(
+        Deck.all_objects.exclude(deleted_at=None).values_list("id", flat=True)
+    )
+    if deck_ids:
+        purge_decks(deck_ids, chunk_size)
+    types = CardType.all_objects.exclude(deleted_at=None).filter(decks=None)
+    _, deleted = types.delete()
+    return len(deck_ids), deleted.get(CardType._meta.label, 0)
+
+
+def purge_in_background():
+    def run():
+        try:
+            purge_deleted()
+        except Exception:
+            logger.exception("Purging deleted decks failed")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name="flashcards-purge", daemon=True).start()
+
+
+def delete_decks(deck_ids):
+    deck_ids = list(deck_ids)
+    if deletion_setting("SOFT_DELETE"):
+        soft_delete(deck_ids=deck_ids)
+        transaction.on_commit(purge_in_background)
+    else:
+        purge_decks(deck_ids)
+
+
+def delete_card_types(card_type_ids):
+    """Delete the card types together with all of their decks."""
+    from .models import CardType, Deck
+
+    card_type_ids = list(card_type_ids)
+    deck_ids = list(
+        Deck.all_objects.filter(card_type_id__in=card_type_ids).values_list(
+            "id", flat=True
+        )
+    )
+    if deletion_setting("SOFT_DELETE"):
+        soft_delete(deck_ids, card_type_ids)
+        transaction.on_commit(purge_in_background)
+    else:
+        purge_decks(deck_ids)
+        # few rows; the regular delete runs the card type signal handlers
+        CardType.all_objects.filter(id__in=card_type_ids).delete()
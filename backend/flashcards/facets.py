@@ -0,0 +1,116 @@
+"""
+Facet counts for the card filter sidebar: how many cards are in each deck,
+carry each tag, and have each difficulty and category (read from ``data``,
+lowercased).
+
+Unfiltered counts are sums of per-deck summaries kept in the response cache
+(RESPONSE_CACHE["ALIAS"]) under a per-deck version token that card writes
+replace, so the sidebar for a user with 100k visible cards is a few cache
+lookups. Once tags, difficulties or data fields narrow the cards, the counts
+come from ``facet_counts``: one UNION ALL of grouped queries over the
+filtered cards.
+"""
+
+import uuid
+from collections import Counter
+
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast
+
+from . import metrics, response_cache
+from .datafields import DataValue
+
+FACETS = ("deck", "tag", "difficulty", "category")
+
+
+def version_key(deck_id):
+    return f"flashcards:deck-cards-version:{deck_id}"
+
+
+def summary_key(deck_id, version):
+    return f"flashcards:facets:{deck_id}:{version}"
+
+
+def bump_decks(deck_ids):
+    """Invalidate the facet summaries of ``deck_ids`` after their cards changed."""
+    keys = {version_key(d): uuid.uuid4().hex for d in set(deck_ids) if d is not None}
+    if keys:
+        response_cache.cache().set_many(keys, timeout=None)
+
+
+def facet_counts(cards):
+    """
+    ``{facet: Counter({value: count})}`` for the ``cards`` queryset, as one
+    UNION ALL of queries grouping ``cards`` itself, so that each keeps the
+    queryset's filters.
+    """
+    cards = cards.order_by()
+
+    def grouped(facet, value):
+        return cards.values(
+            facet=Value(facet, output_field=CharField()), value=value
+        ).annotate(count=Count("pk"))
+
+    query = grouped("deck", Cast("deck_id", CharField())).union(
+        grouped("tag", F("tag_index__name")),
+        grouped("difficulty", DataValue("difficulty")),
+        grouped("category", DataValue("category")),
+        all=True,
+    )
+    counts = {name: Counter() for name in FACETS}
+    for row in query:
+        if row["value"] in (None, ""):
+            continue  # cards without tags, or without the field
+        value = int(row["value"]) if row["facet"] == "deck" else row["value"]
+        counts[row["facet"]][value] += row["count"]
+    return counts
+
+
+def deck_summaries(deck_ids):
+    """``facet_counts`` of every deck in ``deck_ids``, cached per deck version."""
+    from .models import Card
+
+    cache = response_cache.cache()
+    deck_ids = sorted(set(deck_ids))
+    versions = cache.get_many([version_key(d) for d in deck_ids])
+    missing = {version_key(d): uuid.uuid4().hex for d in deck_ids}
+    missing = {k: v for k, v in missing.items() if k not in versions}
+    for key, token in missing.items():
+        # add() so that racing requests agree on one token, as in response_cache
+        if not cache.add(key, token, timeout=None):
+            token = cache.get(key, token)
+        versions[key] = token
+    keys = {d: summary_key(d, versions[version_key(d)]) for d in deck_ids}
+    found = cache.get_many(list(keys.values()))
+    summaries = {}
+    for deck_id, key in keys.items():
+        summary = found.get(key)
+        metrics.record_cache("facets", summary is not None)
+        if summary is None:
+            summary = facet_counts(Card.objects.filter(deck_id=deck_id))
+            cache.set(
+                key, summary, timeout=response_cache.response_cache_setting("TIMEOUT")
+            )
+        summaries[deck_id] = summary
+    return summaries
+
+
+def merged(summaries):
+    counts = {name: Counter() for name in FACETS}
+    for summary in summaries:
+        for name in FACETS:
+            counts[name].update(summary[name])
+    return counts
+
+
+def as_response(counts):
+    """``{facet: [{"value", "count"}]}``, most cards first."""
+    return {
+        name: [
+            {"value": value, "count": count}
+            for value, count in sorted(
+                counts[name].items(), key=lambda item: (-item[1], str(item[0]))
+            )
+        ]
+        for name in FACETS
+    }
@@ -0,0 +1,70 @@
+"""
+orjson-backed drop-ins for DRF's JSONRenderer and JSONParser.
+
+The output is DRF's, byte for byte: compact separators, raw non-ASCII,
+U+2028/U+2029 escaped, and anything that isn't plain JSON (datetimes,
+Decimal, lazy strings, querysets, ...) converted by DRF's own encoder.
+UUIDs, which orjson writes natively, come out as the same string. Whatever
+the fast path doesn't cover (an indent, non-default UNICODE_JSON,
+COMPACT_JSON or STRICT_JSON settings, integers beyond 64 bits, a non-UTF-8
+request charset) is handed to the stdlib classes, as is everything when
+orjson isn't installed.
+
+The one difference: NaN and infinities render as null where the stdlib
+renderer raises.
+"""
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib path below takes over
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_default = encoders.JSONEncoder().default
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            orjson is None
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            or self.ensure_ascii
+            or not (self.compact and self.strict)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # as DRF does: valid JSON, but not valid inside a <script> literal
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+            ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class JSONParser(parsers.JSONParser):
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not self.strict
+            or encoding.lower().replace("_", "-") not in ("utf-8", "utf8")
+        ):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
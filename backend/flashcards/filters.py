@@ -0,0 +1,65 @@
+"""
+Card filters shared by the list endpoints and the bulk operations, so a
+filter means the same thing wherever it is accepted.
+"""
+
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from .datafields import data_q
+from .models import Card
+
+TAG_MODES = ("any", "all")
+
+
+def split_param(value, lower=False):
+    """'a, b,,c' → ['a', 'b', 'c'] (accepts a list as-is)."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    items = [str(v).strip() for v in value if str(v).strip()]
+    return [v.lower() for v in items] if lower else items
+
+
+def tag_mode(value):
+    """Validated ``tags_mode`` parameter ("any" unless given)."""
+    mode = (value or "any").lower()
+    if mode not in TAG_MODES:
+        raise ValidationError({"tags_mode": f"Must be one of {', '.join(TAG_MODES)}."})
+    return mode
+
+
+def tag_q(model, tags, mode="any", prefix=""):
+    """
+    Q for ``model`` rows (Deck or Card) tagged with any/all of ``tags``:
+    an exact lookup of the tag names in the tag_index join table.
+    """
+    through = model.tag_index.through
+    fk = f"{model._meta.model_name}_id"
+    links = through.objects.filter(tag__name__in=tags)
+    if mode == "all":
+        links = (
+            links.values(fk)
+            .annotate(n=Count("tag_id", distinct=True))
+            .filter(n=len(set(tags)))
+        )
+    return Q(**{f"{prefix}pk__in": links.values(fk)})
+
+
+def card_filter_q(tags=None, difficulties=None, prefix="", tag_mode="any"):
+    """
+    Q for cards matching any (``tag_mode="all"``: all) of ``tags`` and any of
+    ``difficulties`` (``data["difficulty"]``, ignoring case). ``prefix`` is the path to the Card from the queried
+    model, e.g. "card__".
+    """
+    q = Q()
+    tags = split_param(tags, lower=True)
+    if tags:
+        q &= tag_q(Card, tags, tag_mode, prefix)
+    difficulties = split_param(difficulties, lower=True)
+    if difficulties:
+        # data is where cards keep their difficulty; the legacy column is
+        # only filled in for imported cards
+        q &= data_q("difficulty", difficulties, prefix)
+    return q
@@ -0,0 +1,110 @@
+"""
+Per-request instrumentation shared by the timing middleware.
+
+A RequestStats object is installed in a context variable for the duration of a
+request. It is also a database execute wrapper, so every SQL statement run on
+the default connection is counted and timed, and code that wants its own line
+in the Server-Timing header wraps itself in ``span("name")``.
+"""
+
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.db import connection
+
+_current = contextvars.ContextVar("flashcards_request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.spans = defaultdict(float)
+        self.statement_counts = Counter()
+        self.statement_ms = defaultdict(float)
+        self._depth = defaultdict(int)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (perf_counter() - started) * 1000
+            self.queries += 1
+            self.sql_ms += elapsed
+            self.statement_counts[sql] += 1
+            self.statement_ms[sql] += elapsed
+
+    def top_statements(self, limit):
+        """The most repeated SQL statements, worst offenders first."""
+        return [
+            {"sql": sql, "count": count, "ms": round(self.statement_ms[sql], 2)}
+            for sql, count in self.statement_counts.most_common(limit)
+        ]
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextmanager
+def collect(stats):
+    """Make ``stats`` the current request's collector and hook it into the DB."""
+    token = _current.set(stats)
+    try:
+        with connection.execute_wrapper(stats):
+            yield stats
+    finally:
+        _current.reset(token)
+
+
+def collecting(iterator):
+    """
+    ``iterator`` with each item produced under the current request's
+    collector, for a streamed body generated after the view has returned
+    (and, under ASGI, in another thread).
+    """
+    stats = _current.get()
+    if stats is None:
+        return iterator
+    return _collecting(iter(iterator), stats)
+
+
+def _collecting(iterator, stats):
+    while True:
+        with collect(stats):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block under ``name``. Nested spans with the same name only count
+    the outermost one, so a nested serializer isn't double counted.
+    """
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    stats._depth[name] += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats._depth[name] -= 1
+        if stats._depth[name] == 0:
+            stats.spans[name] += (perf_counter() - started) * 1000
+
+
+class TimedSerializerMixin:
+    """Attribute ``to_representation`` time to the "serialize" span."""
+
+    def to_representation(self, instance):
+        with span("serialize"):
+            return super().to_representation(instance)
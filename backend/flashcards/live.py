@@ -0,0 +1,338 @@
+"""
+Live deck counts pushed to the browser over Server-Sent Events.
+
+core/asgi.py sends ``GET /api/live/?token=<access token>`` to
+``LiveUpdatesApp``, which keeps the connection open and writes a ``stats``
+event with ``{"decks": {"<deck id>": {"total", "due", "new", "review",
+"known"}}}``: every deck on connect, then only the decks whose counts
+changed, either because DeckStats changed (a review on another device, a
+reset, an import) or because cards came due at midnight.
+
+``deck_stats_changed`` notifications go to the ``Hub`` of the process they
+happen in. With LIVE_UPDATES["BROKER_DIR"] set they are also sent to every
+other worker through ``SocketBroker``, a stand-in for Redis pub/sub made of
+one Unix datagram socket per process in that directory.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import threading
+from contextlib import suppress
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+LIVE_DEFAULTS = {
+    "PATH": "/api/live/",
+    "BROKER_DIR": None,
+    "HEARTBEAT_SECONDS": 15,
+}
+
+
+def live_setting(name):
+    return getattr(settings, "LIVE_UPDATES", {}).get(name, LIVE_DEFAULTS[name])
+
+
+class Hub:
+    """
+    In-process fan-out to the event streams open in this process. ``dispatch``
+    may be called from any thread; each subscriber gets the changed deck ids
+    on its own event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(
+                (asyncio.get_running_loop(), queue)
+            )
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def dispatch(self, user_ids, deck_ids):
+        """``user_ids``/``deck_ids`` of None mean every user/deck."""
+        with self._lock:
+            if user_ids is None:
+                targets = [s for subs in self._subscribers.values() for s in subs]
+            else:
+                targets = [s for u in user_ids for s in self._subscribers.get(u, ())]
+        for loop, queue in targets:
+            with suppress(RuntimeError):  # loop already closed
+                loop.call_soon_threadsafe(queue.put_nowait, deck_ids)
+
+
+class SocketBroker:
+    """
+    Fan-out between worker processes on one host. Every process that has
+    streams open binds ``<directory>/<pid>.sock`` and hands what it receives
+    to its hub; publishing sends one datagram to every other socket.
+    """
+
+    def __init__(self, directory, hub, name=None):
+        self.directory = Path(directory)
+        self.hub = hub
+        self.path = self.directory / f"{name or os.getpid()}.sock"
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._listening = False
+        self._lock = threading.Lock()
+
+    def listen(self):
+        with self._lock:
+            if self._listening:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with suppress(FileNotFoundError):
+                self.path.unlink()
+            self._sock.bind(str(self.path))
+            self._listening = True
+        threading.Thread(
+            target=self._receive, name="flashcards-live-broker", daemon=True
+        ).start()
+
+    def publish(self, user_ids, deck_ids):
+        message = json.dumps({"users": user_ids, "decks": deck_ids}).encode()
+        for path in self.directory.glob("*.sock"):
+            if path == self.path:
+                continue
+            try:
+                # never wait on a receiver that isn't reading: this runs in
+                # the on_commit hook of every review. The socket itself stays
+                # blocking for the receive thread.
+                self._sock.sendto(message, socket.MSG_DONTWAIT, str(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # the process that bound it is gone
+                with suppress(FileNotFoundError):
+                    path.unlink()
+            except BlockingIOError:
+                pass  # receiver is backed up; its streams catch up at midnight
+
+    def close(self):
+        self._sock.close()
+        if self._listening:
+            with suppress(FileNotFoundError):
+                self.path.unlink()
+
+    def _receive(self):
+        while True:
+            try:
+                message = json.loads(self._sock.recv(65536))
+            except OSError:
+                return
+            except ValueError:
+                continue
+            self.hub.dispatch(message["users"], message["decks"])
+
+
+hub = Hub()
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    global _broker
+    directory = live_setting("BROKER_DIR")
+    if not directory:
+        return None
+    with _broker_lock:
+        if _broker is None:
+            _broker = SocketBroker(directory, hub)
+        return _broker
+
+
+def notify(sender=None, user_ids=None, deck_ids=None, **kwargs):
+    """``deck_stats_changed`` receiver."""
+    # senders pass any iterable; streams concatenate and the broker JSON-encodes
+    user_ids = None if user_ids is None else list(user_ids)
+    deck_ids = None if deck_ids is None else list(deck_ids)
+    hub.dispatch(user_ids, deck_ids)
+    if (b := broker()) is not None:
+        b.publish(user_ids, deck_ids)
+
+
+def deck_counts(user_id, deck_ids=None):
+    from .models import DeckStats
+
+    rows = DeckStats.objects.filter(user_id=user_id)
+    if deck_ids is not None:
+        rows = rows.filter(deck_id__in=deck_ids)
+    counts = {str(row.deck_id): row.as_dict() for row in rows}
+    # decks that no longer have stats (deleted, or all cards removed)
+    for deck_id in deck_ids or ():
+        counts.setdefault(str(deck_id), None)
+    return counts
+
+
+def authenticate(token):
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    auth = JWTAuthentication()
+    try:
+        user = auth.get_user(auth.get_validated_token(token))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    return user.id
+
+
+def seconds_until_midnight():
+    now = timezone.localtime()
+    midnight = (now + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return max((midnight - now).total_seconds(), 0.0)
+
+
+def event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class LiveUpdatesApp:
+    """ASGI wrapper that serves the event stream and passes everything else on."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != live_setting("PATH"):
+            return await self.app(scope, receive, send)
+
+        user_id = None
+        token = self.token(scope)
+        if token:
+            user_id = await sync_to_async(authenticate)(token)
+        if user_id is None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": [(b"content-type", b"application/json")]
+                    + self.cors_headers(scope),
+                }
+            )
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": b'{"detail": "Authentication credentials were not provided."}',
+                }
+            )
+            return
+
+        if (b := broker()) is not None:
+            b.listen()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ]
+                + self.cors_headers(scope),
+            }
+        )
+        streamer = asyncio.create_task(self.stream(user_id, send))
+        try:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+        finally:
+            streamer.cancel()
+            with suppress(asyncio.CancelledError):
+                await streamer
+
+    async def stream(self, user_id, send):
+        queue = hub.subscribe(user_id)
+        try:
+            counts = await sync_to_async(deck_counts)(user_id)
+            await self.send_event(send, "stats", {"decks": counts})
+            heartbeat = live_setting("HEARTBEAT_SECONDS")
+            while True:
+                until_midnight = seconds_until_midnight()
+                try:
+                    deck_ids = await asyncio.wait_for(
+                        queue.get(), min(heartbeat, until_midnight + 1)
+                    )
+                except asyncio.TimeoutError:
+                    if until_midnight > heartbeat:
+                        await send(
+                            {
+                                "type": "http.response.body",
+                                "body": b": keepalive\n\n",
+                                "more_body": True,
+                            }
+                        )
+                        continue
+                    deck_ids = None  # cards came due
+                # coalesce a burst of notifications into one query
+                while deck_ids is not None and not queue.empty():
+                    more = queue.get_nowait()
+                    deck_ids = None if more is None else deck_ids + more
+                fresh = await sync_to_async(deck_counts)(user_id, deck_ids)
+                if deck_ids is None:
+                    fresh.update({k: None for k in counts if k not in fresh})
+                changed = {k: v for k, v in fresh.items() if counts.get(k) != v}
+                for key, value in changed.items():
+                    if value is None:
+                        counts.pop(key, None)
+                    else:
+                        counts[key] = value
+                if changed:
+                    await self.send_event(send, "stats", {"decks": changed})
+        finally:
+            hub.unsubscribe(user_id, queue)
+
+    @staticmethod
+    async def send_event(send, name, data):
+        await send(
+            {
+                "type": "http.response.body",
+                "body": event(name, data),
+                "more_body": True,
+            }
+        )
+
+    @staticmethod
+    def token(scope):
+        # EventSource cannot set headers, so the access token may come as ?token=
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if query.get("token"):
+            return query["token"][0]
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization" and value.startswith(b"Bearer "):
+                return value[len(b"Bearer ") :].decode()
+        return None
+
+    @staticmethod
+    def cors_headers(scope):
+        origin = dict(scope.get("headers", ())).get(b"origin", b"").decode()
+        allowed = getattr(settings, "CORS_ALLOW_ALL_ORIGINS", False) or origin in (
+            getattr(settings, "CORS_ALLOWED_ORIGINS", [])
+        )
+        if not origin or not allowed:
+            return []
+        return [
+            (b"access-control-allow-origin", origin.encode()),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from flashcards import activity
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in DailyUserActivity rollups missing for a day from UserCard "
+        "scheduling state (each card's most recent review only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, action="append", help="Only rebuild this user id"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Replace existing rows too (their exact counts are lost)",
+        )
+
+    def handle(self, *args, **options):
+        rows = activity.rebuild_from_usercards(
+            user_ids=options["user"], force=options["force"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} daily activity rows."))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from flashcards import stats
 from flashcards.models import Deck, Card, UserCard
 from django.utils import timezone
 
@@ -24,6 +25,7 @@ class Command(BaseCommand):
                 )
                 if created:
                     created_count += 1
+        stats.rebuild(deck_ids=[starter_deck.id])
         self.stdout.write(
             self.style.SUCCESS(
                 f"Backfilled {created_count} missing UserCards for the Starter Deck."
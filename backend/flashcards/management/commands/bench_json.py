@@ -0,0 +1,89 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework import parsers, renderers
+
+from flashcards import fastjson, projections
+from flashcards.models import UserCard
+
+
+def timed(fn, repeat):
+    """Median wall time of ``repeat`` calls of ``fn``, in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time JSON encoding and decoding of a review queue payload with DRF's "
+        "stdlib renderer and parser and with flashcards.fastjson."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            default=None,
+            help="Username whose queue to encode (default: the user with the "
+            "most UserCards)",
+        )
+        parser.add_argument("--deck", type=int, default=None, help="Queue ?deck=")
+        parser.add_argument(
+            "--rows", type=int, default=200, help="Queue rows (default: 200)"
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        usercards = UserCard.objects.all()
+        if options["deck"]:
+            usercards = usercards.filter(card__deck_id=options["deck"])
+        if options["user"]:
+            usercards = usercards.filter(user__username=options["user"])
+        else:
+            busiest = (
+                usercards.values("user_id")
+                .annotate(n=Count("id"))
+                .order_by("-n")
+                .values_list("user_id", flat=True)
+                .first()
+            )
+            usercards = usercards.filter(user_id=busiest)
+        rows = projections.usercard_values(usercards.order_by("due_date"))
+        payload = {"results": projections.usercards(rows[: options["rows"]])}
+        if not payload["results"]:
+            raise CommandError("No UserCards to encode; run seed_scale first.")
+
+        codecs = [
+            ("stdlib", renderers.JSONRenderer(), parsers.JSONParser()),
+            ("fastjson", fastjson.JSONRenderer(), fastjson.JSONParser()),
+        ]
+        encoded = {name: renderer.render(payload) for name, renderer, _ in codecs}
+        if encoded["stdlib"] != encoded["fastjson"]:
+            raise CommandError("fastjson output differs from DRF's.")
+        content = encoded["stdlib"]
+        self.stdout.write(
+            f"{len(payload['results'])} queue rows, {len(content) / 1024:.1f} KiB, "
+            f"orjson {'available' if fastjson.orjson else 'missing'}"
+        )
+        self.stdout.write(f"{'':<10}{'encode ms':>12}{'decode ms':>12}")
+        results = {}
+        for name, renderer, parser in codecs:
+            results[name] = (
+                timed(lambda: renderer.render(payload), options["repeat"]),
+                timed(lambda: parser.parse(io.BytesIO(content)), options["repeat"]),
+            )
+            self.stdout.write(
+                f"{name:<10}{results[name][0]:>12.2f}{results[name][1]:>12.2f}"
+            )
+        (enc, dec), (fast_enc, fast_dec) = results["stdlib"], results["fastjson"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"fastjson: encode x{enc / fast_enc:.1f}, decode x{dec / fast_dec:.1f}"
+            )
+        )
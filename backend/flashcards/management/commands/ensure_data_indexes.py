@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from flashcards import datafields
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the Card.data expression indexes of the most declared indexed "
+        "fields and drop those no longer among them. Run periodically; saving a "
+        "card type does no index work."
+    )
+
+    def handle(self, *args, **options):
+        created, dropped = datafields.ensure_indexes()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(created)} and dropped {len(dropped)} data field indexes."
+            )
+        )
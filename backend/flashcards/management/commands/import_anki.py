@@ -1,5 +1,6 @@
 import csv
 from django.core.management.base import BaseCommand, CommandError
+from flashcards import facets, starter, stats
 from flashcards.models import Deck, Card, CardType
 from django.contrib.auth import get_user_model
 from bs4 import BeautifulSoup
@@ -86,6 +87,7 @@ class Command(BaseCommand):
                     "back": ["pseudo", "solution", "complexity"],
                     "hidden": ["hint"],
                 },
+                indexed_fields=["difficulty", "category"],
             )
 
         # Get or update the Starter Deck for this user (robust to duplicates)
@@ -176,6 +178,7 @@ class Command(BaseCommand):
                 )
         # Remove existing cards in the Starter Deck for a clean import
         deleted, _ = Card.objects.filter(deck=starter_deck).delete()
+        stats.rebuild(deck_ids=[starter_deck.id])
         if deleted:
             self.stdout.write(
                 self.style.WARNING(
@@ -192,3 +195,6 @@ class Command(BaseCommand):
             )
         else:
             self.stdout.write("No cards imported.")
+        # bulk_create sends no signals; drop every worker's cached copy
+        starter.bump_version()
+        facets.bump_decks([starter_deck.id])
@@ -0,0 +1,286 @@
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from flashcards.models import UserCard
+
+RATINGS = ["again", "hard", "good", "easy"]
+RATING_WEIGHTS = [10, 15, 55, 20]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, wall_seconds):
+    """samples: {endpoint: [(latency_ms, ok), ...]} → per-endpoint stats."""
+    report = {}
+    for endpoint, rows in sorted(samples.items()):
+        latencies = sorted(ms for ms, _ in rows)
+        report[endpoint] = {
+            "count": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+            "rps": round(len(rows) / wall_seconds, 2) if wall_seconds else 0.0,
+        }
+    return report
+
+
+class InProcessTransport:
+    """Drives the API through DRF's test client, inside this process."""
+
+    def __init__(self, user):
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def request(self, method, path, body=None):
+        response = getattr(self.client, method.lower())(path, body, format="json")
+        payload = None
+        if response.status_code < 400 and response.get("Content-Type", "").startswith(
+            "application/json"
+        ):
+            # the queue is streamed
+            if response.streaming:
+                payload = json.loads(b"".join(response.streaming_content))
+            else:
+                payload = response.json()
+        return response.status_code, payload
+
+
+class LiveTransport:
+    """Drives a running server over HTTP, authenticating with a JWT."""
+
+    def __init__(self, base_url, user, password):
+        self.base_url = base_url.rstrip("/")
+        status, tokens = self._send(
+            "POST",
+            "/api/token/",
+            {"username": user.username, "password": password},
+        )
+        if status != 200:
+            raise CommandError(f"Could not obtain a token for {user.username}")
+        self.token = tokens["access"]
+
+    def request(self, method, path, body=None):
+        return self._send(method, path, body, self.token)
+
+    def _send(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                return resp.status, json.loads(resp.read() or b"null")
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a review-session mix (queue → rate → queue) against the API "
+        "with concurrent threads and report per-endpoint latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="Username prefix of the users to drive (see seed_scale)",
+        )
+        parser.add_argument("--password", default="loadpass123")
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--sessions",
+            type=int,
+            default=10,
+            help="Review sessions per thread (default: 10)",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=None,
+            help="Run for this many seconds instead of a fixed session count",
+        )
+        parser.add_argument(
+            "--reviews-per-session",
+            type=int,
+            default=5,
+        )
+        parser.add_argument(
+            "--base-url",
+            default=None,
+            help="Drive a live server (e.g. http://localhost:8000) instead of "
+            "the in-process test client",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Write the JSON report here (default: data/bench/load-<ts>.json)",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=None,
+            help="A previous JSON report to compare p95 latency against",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = list(
+            User.objects.filter(username__startswith=options["prefix"]).order_by("id")[
+                : options["users"]
+            ]
+        )
+        if not users:
+            raise CommandError(
+                f"No users with prefix '{options['prefix']}'; run seed_scale first."
+            )
+
+        self.options = options
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+        deadline = (
+            time.monotonic() + options["duration"] if options["duration"] else None
+        )
+
+        seed = options["seed"]
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(
+                    users,
+                    random.Random(None if seed is None else seed + n),
+                    deadline,
+                ),
+            )
+            for n in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        report = {
+            "started_at": timezone.now().isoformat(),
+            "mode": "live" if options["base_url"] else "in-process",
+            "base_url": options["base_url"],
+            "threads": options["threads"],
+            "users": len(users),
+            "reviews_per_session": options["reviews_per_session"],
+            "wall_seconds": round(wall, 3),
+            "endpoints": summarize(self.samples, wall),
+        }
+        self._print(report)
+        self._save(report)
+
+    def _worker(self, users, rng, deadline):
+        sessions = 0
+        try:
+            while True:
+                if deadline is not None:
+                    if time.monotonic() >= deadline:
+                        break
+                elif sessions >= self.options["sessions"]:
+                    break
+                self._session(rng.choice(users), rng)
+                sessions += 1
+        finally:
+            connection.close()
+
+    def _session(self, user, rng):
+        if self.options["base_url"]:
+            transport = LiveTransport(
+                self.options["base_url"], user, self.options["password"]
+            )
+        else:
+            transport = InProcessTransport(user)
+        deck_id = (
+            UserCard.objects.filter(user=user)
+            .values_list("card__deck_id", flat=True)
+            .first()
+        )
+        queue_path = "/api/usercards/queue/"
+        if deck_id is not None:
+            queue_path += f"?deck={deck_id}"
+        payload = self._call(transport, "GET queue", "GET", queue_path)
+        items = payload.get("results", []) if payload else []
+        for uc in items[: self.options["reviews_per_session"]]:
+            rating = rng.choices(RATINGS, RATING_WEIGHTS)[0]
+            self._call(
+                transport,
+                "PUT usercard",
+                "PUT",
+                f"/api/usercards/{uc['id']}/",
+                {"last_rating": rating},
+            )
+        self._call(transport, "GET queue", "GET", queue_path)
+
+    def _call(self, transport, label, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, payload = transport.request(method, path, body)
+        except Exception:
+            status, payload = 599, None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.samples[label].append((elapsed_ms, status < 400))
+        return payload
+
+    def _print(self, report):
+        baseline = {}
+        if self.options["baseline"]:
+            with open(self.options["baseline"]) as f:
+                baseline = json.load(f).get("endpoints", {})
+        self.stdout.write(
+            f"{report['mode']} run, {report['threads']} threads, "
+            f"{report['wall_seconds']}s wall"
+        )
+        header = f"{'endpoint':<16}{'count':>8}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}"
+        if baseline:
+            header += f"{'Δp95':>10}"
+        self.stdout.write(header)
+        for endpoint, row in report["endpoints"].items():
+            line = (
+                f"{endpoint:<16}{row['count']:>8}{row['errors']:>6}"
+                f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                f"{row['rps']:>9.1f}"
+            )
+            if endpoint in baseline:
+                delta = row["p95_ms"] - baseline[endpoint]["p95_ms"]
+                line += f"{delta:>+10.1f}"
+            self.stdout.write(line)
+
+    def _save(self, report):
+        output = self.options["output"]
+        if output is None:
+            stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+            output = Path(settings.BASE_DIR) / "data" / "bench" / f"load-{stamp}.json"
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
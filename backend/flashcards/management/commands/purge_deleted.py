@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from flashcards import deletion
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge soft-deleted decks and card types with chunked raw deletes "
+        "(normally done in the background right after the delete request)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=deletion.deletion_setting("CHUNK_SIZE")
+        )
+
+    def handle(self, *args, **options):
+        decks, card_types = deletion.purge_deleted(options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Purged {decks} decks and {card_types} card types.")
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from flashcards import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialized DeckStats table from UserCard with one grouped query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, action="append", help="Only rebuild this user id"
+        )
+        parser.add_argument(
+            "--deck", type=int, action="append", help="Only rebuild this deck id"
+        )
+
+    def handle(self, *args, **options):
+        rows = stats.rebuild(user_ids=options["user"], deck_ids=options["deck"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} DeckStats rows."))
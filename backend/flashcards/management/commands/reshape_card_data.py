@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from flashcards import card_data
+from flashcards.models import CardType
+
+
+class Command(BaseCommand):
+    help = (
+        "Reshape the data of every card of a card type to its fields with chunked "
+        "set-based updates, optionally changing or renaming the fields first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("card_type", type=int, help="CardType id")
+        parser.add_argument(
+            "--fields", help="Comma-separated new field list for the card type"
+        )
+        parser.add_argument(
+            "--rename",
+            action="append",
+            default=[],
+            metavar="OLD=NEW",
+            help="Rename a field, keeping its values (repeatable)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=card_data.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            card_type = CardType.objects.get(pk=options["card_type"])
+        except CardType.DoesNotExist:
+            raise CommandError(f"CardType {options['card_type']} does not exist.")
+        renames = {}
+        for rename in options["rename"]:
+            old, sep, new = rename.partition("=")
+            if not sep or not old.strip() or not new.strip():
+                raise CommandError(f"--rename expects OLD=NEW, got {rename!r}.")
+            renames[old.strip()] = new.strip()
+
+        fields = list(card_type.fields or [])
+        if options["fields"]:
+            fields = [f.strip() for f in options["fields"].split(",") if f.strip()]
+        fields = [renames.get(f, f) for f in fields]
+        if len(set(fields)) != len(fields):
+            raise CommandError("Field names must be unique.")
+
+        def progress(done, total):
+            self.stdout.write(f"  ... {done}/{total} cards")
+
+        with transaction.atomic():
+            if fields != card_type.fields:
+                card_type.fields = fields
+                card_type.indexed_fields = [
+                    renames.get(f, f)
+                    for f in card_type.indexed_fields
+                    if renames.get(f, f) in fields
+                ]
+                card_type.save(update_fields=["fields", "indexed_fields"])
+            changed = card_data.reshape_cards(
+                card_type, renames, options["chunk_size"], progress
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Reshaped {changed} cards of '{card_type.name}'.")
+        )
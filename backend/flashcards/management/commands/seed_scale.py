@@ -0,0 +1,286 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from flashcards import datafields, stats
+from flashcards.models import Card, CardType, Deck, UserCard, sync_tag_index
+
+DEFAULT_FIELDS = [
+    "problem",
+    "difficulty",
+    "category",
+    "hint",
+    "pseudo",
+    "solution",
+    "complexity",
+]
+DEFAULT_LAYOUT = {
+    "front": ["problem", "difficulty", "category", "hint"],
+    "back": ["pseudo", "solution", "complexity"],
+    "hidden": ["hint"],
+}
+INDEXED_FIELDS = ["difficulty", "category"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+CATEGORIES = [
+    "Arrays",
+    "Two Pointers",
+    "Sliding Window",
+    "Stack",
+    "Binary Search",
+    "Linked List",
+    "Trees",
+    "Tries",
+    "Heap",
+    "Backtracking",
+    "Graphs",
+    "Dynamic Programming",
+    "Greedy",
+    "Intervals",
+    "Bit Manipulation",
+]
+TAGS = ["blind75", "neetcode", "graph", "dp", "easy-win", "interview", "review"]
+# Roughly what a mature collection looks like: mostly "good" answers.
+RATING_WEIGHTS = [("again", 10), ("hard", 15), ("good", 55), ("easy", 20)]
+USERCARD_COLUMNS = [
+    "user_id",
+    "card_id",
+    "ease_factor",
+    "interval",
+    "repetitions",
+    "due_date",
+    "last_rating",
+    "status",
+]
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, decks, cards and UserCards for load testing. "
+        "Rows are written with chunked bulk inserts, so millions of UserCards "
+        "take minutes rather than hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--decks-per-user", type=int, default=2)
+        parser.add_argument("--cards-per-deck", type=int, default=50)
+        parser.add_argument(
+            "--starter-cards",
+            type=int,
+            default=0,
+            help="Cards to add to the shared Starter Deck; every seeded user "
+            "gets a UserCard for each of them (default: 0)",
+        )
+        parser.add_argument(
+            "--new-ratio",
+            type=float,
+            default=0.35,
+            help="Fraction of UserCards that have never been reviewed (default: 0.35)",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="Username prefix for seeded users (default: load)",
+        )
+        parser.add_argument(
+            "--password",
+            default="loadpass123",
+            help="Password for every seeded user (default: loadpass123)",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.new_ratio = options["new_ratio"]
+        self.now = timezone.now()
+        prefix = options["prefix"]
+
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Users with prefix '{prefix}' already exist; pick another --prefix."
+            )
+
+        # bulk_create skips post_save, so bootstrap_user does not run here.
+        password = make_password(options["password"])
+        self._bulk(
+            User,
+            (
+                User(
+                    username=f"{prefix}{i:07d}",
+                    email=f"{prefix}{i:07d}@example.com",
+                    password=password,
+                )
+                for i in range(options["users"])
+            ),
+        )
+        users = list(User.objects.filter(username__startswith=prefix).order_by("id"))
+        self.stdout.write(f"Created {len(users)} users")
+
+        card_types = self._bulk(
+            CardType,
+            (
+                CardType(
+                    owner=u,
+                    name="Default",
+                    description="Default card type",
+                    fields=DEFAULT_FIELDS,
+                    layout=DEFAULT_LAYOUT,
+                    indexed_fields=INDEXED_FIELDS,
+                )
+                for u in users
+            ),
+        )
+        decks = self._bulk(
+            Deck,
+            (
+                Deck(
+                    name=f"{u.username} deck {d}",
+                    owner=u,
+                    card_type=ct,
+                    tags=",".join(self.rng.sample(TAGS, 2)),
+                )
+                for u, ct in zip(users, card_types)
+                for d in range(options["decks_per_user"])
+            ),
+        )
+        self.stdout.write(f"Created {len(decks)} decks")
+
+        cards_by_owner = {}
+        created = 0
+        for deck_batch in chunked(decks, max(1, self.batch_size // 50)):
+            cards = self._bulk(
+                Card,
+                (
+                    self._card(deck, n)
+                    for deck in deck_batch
+                    for n in range(options["cards_per_deck"])
+                ),
+            )
+            for card in cards:
+                cards_by_owner.setdefault(card.deck.owner_id, []).append(card.id)
+            created += len(cards)
+        self.stdout.write(f"Created {created} cards")
+
+        starter_ids = []
+        if options["starter_cards"]:
+            starter_ids = self._seed_starter(options["starter_cards"], card_types[0])
+            self.stdout.write(f"Added {len(starter_ids)} Starter Deck cards")
+
+        # UserCards are the bulk of the data (users × cards), so skip model
+        # instantiation and feed plain tuples to executemany in chunks.
+        table = connection.ops.quote_name(UserCard._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(c) for c in USERCARD_COLUMNS)
+        placeholders = ", ".join(["%s"] * len(USERCARD_COLUMNS))
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        total = 0
+        for batch in chunked(
+            (
+                self._usercard(u.id, card_id)
+                for u in users
+                for card_id in cards_by_owner.get(u.id, []) + starter_ids
+            ),
+            self.batch_size,
+        ):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            total += len(batch)
+            if total % (self.batch_size * 20) == 0:
+                self.stdout.write(f"  ... {total} UserCards")
+        self.stdout.write(self.style.SUCCESS(f"Created {total} UserCards"))
+        rows = stats.rebuild(user_ids=[u.id for u in users])
+        self.stdout.write(f"Rebuilt {rows} DeckStats rows")
+        # index the seeded types' fields now rather than at the next scheduled run
+        created, _ = datafields.ensure_indexes()
+        if created:
+            self.stdout.write(f"Created {len(created)} data field indexes")
+
+    def _bulk(self, model, objs):
+        created = []
+        for batch in chunked(objs, self.batch_size):
+            with transaction.atomic():
+                batch = model.objects.bulk_create(batch, batch_size=self.batch_size)
+                if model in (Deck, Card):
+                    # bulk_create skips save(), which maintains the tag index
+                    sync_tag_index(batch)
+                created.extend(batch)
+        return created
+
+    def _card(self, deck, n):
+        data = {
+            "problem": f"Problem {deck.id}-{n}",
+            "difficulty": self.rng.choice(DIFFICULTIES),
+            "category": self.rng.choice(CATEGORIES),
+            "hint": "Think about the invariant.",
+            "pseudo": "1. Initialise state\n2. Walk the input\n3. Return the answer\n"
+            * self.rng.randint(1, 4),
+            "solution": "def solve(nums):\n    seen = {}\n"
+            + "    # step\n" * self.rng.randint(5, 40)
+            + "    return seen\n",
+            "complexity": "O(n) time, O(n) space",
+        }
+        return Card(
+            deck=deck,
+            data=data,
+            problem=data["problem"],
+            difficulty=data["difficulty"],
+            category=data["category"],
+            tags=",".join(self.rng.sample(TAGS, self.rng.randint(0, 3))),
+        )
+
+    def _seed_starter(self, count, card_type):
+        starter_deck, _ = Deck.objects.get_or_create(
+            name="Starter Deck",
+            owner=None,
+            defaults={
+                "description": "All pre-loaded Anki cards",
+                "card_type": card_type,
+                "tags": "",
+            },
+        )
+        cards = self._bulk(Card, (self._card(starter_deck, n) for n in range(count)))
+        return [c.id for c in cards]
+
+    def _usercard(self, user_id, card_id):
+        """One row of USERCARD_COLUMNS with a realistic scheduling state."""
+        rng = self.rng
+        adapt = connection.ops.adapt_datetimefield_value
+        if rng.random() < self.new_ratio:
+            due = self.now - timedelta(minutes=rng.randint(0, 60 * 24 * 7))
+            return (user_id, card_id, 2.5, 0, 0, adapt(due), "", "new")
+        rating = rng.choices(
+            [r for r, _ in RATING_WEIGHTS], [w for _, w in RATING_WEIGHTS]
+        )[0]
+        repetitions = 0 if rating == "again" else rng.randint(1, 12)
+        interval = 0 if rating == "again" else max(1, int(rng.expovariate(1 / 12)))
+        # Spread due dates from "a bit overdue" to "a full interval out", so a
+        # realistic fraction of the collection is due at any given moment.
+        offset = rng.uniform(-0.3 * max(interval, 1), interval)
+        return (
+            user_id,
+            card_id,
+            round(rng.uniform(1.3, 3.0), 2),
+            interval,
+            repetitions,
+            adapt(self.now + timedelta(days=offset)),
+            rating,
+            "known" if interval > 21 else "review",
+        )
@@ -0,0 +1,131 @@
+"""
+Prometheus metrics for the flashcards API.
+
+When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) prometheus_client
+keeps every worker's samples in mmap'd files in that directory and the
+/metrics view merges them, so counters and histograms aggregate across all
+gunicorn workers instead of reporting whichever worker served the scrape.
+
+/metrics shows per-route traffic and latency, so only scrapers sending
+``Authorization: Bearer <METRICS["TOKEN"]>`` or connecting from one of
+METRICS["ALLOWED_IPS"] get it; with neither configured nobody does.
+"""
+
+import os
+import secrets
+
+from django.conf import settings
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    "flashcards_request_duration_seconds",
+    "Request latency by DRF view and action.",
+    ["handler", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    "flashcards_requests_total",
+    "Requests by DRF view and action and response status.",
+    ["handler", "method", "status"],
+)
+DB_QUERIES = Histogram(
+    "flashcards_db_queries_per_request",
+    "SQL statements executed per request.",
+    ["handler"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+DB_TIME = Histogram(
+    "flashcards_db_time_seconds",
+    "Time spent in SQL per request.",
+    ["handler"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LLM_LATENCY = Histogram(
+    "flashcards_llm_request_duration_seconds",
+    "Latency of LLM completion calls.",
+    ["model", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+LLM_TOKENS = Counter(
+    "flashcards_llm_tokens_total",
+    "Tokens consumed by LLM completion calls.",
+    ["model", "kind"],
+)
+CACHE_REQUESTS = Counter(
+    "flashcards_cache_requests_total",
+    "Cache lookups by cache and result; hit ratio is hit / (hit + miss).",
+    ["cache", "result"],
+)
+REVIEWS = Counter(
+    "flashcards_reviews_total",
+    "Card reviews submitted, by rating.",
+    ["rating"],
+)
+
+
+METRICS_DEFAULTS = {
+    "TOKEN": "",
+    "ALLOWED_IPS": (),
+}
+
+
+def metrics_setting(name):
+    return getattr(settings, "METRICS", {}).get(name, METRICS_DEFAULTS[name])
+
+
+def scrape_allowed(request):
+    """Whether ``request`` may read /metrics (see the module docstring)."""
+    token = metrics_setting("TOKEN")
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if (
+        token
+        and scheme.lower() == "bearer"
+        and secrets.compare_digest(credentials.encode(), token.encode())
+    ):
+        return True
+    return request.META.get("REMOTE_ADDR") in metrics_setting("ALLOWED_IPS")
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_llm_usage(model, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.labels(model, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(model, "completion").inc(
+        getattr(usage, "completion_tokens", 0) or 0
+    )
+
+
+def handler_name(view_func, method):
+    """``UserCardViewSet.queue`` style label for a resolved view."""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+    actions = getattr(view_func, "actions", None)
+    if actions:
+        action = actions.get(method.lower(), method.lower())
+    else:
+        action = method.lower()
+    return f"{cls.__name__}.{action}"
+
+
+def render_latest():
+    """Exposition body and content type for the /metrics endpoint."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,222 @@
+import json
+import logging
+import random
+from time import perf_counter
+
+import threading
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import metrics, profiling
+from .instrumentation import RequestStats, collect, current_stats
+
+logger = logging.getLogger("flashcards.timing")
+
+TIMING_DEFAULTS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,
+    "SLOW_REQUEST_MS": 500,
+    "TOP_SQL": 5,
+}
+
+
+def timing_setting(name):
+    return getattr(settings, "REQUEST_TIMING", {}).get(name, TIMING_DEFAULTS[name])
+
+
+def when_finished(response, callback):
+    """
+    Call ``callback`` once ``response`` is done: right away, or for a
+    streamed response once its body has been produced (or the client went
+    away), since the view returns before any of it is.
+    """
+    if not response.streaming:
+        callback()
+        return
+    content = response.streaming_content
+
+    if response.is_async:
+
+        async def finishing():
+            try:
+                async for part in content:
+                    yield part
+            finally:
+                callback()
+
+    else:
+
+        def finishing():
+            try:
+                yield from content
+            finally:
+                callback()
+
+    response.streaming_content = finishing()
+
+
+class RequestTimingMiddleware:
+    """
+    Record query count, SQL time, auth, serializer and view time for a sample
+    of requests. The numbers go out as a ``Server-Timing`` header and as one
+    JSON log line on the ``flashcards.timing`` logger; requests slower than
+    REQUEST_TIMING["SLOW_REQUEST_MS"] are logged as warnings together with
+    their most repeated SQL statements.
+
+    A streamed response's headers leave before its body is produced, so its
+    header times the work up to the headers (``headers`` instead of
+    ``total``) and its log line, marked ``"streamed": true``, is written
+    once the body is done and covers all of it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not timing_setting("ENABLED") or random.random() >= timing_setting(
+            "SAMPLE_RATE"
+        ):
+            return self.get_response(request)
+
+        stats = RequestStats()
+        request._timing_stats = stats
+        started = perf_counter()
+        with collect(stats):
+            response = self.get_response(request)
+        total_ms = (perf_counter() - started) * 1000
+        view_started = getattr(request, "_timing_view_started", None)
+        if view_started is not None:
+            stats.spans["view"] = (perf_counter() - view_started) * 1000
+
+        response["Server-Timing"] = self.server_timing(
+            stats, total_ms, "headers" if response.streaming else "total"
+        )
+        when_finished(
+            response,
+            lambda: self.log(
+                request, response, stats, (perf_counter() - started) * 1000
+            ),
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "_timing_stats"):
+            request._timing_view_started = perf_counter()
+        return None
+
+    @staticmethod
+    def server_timing(stats, total_ms, total="total"):
+        parts = [f'db;dur={stats.sql_ms:.1f};desc="{stats.queries} queries"']
+        for name in ("auth", "serialize", "view"):
+            if name in stats.spans:
+                parts.append(f"{name};dur={stats.spans[name]:.1f}")
+        parts.append(f"{total};dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+    @staticmethod
+    def log(request, response, stats, total_ms):
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "queries": stats.queries,
+            "sql_ms": round(stats.sql_ms, 2),
+            **{f"{k}_ms": round(v, 2) for k, v in stats.spans.items()},
+        }
+        if response.streaming:
+            record["streamed"] = True
+        if total_ms >= timing_setting("SLOW_REQUEST_MS"):
+            record["top_sql"] = stats.top_statements(timing_setting("TOP_SQL"))
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+class MetricsMiddleware:
+    """
+    Feed request latency, status and per-request query counts into the
+    Prometheus metrics, labelled by DRF view and action. Reuses the timing
+    middleware's collector when the request was sampled.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = current_stats()
+        started = perf_counter()
+        if stats is None:
+            stats = RequestStats()
+            with collect(stats):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        # a streamed body (and its queries) counts once it has been produced
+        when_finished(response, lambda: self.observe(request, response, stats, started))
+        return response
+
+    @staticmethod
+    def observe(request, response, stats, started):
+        elapsed = perf_counter() - started
+        handler = getattr(request, "_metrics_handler", "unmatched")
+        metrics.REQUEST_LATENCY.labels(handler, request.method).observe(elapsed)
+        metrics.REQUESTS.labels(handler, request.method, response.status_code).inc()
+        metrics.DB_QUERIES.labels(handler).observe(stats.queries)
+        metrics.DB_TIME.labels(handler).observe(stats.sql_ms / 1000)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_handler = metrics.handler_name(view_func, request.method)
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request for staff users who send ``X-Profile: 1``.
+    Only the thread serving the request is sampled; the collapsed stacks are
+    saved to PROFILING["OUTPUT_DIR"] and named in the ``X-Profile-File``
+    response header (fetch them from /api/admin/profile/?file=<name>).
+    """
+
+    header = "HTTP_X_PROFILE"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.META.get(self.header) or not self.is_staff(request):
+            return self.get_response(request)
+
+        sampler = profiling.StackSampler(
+            hz=self.hz(request), thread_id=threading.get_ident()
+        ).start()
+        try:
+            response = self.get_response(request)
+        finally:
+            counts = sampler.stop()
+        name = profiling.write_profile(counts, "request")
+        response["X-Profile-File"] = name
+        response["X-Profile-Samples"] = str(sampler.samples)
+        return response
+
+    @staticmethod
+    def hz(request):
+        try:
+            return int(request.META.get("HTTP_X_PROFILE_HZ", ""))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except (InvalidToken, TokenError):
+            return False
+        return bool(result and result[0].is_staff)
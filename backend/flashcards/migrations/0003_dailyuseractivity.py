@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-19 15:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0002_deckstats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyUserActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("reviews", models.IntegerField(default=0)),
+                ("again_count", models.IntegerField(default=0)),
+                ("hard_count", models.IntegerField(default=0)),
+                ("good_count", models.IntegerField(default=0)),
+                ("easy_count", models.IntegerField(default=0)),
+                (
+                    "new_introduced",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Cards reviewed for the first time on this day",
+                    ),
+                ),
+                ("time_spent_ms", models.BigIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_activity",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "date")},
+            },
+        ),
+    ]
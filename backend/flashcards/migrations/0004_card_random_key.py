@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-19 15:57
+
+import random
+
+import flashcards.models
+from django.db import migrations, models
+
+
+def backfill_random_keys(apps, schema_editor):
+    # AddField evaluates the default once, so every existing card got the same key
+    Card = apps.get_model("flashcards", "Card")
+    ids = list(Card.objects.order_by("id").values_list("id", flat=True))
+    for start in range(0, len(ids), 2000):
+        batch = [
+            Card(id=i, random_key=random.random()) for i in ids[start : start + 2000]
+        ]
+        Card.objects.bulk_update(batch, ["random_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0003_dailyuseractivity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="card",
+            name="random_key",
+            field=models.FloatField(
+                default=flashcards.models.new_random_key, editable=False
+            ),
+        ),
+        migrations.RunPython(backfill_random_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="card",
+            index=models.Index(
+                fields=["deck", "random_key"], name="card_deck_random_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from flashcards import search
+
+
+def create_index(apps, schema_editor):
+    if not search.uses_fts(schema_editor.connection):
+        return
+    for statement in search.CREATE_SQL + search.REBUILD_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if not search.uses_fts(schema_editor.connection):
+        return
+    for statement in search.DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0004_card_random_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
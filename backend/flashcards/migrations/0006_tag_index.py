@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+def split_tags(value):
+    seen = set()
+    tags = [t.strip().lower() for t in (value or "").split(",") if t.strip()]
+    return [t for t in tags if not (t in seen or seen.add(t))]
+
+
+def convert_tag_strings(apps, schema_editor):
+    Tag = apps.get_model("flashcards", "Tag")
+    for model_name in ("Deck", "Card"):
+        model = apps.get_model("flashcards", model_name)
+        through = model.tag_index.through
+        fk = f"{model_name.lower()}_id"
+        rows = (
+            model.objects.exclude(tags="")
+            .values_list("id", "tags")
+            .iterator(chunk_size=2000)
+        )
+        batch = []
+        for obj_id, tags in rows:
+            batch.append((obj_id, split_tags(tags)))
+            if len(batch) == 2000:
+                link_tags(Tag, through, fk, batch)
+                batch = []
+        link_tags(Tag, through, fk, batch)
+
+
+def link_tags(Tag, through, fk, batch):
+    names = {name for _, tags in batch for name in tags}
+    if not names:
+        return
+    Tag.objects.bulk_create([Tag(name=n) for n in names], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    through.objects.bulk_create(
+        [
+            through(**{fk: obj_id, "tag_id": tag_ids[name]})
+            for obj_id, tags in batch
+            for name in tags
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0005_card_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="card",
+            name="tag_index",
+            field=models.ManyToManyField(
+                blank=True, related_name="cards", to="flashcards.tag"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deck",
+            name="tag_index",
+            field=models.ManyToManyField(
+                blank=True, related_name="decks", to="flashcards.tag"
+            ),
+        ),
+        migrations.RunPython(convert_tag_strings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+def index_default_fields(apps, schema_editor):
+    # the Default type's difficulty and category were the legacy filter columns
+    CardType = apps.get_model("flashcards", "CardType")
+    for card_type in CardType.objects.filter(name="Default"):
+        fields = [f for f in ("difficulty", "category") if f in card_type.fields]
+        if fields:
+            card_type.indexed_fields = fields
+            card_type.save(update_fields=["indexed_fields"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0006_tag_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cardtype",
+            name="indexed_fields",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Fields of Card.data that are indexed for filtering and sorting",
+            ),
+        ),
+        migrations.RunPython(index_default_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0007_cardtype_indexed_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cardtype",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="deck",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import random
+
 from django.db import models
 from django.conf import settings
 from django.db import models
@@ -5,6 +7,13 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 
+class LiveManager(models.Manager):
+    """Rows that are not soft-deleted (see flashcards.deletion)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at=None)
+
+
 class CardType(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="card_types"
@@ -21,7 +30,17 @@ class CardType(models.Model):
         default=dict,
         help_text="Dict with 'front' and 'back' keys listing field names for card layout",
     )
+    indexed_fields = models.JSONField(
+        blank=True,
+        default=list,
+        help_text="Fields of Card.data that are indexed for filtering and sorting",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # set when deleted asynchronously; the rows are purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         unique_together = ("name", "owner")
@@ -50,10 +69,71 @@ class CardType(models.Model):
                     "back": ["pseudo", "solution", "complexity"],
                     "hidden": ["hint"],
                 },
+                "indexed_fields": ["difficulty", "category"],
             },
         )
 
 
+def normalize_tags(value):
+    """'DP, graph,dp' → ['dp', 'graph'] (lowercase, first occurrence wins)."""
+    tags = [t.strip().lower() for t in (value or "").split(",") if t.strip()]
+    # Remove duplicates while preserving order
+    seen = set()
+    return [t for t in tags if not (t in seen or seen.add(t))]
+
+
+class Tag(models.Model):
+    """
+    One row per distinct tag name. Deck.tags and Card.tags stay the
+    comma-joined strings the API reads and writes; ``tag_index`` mirrors
+    them as indexed M2M rows so tag filters and facets are exact lookups.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+def sync_tag_index(objects):
+    """
+    Make ``tag_index`` of each saved Deck or Card match its ``tags`` string,
+    for paths that bypass save() (bulk_create, update()). All objects must
+    be of the same model.
+    """
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects:
+        return
+    model = type(objects[0])
+    through = model.tag_index.through
+    fk = f"{model._meta.model_name}_id"
+    wanted = {obj.pk: normalize_tags(obj.tags) for obj in objects}
+    names = {name for tags in wanted.values() for name in tags}
+    if names:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+    tag_ids = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    wanted = {(pk, tag_ids[name]) for pk, tags in wanted.items() for name in tags}
+    existing = {
+        (obj_id, tag_id): link_id
+        for link_id, obj_id, tag_id in through.objects.filter(
+            **{f"{fk}__in": [obj.pk for obj in objects]}
+        ).values_list("id", fk, "tag_id")
+    }
+    stale = [link_id for key, link_id in existing.items() if key not in wanted]
+    if stale:
+        through.objects.filter(id__in=stale).delete()
+    through.objects.bulk_create(
+        [
+            through(**{fk: obj_id, "tag_id": tag_id})
+            for obj_id, tag_id in wanted - existing.keys()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
 class Deck(models.Model):
     name = models.CharField(max_length=100)
     card_type = models.ForeignKey(
@@ -75,6 +155,12 @@ class Deck(models.Model):
         default=False, help_text="If true, this deck is visible to all users."
     )
     tags = models.CharField(max_length=200, blank=True, default="")
+    tag_index = models.ManyToManyField(Tag, related_name="decks", blank=True)
+    # set when deleted asynchronously; the rows are purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         unique_together = ("card_type", "name", "owner")
@@ -82,17 +168,18 @@ class Deck(models.Model):
 
     def save(self, *args, **kwargs):
         if self.tags:
-            tags = [t.strip().lower() for t in self.tags.split(",") if t.strip()]
-            # Remove duplicates while preserving order
-            seen = set()
-            tags = [t for t in tags if not (t in seen or seen.add(t))]
-            self.tags = ",".join(tags)
+            self.tags = ",".join(normalize_tags(self.tags))
         super().save(*args, **kwargs)
+        sync_tag_index([self])
 
     def __str__(self):
         return self.name
 
 
+def new_random_key():
+    return random.random()
+
+
 class Card(models.Model):
     deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name="cards")
     data = models.JSONField(
@@ -112,16 +199,28 @@ class Card(models.Model):
     solution = models.TextField(blank=True, default="")
     complexity = models.TextField(blank=True, default="")
     tags = models.CharField(max_length=200, blank=True, default="")
+    # uniform in [0, 1); cram mode walks a deck in this order (see flashcards.cram)
+    random_key = models.FloatField(default=new_random_key, editable=False)
+    tag_index = models.ManyToManyField(Tag, related_name="cards", blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deck", "random_key"], name="card_deck_random_key"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        card = super().from_db(db, field_names, values)
+        # the deck it was loaded from, so a move can invalidate both decks
+        card._loaded_deck_id = card.__dict__.get("deck_id")
+        return card
 
     def save(self, *args, **kwargs):
         if self.tags:
-            tags = [t.strip().lower() for t in self.tags.split(",") if t.strip()]
-            # Remove duplicates while preserving order
-            seen = set()
-            tags = [t for t in tags if not (t in seen or seen.add(t))]
-            self.tags = ",".join(tags)
+            self.tags = ",".join(normalize_tags(self.tags))
         self.full_clean()
         super().save(*args, **kwargs)
+        sync_tag_index([self])
 
     def clean(self):
         # enforce that data only contains the fields declared in the deck's CardType
@@ -172,6 +271,73 @@ class UserCard(models.Model):
         unique_together = ("user", "card")
 
 
+class DeckStats(models.Model):
+    """
+    Per-user study counts for one deck, maintained incrementally by
+    flashcards.stats whenever a UserCard's status or due date changes, so the
+    deck list never has to aggregate over UserCard.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="deck_stats"
+    )
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name="stats")
+    total = models.IntegerField(default=0)
+    new_count = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
+    known_count = models.IntegerField(default=0)
+    due_by_day = models.JSONField(
+        blank=True,
+        default=dict,
+        help_text="Number of cards per due date (YYYY-MM-DD); past days are folded into today",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "deck")
+
+    def due_count(self, today=None):
+        today = (today or timezone.localdate()).isoformat()
+        return sum(n for day, n in self.due_by_day.items() if day <= today)
+
+    def as_dict(self, today=None):
+        return {
+            "total": self.total,
+            "due": self.due_count(today),
+            "new": self.new_count,
+            "review": self.review_count,
+            "known": self.known_count,
+        }
+
+
+class DailyUserActivity(models.Model):
+    """
+    One row per user per day with that day's review counts, upserted with F()
+    increments on every review (see flashcards.activity). Heatmaps and
+    retention charts read a date range of these rows instead of scanning
+    review history.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="daily_activity",
+    )
+    date = models.DateField()
+    reviews = models.IntegerField(default=0)
+    again_count = models.IntegerField(default=0)
+    hard_count = models.IntegerField(default=0)
+    good_count = models.IntegerField(default=0)
+    easy_count = models.IntegerField(default=0)
+    new_introduced = models.IntegerField(
+        default=0, help_text="Cards reviewed for the first time on this day"
+    )
+    time_spent_ms = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "date")
+
+
 class ChatGPTRequest(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="chat_requests"
@@ -1,6 +1,30 @@
 from rest_framework.pagination import CursorPagination
 
+
 class CardCursorPagination(CursorPagination):
-    page_size   = 40
-    ordering    = "id"
-    cursor_query_param = "cursor"
\ No newline at end of file
+    page_size = 40
+    ordering = "id"
+    cursor_query_param = "cursor"
+
+    def get_ordering(self, request, queryset, view):
+        # views may order by something other than the id, e.g. a data field
+        ordering = getattr(view, "cursor_ordering", lambda: None)()
+        return ordering or super().get_ordering(request, queryset, view)
+
+
+class UserCardCursorPagination(CardCursorPagination):
+    """
+    Opt-in cursor pagination: lists stay unpaginated unless the request has
+    ?page_size= or a ?cursor= from a previous page.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None, force=False):
+        params = request.query_params
+        if not force and not (
+            self.cursor_query_param in params or self.page_size_query_param in params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view)
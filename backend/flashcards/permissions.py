@@ -1,14 +1,16 @@
 from rest_framework import permissions
 
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
         return obj.owner == request.user
 
+
 class IsDeckOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # allow safe methods
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.deck.owner == request.user
\ No newline at end of file
+        return obj.deck.owner == request.user
@@ -0,0 +1,145 @@
+"""
+Stdlib-only sampling profiler for live workers.
+
+A background thread reads ``sys._current_frames()`` at a fixed rate and counts
+each distinct stack. The result is written in the "collapsed" format that
+flamegraph.pl, speedscope and inferno read: one ``frame;frame;frame count``
+line per stack, outermost frame first.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+PROFILING_DEFAULTS = {
+    "OUTPUT_DIR": None,
+    "DEFAULT_HZ": 100,
+    "MAX_HZ": 1000,
+    "MAX_SECONDS": 60,
+    "SIGNAL_ENABLED": True,
+    "SIGNAL_SECONDS": 30,
+}
+
+
+def profiling_setting(name):
+    return getattr(settings, "PROFILING", {}).get(name, PROFILING_DEFAULTS[name])
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Sample stacks of every thread in the process (or only ``thread_id``)
+    ``hz`` times per second until ``stop()`` is called.
+    """
+
+    def __init__(self, hz=None, thread_id=None):
+        hz = hz or profiling_setting("DEFAULT_HZ")
+        self.interval = 1.0 / min(max(hz, 1), profiling_setting("MAX_HZ"))
+        self.thread_id = thread_id
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="flashcards-stack-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                if frame is not None:
+                    self.counts[collapse(frame)] += 1
+            else:
+                for tid, frame in frames.items():
+                    if tid != own:
+                        self.counts[collapse(frame)] += 1
+            self.samples += 1
+
+
+def sample_process(seconds, hz=None):
+    """Block for ``seconds`` while sampling every other thread in the process."""
+    seconds = min(seconds, profiling_setting("MAX_SECONDS"))
+    sampler = StackSampler(hz=hz).start()
+    time.sleep(seconds)
+    return sampler.stop()
+
+
+def render_collapsed(counts):
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+def output_dir():
+    path = (
+        profiling_setting("OUTPUT_DIR") or Path(settings.BASE_DIR) / "data" / "profiles"
+    )
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_profile(counts, label):
+    """Write collapsed stacks to OUTPUT_DIR and return the file name."""
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+    name = f"{label}-{os.getpid()}-{stamp}.collapsed"
+    (output_dir() / name).write_text(render_collapsed(counts))
+    return name
+
+
+def read_profile(name):
+    """Contents of a profile written by write_profile, or None."""
+    path = output_dir() / os.path.basename(name)
+    if not path.name.endswith(".collapsed") or not path.is_file():
+        return None
+    return path.read_text()
+
+
+def _on_signal(signum, frame):
+    def run():
+        counts = sample_process(profiling_setting("SIGNAL_SECONDS"))
+        write_profile(counts, "signal")
+
+    threading.Thread(target=run, name="flashcards-signal-profile", daemon=True).start()
+
+
+def install_signal_handler(signum=getattr(signal, "SIGUSR2", None)):
+    """
+    ``kill -USR2 <worker pid>`` samples that worker for SIGNAL_SECONDS and
+    writes the result to OUTPUT_DIR. Only the main thread may install signal
+    handlers, so this is a no-op elsewhere (and on platforms without SIGUSR2).
+    """
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, _on_signal)
+    return True
@@ -0,0 +1,260 @@
+"""
+Hand-built read path for the hot list endpoints (/api/cards/ and the
+UserCard list and queue).
+
+``CardSerializer`` runs DRF's field machinery for every row, and its nested
+``DeckSerializer`` loads the deck, its card type with the type's owner and
+all of its card ids again for each card on the page. Here the rows come from
+``.values()`` and are projected into plain dicts; each deck on the page is
+rendered once (one query for the decks with their card types, one for their
+card ids) and shared by its cards. The output is the serializers' JSON, key
+for key, which ``ProjectionContractTest`` checks.
+
+Lists show the front of a card until it is flipped, so by default their
+rows carry only the front of ``data`` (``FrontData``): the fields of the
+card type's ``layout["front"]`` that aren't in ``layout["hidden"]``, picked
+out by the database, with the legacy ``data.<name>`` copies of those fields
+only. The rest of a card, long solutions and code included, comes from
+``GET /api/cards/{id}/back/`` (``split_data``). A card type without a
+front list shows every field on the front and so lists all of ``data``.
+"""
+
+from collections import defaultdict
+
+from django.db.models import F, Func, JSONField
+from rest_framework import serializers
+
+from .instrumentation import span
+
+CARD_VALUES = ("id", "deck_id", "data", "tags")
+# the read-only data.<name> fields of CardSerializer
+LEGACY_FIELDS = (
+    "problem",
+    "difficulty",
+    "category",
+    "hint",
+    "pseudo",
+    "solution",
+    "complexity",
+)
+USERCARD_VALUES = (
+    "id",
+    "ease_factor",
+    "interval",
+    "repetitions",
+    "due_date",
+    "last_rating",
+    "status",
+    *(f"card__{name}" for name in CARD_VALUES),
+)
+FRONT_ALIAS = "front_data"
+
+
+class FrontData(Func):
+    """The front of a card's ``data`` (see the module docstring), as JSON."""
+
+    # NULLs are left out of the hidden list, or NOT IN would match nothing
+    template = (
+        "CASE WHEN JSON_ARRAY_LENGTH(%(layout)s, '$.front') > 0 THEN ("
+        "SELECT JSON_GROUP_OBJECT(d.key, d.value) FROM JSON_EACH(%(data)s) AS d"
+        " WHERE d.key IN (SELECT value FROM JSON_EACH(%(layout)s, '$.front'))"
+        " AND d.key NOT IN (SELECT value FROM JSON_EACH(%(layout)s, '$.hidden')"
+        " WHERE value IS NOT NULL)"
+        ") ELSE %(data)s END"
+    )
+    output_field = JSONField()
+
+    def __init__(self, prefix=""):
+        super().__init__(F(f"{prefix}data"), F(f"{prefix}deck__card_type__layout"))
+
+    def as_sql(self, compiler, connection, template=None, **extra_context):
+        (data, data_params), (layout, layout_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        params = [*layout_params, *data_params, *layout_params, *layout_params]
+        params += data_params
+        sql = (template or self.template) % {"data": data, "layout": layout}
+        return sql, params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template=(
+                "CASE WHEN JSONB_TYPEOF(%(layout)s -> 'front') = 'array'"
+                " AND JSONB_ARRAY_LENGTH(%(layout)s -> 'front') > 0 THEN ("
+                "SELECT COALESCE(JSONB_OBJECT_AGG(d.key, d.value), '{}')"
+                " FROM JSONB_EACH(%(data)s) AS d WHERE d.key IN"
+                " (SELECT JSONB_ARRAY_ELEMENTS_TEXT(%(layout)s -> 'front'))"
+                " AND d.key NOT IN (SELECT JSONB_ARRAY_ELEMENTS_TEXT("
+                "CASE WHEN JSONB_TYPEOF(%(layout)s -> 'hidden') = 'array'"
+                " THEN %(layout)s -> 'hidden' ELSE '[]' END))"
+                ") ELSE %(data)s END"
+            ),
+            **extra_context,
+        )
+
+
+def card_values(queryset, front_only=True, extra=()):
+    """``queryset.values()`` for ``cards``; ``front_only`` reads ``FrontData``."""
+    if not front_only:
+        return queryset.values(*CARD_VALUES, *extra)
+    columns = [name for name in CARD_VALUES if name != "data"]
+    return queryset.values(*columns, *extra, **{FRONT_ALIAS: FrontData()})
+
+
+def usercard_values(queryset, front_only=True):
+    """``queryset.values()`` for ``usercards``; ``front_only`` reads ``FrontData``."""
+    if not front_only:
+        return queryset.values(*USERCARD_VALUES)
+    columns = [name for name in USERCARD_VALUES if name != "card__data"]
+    return queryset.values(*columns, **{FRONT_ALIAS: FrontData("card__")})
+
+
+def front_only(request):
+    """Whether a list lists card fronts: all but ``?data=full`` do."""
+    return request.query_params.get("data") != "full"
+
+
+def front_fields(layout, data):
+    """The keys of ``data`` that ``FrontData`` keeps."""
+    layout = layout if isinstance(layout, dict) else {}
+    front, hidden = layout.get("front"), layout.get("hidden")
+    if not isinstance(front, list) or not front:
+        return list(data)
+    hidden = hidden if isinstance(hidden, list) else [hidden]
+    return [name for name in data if name in front and name not in hidden]
+
+
+def split_data(data, layout):
+    """``(front, back)`` of a card's ``data``: what lists show, and the rest."""
+    front = set(front_fields(layout, data))
+    return (
+        {name: value for name, value in data.items() if name in front},
+        {name: value for name, value in data.items() if name not in front},
+    )
+
+
+# DRF's own formatting (ISO 8601 in the current time zone, "Z" for UTC)
+_datetime = serializers.DateTimeField()
+
+
+def _datetime_rep(value):
+    return None if value is None else _datetime.to_representation(value)
+
+
+def _owned(rep, owner):
+    # ReadOnlyField(source="owner.username") leaves the key out without an owner
+    if owner is not None:
+        rep["owner"] = owner.username
+    return rep
+
+
+def card_type_rep(card_type):
+    """``CardTypeSerializer(card_type).data`` as a plain dict."""
+    rep = {
+        "id": card_type.id,
+        "name": card_type.name,
+        "description": card_type.description,
+        "fields": card_type.fields,
+        "layout": card_type.layout,
+        "indexed_fields": card_type.indexed_fields,
+        "created_at": _datetime_rep(card_type.created_at),
+    }
+    return _owned(rep, card_type.owner)
+
+
+def deck_reps(deck_ids):
+    """``{deck_id: DeckSerializer(deck).data}`` for ``deck_ids``, in two queries."""
+    from .models import Card, Deck
+
+    deck_ids = set(deck_ids)
+    if not deck_ids:
+        return {}
+    # in id order; the serializer's unordered deck.cards.all() comes back in
+    # whichever index order the database picks
+    card_ids = defaultdict(list)
+    for deck_id, card_id in (
+        Card.objects.filter(deck_id__in=deck_ids)
+        .order_by("deck_id", "id")
+        .values_list("deck_id", "id")
+    ):
+        card_ids[deck_id].append(card_id)
+    card_types = {}
+    reps = {}
+    for deck in Deck.all_objects.filter(id__in=deck_ids).select_related(
+        "card_type__owner"
+    ):
+        if deck.card_type_id not in card_types:
+            card_types[deck.card_type_id] = card_type_rep(deck.card_type)
+        # no "owner": with owner in unique_together, DeckSerializer turns
+        # the declared field into a HiddenField
+        reps[deck.id] = {
+            "id": deck.id,
+            "name": deck.name,
+            "description": deck.description,
+            "created_at": _datetime_rep(deck.created_at),
+            "cards": card_ids[deck.id],
+            "shared": deck.shared,
+            "tags": deck.tags,
+            "card_type": card_types[deck.card_type_id],
+        }
+    return reps
+
+
+def _card(row, decks, prefix=""):
+    data = row[f"{prefix}data"] if f"{prefix}data" in row else row[FRONT_ALIAS]
+    rep = {
+        "id": row[f"{prefix}id"],
+        "deck": decks[row[f"{prefix}deck_id"]],
+        "data": data,
+    }
+    for name in LEGACY_FIELDS:
+        # a missing key leaves the field out, as source="data.<name>" does
+        if name in data:
+            value = data[name]
+            rep[name] = None if value is None else str(value)
+    rep["tags"] = row[f"{prefix}tags"]
+    return rep
+
+
+def _decks(deck_ids, known):
+    """Deck reps for ``deck_ids``, rendering only those not in ``known`` yet."""
+    if known is None:
+        return deck_reps(deck_ids)
+    known.update(deck_reps(set(deck_ids) - known.keys()))
+    return known
+
+
+def cards(rows, decks=None):
+    """
+    ``CardSerializer(cards, many=True).data`` for ``card_values`` rows.
+    ``decks`` keeps rendered decks across calls.
+    """
+    with span("serialize"):
+        rows = list(rows)
+        decks = _decks([row["deck_id"] for row in rows], decks)
+        return [_card(row, decks) for row in rows]
+
+
+def usercards(rows, decks=None):
+    """
+    ``UserCardSerializer(usercards, many=True).data`` for
+    ``usercard_values`` rows. ``decks`` keeps rendered decks across calls.
+    """
+    with span("serialize"):
+        rows = list(rows)
+        decks = _decks([row["card__deck_id"] for row in rows], decks)
+        return [
+            {
+                "id": row["id"],
+                "card": _card(row, decks, "card__"),
+                "ease_factor": row["ease_factor"],
+                "interval": row["interval"],
+                "repetitions": row["repetitions"],
+                "due_date": _datetime_rep(row["due_date"]),
+                "last_rating": row["last_rating"],
+                "status": row["status"],
+            }
+            for row in rows
+        ]
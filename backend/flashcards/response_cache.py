@@ -0,0 +1,108 @@
+"""
+Per-user versioned response cache for list endpoints that rarely change.
+
+Every user has a *collection version* in the RESPONSE_CACHE["ALIAS"] cache,
+replaced by signals whenever one of their decks, cards or card types (or
+their deck stats) is written. List responses carry an ETag derived from it,
+so a reload with ``If-None-Match`` is answered with a 304 after one cache
+lookup, and serialized bodies are cached under that ETag, so a stale body
+can never be served.
+
+Versions are random tokens rather than counters: a version that was evicted
+from the cache comes back as a new token, never as an old one.
+
+The cache alias is a normal Django cache. locmem is only coherent within a
+single process; gunicorn.conf.py switches to the file-based backend, and
+RedisCache (or any Redis-compatible server) works as well.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+
+RESPONSE_CACHE_DEFAULTS = {
+    "ALIAS": "default",
+    "TIMEOUT": 24 * 60 * 60,
+}
+# changes that affect every user (e.g. a full DeckStats rebuild)
+GLOBAL = "*"
+
+
+def response_cache_setting(name):
+    return getattr(settings, "RESPONSE_CACHE", {}).get(
+        name, RESPONSE_CACHE_DEFAULTS[name]
+    )
+
+
+def cache():
+    return caches[response_cache_setting("ALIAS")]
+
+
+def version_key(user_id):
+    return f"flashcards:collection-version:{user_id}"
+
+
+def bump(user_ids):
+    """Invalidate the cached lists of ``user_ids`` (None: of every user)."""
+    if user_ids is None:
+        user_ids = [GLOBAL]
+    keys = {version_key(u): uuid.uuid4().hex for u in set(user_ids) if u is not None}
+    if keys:
+        cache().set_many(keys, timeout=None)
+
+
+def collection_version(user_id):
+    """``(user version, global version)`` in one cache round trip."""
+    keys = [version_key(user_id), version_key(GLOBAL)]
+    found = cache().get_many(keys)
+    missing = {k: uuid.uuid4().hex for k in keys if k not in found}
+    for key, token in missing.items():
+        # add() so that two requests racing here agree on one token
+        if not cache().add(key, token, timeout=None):
+            token = cache().get(key, token)
+        found[key] = token
+    return tuple(found[k] for k in keys)
+
+
+class VersionedListMixin:
+    """
+    ETag / 304 and cached bodies for ``list()``. Subclasses may extend
+    ``cache_vary()`` with anything else the response depends on.
+    """
+
+    def cache_vary(self):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        basis = [
+            type(self).__name__,
+            request.user.id,
+            request.get_full_path(),
+            *collection_version(request.user.id),
+            *self.cache_vary(),
+        ]
+        digest = hashlib.sha256(repr(basis).encode()).hexdigest()[:32]
+        etag = f'"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = f"flashcards:response:{digest}"
+        data = cache().get(key)
+        metrics.record_cache("responses", data is not None)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache().set(key, data, timeout=response_cache_setting("TIMEOUT"))
+        return Response(data, headers=headers)
@@ -0,0 +1,85 @@
+"""
+Review scheduling for UserCard.
+
+``schedule`` is the pure scheduling rule. ``apply_review`` writes its result
+with one conditional UPDATE whose WHERE clause repeats the state the rule was
+computed from (compare-and-swap). If another request reviewed the card in
+between, the UPDATE matches no row, the card is re-read and the rule is
+applied again on top of the newer state, so concurrent reviews never
+overwrite each other.
+"""
+
+from django.utils import timezone
+from rest_framework import status as http_status
+from rest_framework.exceptions import APIException
+
+from .models import UserCard
+
+REVIEW_FIELDS = (
+    "ease_factor",
+    "interval",
+    "repetitions",
+    "due_date",
+    "last_rating",
+    "status",
+)
+MAX_ATTEMPTS = 10
+
+
+class ReviewConflict(APIException):
+    status_code = http_status.HTTP_409_CONFLICT
+    default_detail = "The card was updated concurrently, please retry."
+    default_code = "conflict"
+
+
+def snapshot(usercard):
+    return {field: getattr(usercard, field) for field in REVIEW_FIELDS}
+
+
+def schedule(state, rating=None, status=None, now=None):
+    """
+    New values for REVIEW_FIELDS after a review with ``rating`` and/or a
+    status change, given the current ``state`` (as returned by snapshot).
+    """
+    new = dict(state)
+    if status is not None:
+        new["status"] = status
+    if rating is None:
+        return new
+    new["last_rating"] = rating
+    if not rating:
+        return new
+    if rating == "easy":
+        new["interval"] = max(state["interval"] * 2, 1)
+        new["ease_factor"] = state["ease_factor"] + 0.15
+    elif rating == "good":
+        new["interval"] = max(state["interval"] + 1, 1)
+    elif rating == "hard":
+        new["interval"] = 1
+        new["ease_factor"] = max(state["ease_factor"] - 0.15, 1.3)
+    else:  # again
+        new["interval"] = 0
+    new["repetitions"] = (state["repetitions"] + 1) if rating != "again" else 0
+    new["due_date"] = (now or timezone.now()) + timezone.timedelta(days=new["interval"])
+    return new
+
+
+def apply_review(usercard, rating=None, status=None, attempts=MAX_ATTEMPTS):
+    """
+    Apply a review to ``usercard`` and update the instance in place. Returns
+    the state the review was applied to, which is not necessarily the state
+    the instance was loaded with.
+    """
+    for _ in range(attempts):
+        before = snapshot(usercard)
+        after = schedule(before, rating, status)
+        if after == before:
+            return before
+        changes = {f: v for f, v in after.items() if v != before[f]}
+        rows = UserCard.objects.filter(pk=usercard.pk, **before)
+        if rows.update(**changes):
+            for field, value in changes.items():
+                setattr(usercard, field, value)
+            return before
+        usercard.refresh_from_db(fields=REVIEW_FIELDS)
+    raise ReviewConflict()
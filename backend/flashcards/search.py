@@ -0,0 +1,179 @@
+"""
+Full-text search over Card.data.
+
+On SQLite the cards are indexed in an FTS5 table, ``flashcards_card_fts``,
+whose rowid is the card id. It has two columns: ``content`` (every value of
+``data`` plus the tags) and ``deck`` (a ``d<deck id>`` token, so visibility
+is an index intersection instead of a post-filter). Triggers on
+flashcards_card keep it in sync (migration 0005), which also covers
+bulk_create() and queryset update()s that send no signals. Migrations that
+make SQLite rebuild flashcards_card drop those triggers, so ``ensure_index``
+runs after every migrate and recreates them. Results are
+ordered by bm25 and come with an HTML-safe snippet, with the matched terms
+wrapped in ``<mark>``.
+
+Other databases fall back to ``icontains`` on ``data``: there are no
+ranks or snippets, and the search scans the table.
+"""
+
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = "flashcards_card_fts"
+MAX_RESULTS = 100
+# private-use code points, swapped for <mark> after escaping the snippet
+_OPEN, _CLOSE = "\ue000", "\ue001"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _indexed_text(row=""):
+    """SQL for a card's indexed columns; ``row`` is ``new.`` inside triggers."""
+    content = (
+        f"coalesce((SELECT group_concat(value, char(10)) FROM json_each({row}data)),"
+        f" '') || char(10) || {row}tags"
+    )
+    return f"{content}, 'd' || {row}deck_id"
+
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, deck, tokenize = 'porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS flashcards_card_fts_insert
+    AFTER INSERT ON flashcards_card
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, content, deck)
+        VALUES (new.id, {_indexed_text("new.")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS flashcards_card_fts_update
+    AFTER UPDATE OF data, tags, deck_id ON flashcards_card
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE} (rowid, content, deck)
+        VALUES (new.id, {_indexed_text("new.")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS flashcards_card_fts_delete
+    AFTER DELETE ON flashcards_card
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+]
+REBUILD_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, content, deck)
+    SELECT id, {_indexed_text()} FROM flashcards_card
+    """,
+]
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS flashcards_card_fts_delete",
+    "DROP TRIGGER IF EXISTS flashcards_card_fts_update",
+    "DROP TRIGGER IF EXISTS flashcards_card_fts_insert",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def uses_fts(conn=connection):
+    return conn.vendor == "sqlite"
+
+
+def terms(q):
+    return _WORD.findall(q or "")
+
+
+def match_expression(words, deck_ids):
+    """
+    FTS5 query for ``words`` (all required, the last one as a prefix so
+    results show up while typing) restricted to ``deck_ids``. Every word is
+    quoted, so user input can never be FTS5 syntax.
+    """
+    quoted = [f'"{w}"' for w in words]
+    quoted[-1] += "*"
+    decks = " OR ".join(f"d{int(d)}" for d in deck_ids)
+    return f"content : ({' AND '.join(quoted)}) AND deck : ({decks})"
+
+
+def highlight(snippet):
+    escaped = html.escape(snippet)
+    return escaped.replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search(q, deck_ids, limit=20):
+    """
+    ``[(card_id, rank, snippet_html)]`` for cards in ``deck_ids`` matching
+    every word of ``q``, best match first (lower rank is better).
+    """
+    words = terms(q)
+    deck_ids = list(deck_ids)
+    if not words or not deck_ids:
+        return []
+    limit = min(limit, MAX_RESULTS)
+    if not uses_fts():
+        from .models import Card
+
+        qs = Card.objects.filter(deck_id__in=deck_ids)
+        for word in words:
+            qs = qs.filter(Q(data__icontains=word) | Q(tags__icontains=word))
+        return [
+            (card_id, None, None) for card_id in qs.values_list("id", flat=True)[:limit]
+        ]
+
+    sql = f"""
+        SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, '…', 16)
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY rank
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_OPEN, _CLOSE, match_expression(words, deck_ids), limit])
+        return [
+            (card_id, rank, highlight(snippet))
+            for card_id, rank, snippet in cursor.fetchall()
+        ]
+
+
+TRIGGERS = [
+    "flashcards_card_fts_insert",
+    "flashcards_card_fts_update",
+    "flashcards_card_fts_delete",
+]
+
+
+def ensure_index(conn=connection):
+    """
+    Create whatever is missing of the index and re-index every card if the
+    triggers were gone. Returns True if anything had to be recreated.
+    """
+    if not uses_fts(conn):
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+            [FTS_TABLE, *TRIGGERS],
+        )
+        if len(cursor.fetchall()) == 1 + len(TRIGGERS):
+            return False
+        for statement in CREATE_SQL + REBUILD_SQL:
+            cursor.execute(statement)
+    return True
+
+
+def rebuild():
+    """Re-index every card (after restoring a dump made without the table)."""
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        for statement in REBUILD_SQL:
+            cursor.execute(statement)
@@ -1,6 +1,8 @@
 from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from . import activity, datafields, metrics, scheduling, stats
+from .instrumentation import TimedSerializerMixin
 from .models import Deck, Card, UserCard, CardType
 import jsonschema
 
@@ -33,7 +35,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class CardTypeSerializer(serializers.ModelSerializer):
+class CardTypeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source="owner.username")
 
     class Meta:
@@ -44,6 +46,7 @@ class CardTypeSerializer(serializers.ModelSerializer):
             "description",
             "fields",
             "layout",
+            "indexed_fields",
             "created_at",
             "owner",
         ]
@@ -63,6 +66,36 @@ class CardTypeSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     {"fields": "Field names must be unique."}
                 )
+        indexed = data.get("indexed_fields")
+        if indexed is not None:
+            known = (
+                fields if fields is not None else getattr(self.instance, "fields", [])
+            )
+            if not isinstance(indexed, list) or any(
+                f not in known or not datafields.valid_field(f) for f in indexed
+            ):
+                raise serializers.ValidationError(
+                    {
+                        "indexed_fields": "Indexed fields must be fields of this card type "
+                        "(letters, digits, spaces, '-' and '_')."
+                    }
+                )
+            data["indexed_fields"] = list(dict.fromkeys(indexed))
+            limit = datafields.data_fields_setting("MAX_PER_OWNER")
+            if (
+                owner is not None
+                and len(
+                    datafields.owner_fields(owner, exclude=self.instance)
+                    | set(data["indexed_fields"])
+                )
+                > limit
+            ):
+                raise serializers.ValidationError(
+                    {
+                        "indexed_fields": f"At most {limit} indexed fields across "
+                        "your card types."
+                    }
+                )
         if owner and name:
             qs = CardType.objects.filter(owner=owner, name=name)
             if self.instance:
@@ -83,7 +116,7 @@ class CardTypeSerializer(serializers.ModelSerializer):
         return data
 
 
-class DeckSerializer(serializers.ModelSerializer):
+class DeckSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     cards = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     owner = serializers.ReadOnlyField(source="owner.username")
     shared = serializers.BooleanField(required=False)
@@ -132,10 +165,20 @@ class DeckSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         rep["card_type"] = CardTypeSerializer(instance.card_type).data
+        if self.context.get("include_stats"):
+            rep["stats"] = self.get_stats(instance)
         return rep
 
+    def get_stats(self, instance):
+        # DeckViewSet prefetches the requesting user's row as `user_stats`
+        rows = getattr(instance, "user_stats", None)
+        if rows is None:
+            request = self.context.get("request")
+            rows = list(instance.stats.filter(user=request.user)) if request else []
+        return rows[0].as_dict() if rows else stats.empty_stats()
 
-class CardSerializer(serializers.ModelSerializer):
+
+class CardSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     data = serializers.JSONField()
     # Still return the old field names for reads:
     problem = serializers.CharField(source="data.problem", read_only=True)
@@ -207,12 +250,18 @@ class CardSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class UserCardSerializer(serializers.ModelSerializer):
+class UserCardSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     # embed the card data
     card = CardSerializer(read_only=True)
     # accept a write-only 'last_rating' field so the client can send Again/Good/Easy/etc.
-    last_rating = serializers.CharField(required=False, allow_null=True)
+    last_rating = serializers.ChoiceField(
+        choices=UserCard.RATING_CHOICES, required=False, allow_null=True
+    )
     status = serializers.CharField(required=False)
+    # optional: how long the card was on screen, for the daily activity rollup
+    time_spent_ms = serializers.IntegerField(
+        required=False, min_value=0, write_only=True
+    )
 
     class Meta:
         model = UserCard
@@ -225,6 +274,7 @@ class UserCardSerializer(serializers.ModelSerializer):
             "due_date",
             "last_rating",
             "status",
+            "time_spent_ms",
         ]
         read_only_fields = [
             "ease_factor",
@@ -234,36 +284,24 @@ class UserCardSerializer(serializers.ModelSerializer):
         ]
 
     def update(self, instance, validated_data):
-        # 1) pull the rating out of the payload
         rating = validated_data.pop("last_rating", None)
         status = validated_data.pop("status", None)
-        # 2) store it on the model
-        if rating is not None:
-            instance.last_rating = rating
-        if status is not None:
-            instance.status = status
+        time_spent_ms = validated_data.pop("time_spent_ms", 0)
 
-        # 3) scheduling logic (SM-2, etc.)
+        # one conditional UPDATE, retried on top of any concurrent review
+        before = scheduling.apply_review(instance, rating, status)
         if rating:
-            if rating == "easy":
-                instance.interval = max(instance.interval * 2, 1)
-                instance.ease_factor += 0.15
-            elif rating == "good":
-                instance.interval = max(instance.interval + 1, 1)
-            elif rating == "hard":
-                instance.interval = 1
-                instance.ease_factor = max(instance.ease_factor - 0.15, 1.3)
-            else:  # again
-                instance.interval = 0
-            instance.repetitions = (
-                (instance.repetitions + 1) if rating != "again" else 0
-            )
-            instance.due_date = timezone.now() + timezone.timedelta(
-                days=instance.interval
-            )
-
-        # 4) make sure your last_rating + scheduling changes get persisted
-        instance.save()
+            metrics.REVIEWS.labels(rating).inc()
 
-        # 5) let DRF save any other writable fields (none in this case)
-        return super().update(instance, validated_data)
+        stats.record_transition(
+            instance.user_id,
+            instance.card.deck_id,
+            stats.state_of(before["status"], before["due_date"]),
+            stats.state_of(instance.status, instance.due_date),
+        )
+        if rating in activity.RATING_COUNTERS:
+            first_review = not before["last_rating"] and before["repetitions"] == 0
+            activity.record_review(
+                instance.user_id, rating, first_review, time_spent_ms
+            )
+        return instance
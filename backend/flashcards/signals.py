@@ -1,8 +1,11 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from . import datafields, facets, response_cache, search, starter, stats
 from .models import Deck, Card, UserCard, CardType
 
 User = settings.AUTH_USER_MODEL
@@ -33,6 +36,7 @@ def bootstrap_user(sender, instance, created, **kwargs):
                 "back": ["pseudo", "solution", "complexity"],
                 "hidden": ["hint"],
             },
+            "indexed_fields": ["difficulty", "category"],
         },
     )
     # 2) Create an empty personal deck for the new user with a valid card_type
@@ -58,6 +62,60 @@ def bootstrap_user(sender, instance, created, **kwargs):
         UserCard.objects.get_or_create(
             user=instance, card=card, defaults={"due_date": now}
         )
+    stats.rebuild(user_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=Deck)
+def starter_deck_changed(sender, instance, **kwargs):
+    if starter.is_starter_deck(instance):
+        starter.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Card)
+def starter_card_changed(sender, instance, **kwargs):
+    # bulk_create/update send no signals; import_anki bumps the version itself
+    if instance.deck_id == starter.starter_deck_id():
+        starter.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Deck)
+@receiver([post_save, post_delete], sender=CardType)
+def owner_collection_changed(sender, instance, **kwargs):
+    response_cache.bump([instance.owner_id])
+
+
+@receiver([post_save, post_delete], sender=Card)
+def card_collection_changed(sender, instance, **kwargs):
+    # deck lists embed their card ids
+    try:
+        owner_id = instance.deck.owner_id
+    except Deck.DoesNotExist:
+        return  # deleted along with its deck, which bumped already
+    response_cache.bump([owner_id])
+
+
+@receiver([post_save, post_delete], sender=Card)
+def card_facets_changed(sender, instance, **kwargs):
+    # a card moved to another deck changes the facets of both
+    facets.bump_decks([instance.deck_id, getattr(instance, "_loaded_deck_id", None)])
+
+
+@receiver(stats.deck_stats_changed)
+def deck_stats_collection_changed(sender, user_ids, **kwargs):
+    # deck lists embed the requesting user's stats
+    response_cache.bump(user_ids)
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, using, **kwargs):
+    if sender.name != "flashcards":
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ("flashcards", "0005_card_search") in applied:
+        search.ensure_index(connection)
+    if ("flashcards", "0007_cardtype_indexed_fields") in applied:
+        datafields.ensure_indexes(connection)
 
 
 # @receiver(post_save, sender=settings.AUTH_USER_MODEL)
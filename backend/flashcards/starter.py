@@ -0,0 +1,132 @@
+"""
+Process-local cache of the shared Starter Deck.
+
+The Starter Deck is identical for every user and changes only when it is
+re-imported (import_anki) or edited, so its id and its serialized card pages
+are cached per *content version*. The version is a token in a small file
+(STARTER_DECK["VERSION_FILE"]) that every change replaces; each request only
+stats that file, which keeps all gunicorn workers coherent without a query.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from . import metrics
+
+STARTER_DECK_DEFAULTS = {
+    "VERSION_FILE": None,
+    "MAX_PAGES": 512,
+}
+
+
+def starter_setting(name):
+    return getattr(settings, "STARTER_DECK", {}).get(name, STARTER_DECK_DEFAULTS[name])
+
+
+def version_file():
+    return Path(
+        starter_setting("VERSION_FILE")
+        or Path(settings.BASE_DIR) / "data" / "starter_deck.version"
+    )
+
+
+_lock = threading.Lock()
+_state = {"stamp": None, "version": None, "deck_id": None, "pages": {}}
+
+
+def _stamp(path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def current_version():
+    """
+    The current content version. Drops every cached value when another
+    process (or this one) has bumped it since the last call.
+    """
+    path = version_file()
+    stamp = _stamp(path)
+    with _lock:
+        if stamp != _state["stamp"] or _state["version"] is None:
+            try:
+                version = path.read_text().strip() or "0"
+            except FileNotFoundError:
+                version = "0"
+            _state.update(stamp=stamp, version=version, deck_id=None, pages={})
+        return _state["version"]
+
+
+def bump_version():
+    """Invalidate the cached Starter Deck in every process."""
+    path = version_file()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(uuid.uuid4().hex)
+    # a rename gives the file a new inode, so _stamp always sees the change
+    os.replace(tmp, path)
+    current_version()
+
+
+def invalidate():
+    """
+    Bump now, so this transaction stops serving the old content, and again
+    on commit, so no other worker caches the old rows in between.
+    """
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def starter_deck_id():
+    """Id of the shared Starter Deck (or None), queried once per version."""
+    from .models import Deck
+
+    current_version()
+    with _lock:
+        if _state["deck_id"] is not None:
+            return _state["deck_id"] or None
+    deck_id = (
+        Deck.objects.filter(name="Starter Deck", owner=None)
+        .values_list("id", flat=True)
+        .first()
+    )
+    with _lock:
+        _state["deck_id"] = deck_id or 0
+    return deck_id
+
+
+def is_starter_deck(deck):
+    return deck.owner_id is None and deck.name == "Starter Deck"
+
+
+def etag_for(version, key):
+    digest = hashlib.sha256(f"{version}:{key}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def cached_page(key, render):
+    """
+    ``(data, etag)`` for the page identified by ``key``, calling
+    ``render()`` (which returns the page data) only on a miss.
+    """
+    version = current_version()
+    with _lock:
+        data = _state["pages"].get(key)
+    metrics.record_cache("starter_pages", data is not None)
+    if data is None:
+        data = render()
+        with _lock:
+            if _state["version"] == version:
+                pages = _state["pages"]
+                while len(pages) >= starter_setting("MAX_PAGES"):
+                    pages.pop(next(iter(pages)))
+                pages[key] = data
+    return data, etag_for(version, key)
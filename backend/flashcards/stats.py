@@ -0,0 +1,130 @@
+"""
+Maintenance of the materialized DeckStats table.
+
+A UserCard contributes to its deck's stats through its *state*: the pair
+(status, due day). Write paths call ``record_transition`` with the state before
+and after the write (``None`` for a created or deleted row); set-based writes
+call ``rebuild`` for the users/decks they touched instead.
+
+Both send ``deck_stats_changed`` once the new counts are committed (see
+flashcards.live).
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.dispatch import Signal
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DeckStats, UserCard
+
+STATUS_COUNTERS = {
+    "new": "new_count",
+    "review": "review_count",
+    "known": "known_count",
+}
+
+# sent with user_ids=[...] or None (all users) and deck_ids=[...] or None
+deck_stats_changed = Signal()
+
+
+def _changed(user_ids, deck_ids):
+    transaction.on_commit(
+        lambda: deck_stats_changed.send(
+            sender=DeckStats, user_ids=user_ids, deck_ids=deck_ids
+        )
+    )
+
+
+def state_of(status, due_date):
+    """The part of a UserCard that DeckStats aggregates."""
+    return status, timezone.localdate(due_date).isoformat()
+
+
+def _fold_past_days(due_by_day, today):
+    """Merge buckets for days before today into today's bucket."""
+    folded = {}
+    for day, n in due_by_day.items():
+        key = max(day, today)
+        folded[key] = folded.get(key, 0) + n
+    return {day: n for day, n in folded.items() if n}
+
+
+def _apply(stats, state, delta):
+    status, day = state
+    stats.total += delta
+    field = STATUS_COUNTERS.get(status)
+    if field:
+        setattr(stats, field, getattr(stats, field) + delta)
+    stats.due_by_day[day] = stats.due_by_day.get(day, 0) + delta
+
+
+def record_transition(user_id, deck_id, before, after):
+    """
+    Move one UserCard's contribution from ``before`` to ``after`` (either may
+    be None). Must be called after the UserCard write: a missing stats row is
+    rebuilt from UserCard, which already includes the change.
+    """
+    if before == after:
+        return
+    with transaction.atomic():
+        stats = (
+            DeckStats.objects.select_for_update()
+            .filter(user_id=user_id, deck_id=deck_id)
+            .first()
+        )
+        if stats is None:
+            rebuild(user_ids=[user_id], deck_ids=[deck_id])
+            return
+        if before is not None:
+            _apply(stats, before, -1)
+        if after is not None:
+            _apply(stats, after, +1)
+        stats.due_by_day = _fold_past_days(
+            stats.due_by_day, timezone.localdate().isoformat()
+        )
+        stats.save()
+        _changed([user_id], [deck_id])
+
+
+def rebuild(user_ids=None, deck_ids=None):
+    """
+    Recompute DeckStats from UserCard with one grouped query, for all rows or
+    only the given users and/or decks. Returns the number of stats rows written.
+    """
+    usercards = UserCard.objects.all()
+    existing = DeckStats.objects.all()
+    if user_ids is not None:
+        usercards = usercards.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+    if deck_ids is not None:
+        usercards = usercards.filter(card__deck_id__in=deck_ids)
+        existing = existing.filter(deck_id__in=deck_ids)
+
+    grouped = (
+        usercards.annotate(day=TruncDate("due_date"))
+        .values("user_id", "card__deck_id", "status", "day")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    today = timezone.localdate().isoformat()
+    rows = defaultdict(lambda: DeckStats(due_by_day={}))
+    for row in grouped:
+        key = (row["user_id"], row["card__deck_id"])
+        stats = rows[key]
+        stats.user_id, stats.deck_id = key
+        _apply(stats, (row["status"], row["day"].isoformat()), row["n"])
+    for stats in rows.values():
+        stats.due_by_day = _fold_past_days(stats.due_by_day, today)
+
+    with transaction.atomic():
+        existing.delete()
+        DeckStats.objects.bulk_create(rows.values(), batch_size=1000)
+        _changed(user_ids, deck_ids)
+    return len(rows)
+
+
+def empty_stats():
+    return {"total": 0, "due": 0, "new": 0, "review": 0, "known": 0}
@@ -0,0 +1,123 @@
+"""
+Streamed responses for the unbounded UserCard lists.
+
+The UserCard list (when not paginated) and the queue return every row of
+the user's collection. Instead of building that list in memory, the rows
+are read with ``iterator(chunk_size=...)`` and projected
+(flashcards.projections) and encoded (flashcards.fastjson) one chunk at a
+time, so a worker holds one chunk of rows, the decks rendered so far and
+about BUFFER_BYTES of output, whatever the collection's size, and the first
+bytes go out after the first chunk.
+
+The body is the JSON the endpoint always returned (an array, or the
+queue's ``{"results": [...]}``), or with ``Accept: application/x-ndjson``
+one UserCard object per line. Under ASGI the chunks are produced through
+``sync_to_async``; Django would otherwise read a synchronous iterator to
+the end before sending anything.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import renderers
+
+from . import fastjson, instrumentation, projections
+
+CHUNK_SIZE = 2000
+# rows are encoded one by one and sent in parts of about this size, as a
+# row embeds its deck's card ids and may be large
+BUFFER_BYTES = 256 * 1024
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """One JSON document per line: each item of a list, or the data itself."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        renderer = fastjson.JSONRenderer()
+        return b"".join(renderer.render(row) + b"\n" for row in rows)
+
+
+def streams(request):
+    """Whether the negotiated format can be streamed (not the browsable API)."""
+    return isinstance(
+        request.accepted_renderer, (renderers.JSONRenderer, NDJSONRenderer)
+    )
+
+
+def usercard_chunks(queryset, chunk_size=None, front_only=True):
+    """Lists of projected UserCards of ``queryset``, ``chunk_size`` at a time."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    decks = {}
+    rows = []
+    values = projections.usercard_values(queryset, front_only)
+    for row in values.iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield projections.usercards(rows, decks)
+            rows = []
+    if rows:
+        yield projections.usercards(rows, decks)
+
+
+def _buffered(pieces):
+    """Join consecutive byte strings into parts of about BUFFER_BYTES."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= BUFFER_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def json_array(chunks, key=None):
+    """A JSON array of the items of ``chunks``, optionally as ``{key: [...]}``."""
+    renderer = fastjson.JSONRenderer()
+
+    def pieces():
+        yield (b"{" + renderer.render(key) + b":[") if key else b"["
+        separator = b""
+        for chunk in chunks:
+            for item in chunk:
+                yield separator + renderer.render(item)
+                separator = b","
+        yield b"]}" if key else b"]"
+
+    return _buffered(pieces())
+
+
+def ndjson(chunks):
+    renderer = fastjson.JSONRenderer()
+    return _buffered(
+        renderer.render(item) + b"\n" for chunk in chunks for item in chunk
+    )
+
+
+async def _asynchronous(parts):
+    done = object()
+    while (part := await sync_to_async(next)(parts, done)) is not done:
+        yield part
+
+
+def usercards_response(request, queryset, key=None, chunk_size=None, front_only=True):
+    """
+    Stream the UserCards of ``queryset`` in the negotiated format (see
+    ``streams``); ``key`` wraps the JSON array in an object.
+    """
+    chunks = usercard_chunks(queryset, chunk_size, front_only)
+    if isinstance(request.accepted_renderer, NDJSONRenderer):
+        parts, content_type = ndjson(chunks), NDJSONRenderer.media_type
+    else:
+        parts, content_type = json_array(chunks, key), "application/json"
+    # SQL run while producing the body still counts towards the request
+    parts = instrumentation.collecting(parts)
+    if isinstance(request._request, ASGIRequest):
+        parts = _asynchronous(parts)
+    return StreamingHttpResponse(parts, content_type=content_type)
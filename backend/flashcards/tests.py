@@ -1,12 +1,68 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from flashcards.models import CardType, Deck, Card
-from flashcards.serializers import CardSerializer, CardTypeSerializer
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from asgiref.sync import sync_to_async
+from flashcards import (
+    card_data,
+    cloning,
+    datafields,
+    deletion,
+    fastjson,
+    live,
+    projections,
+    scheduling,
+    stats,
+    streaming,
+)
+from flashcards.models import (
+    CardType,
+    Deck,
+    Card,
+    DailyUserActivity,
+    DeckStats,
+    UserCard,
+)
+from flashcards.serializers import (
+    CardSerializer,
+    CardTypeSerializer,
+    UserCardSerializer,
+)
+from flashcards.profiling import StackSampler, render_collapsed
+from rest_framework import parsers as drf_parsers, renderers as drf_renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
 User = get_user_model()
 
 
+def streamed_json(response):
+    """The JSON body of a (streamed) UserCard list response."""
+    return json.loads(b"".join(response.streaming_content))
+
+
 class CardSerializerSchemaValidationTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testuser", password="pw123456")
@@ -307,3 +363,1784 @@ class PermissionsTest(TestCase):
         self.assertEqual(r.status_code, 404)
         r = self.client.delete(url)
         self.assertEqual(r.status_code, 404)
+
+
+class SeedScaleCommandTest(TestCase):
+    def test_seeds_users_decks_cards_and_usercards(self):
+        call_command(
+            "seed_scale",
+            users=3,
+            decks_per_user=2,
+            cards_per_deck=4,
+            starter_cards=5,
+            seed=1,
+            stdout=StringIO(),
+        )
+        users = User.objects.filter(username__startswith="load")
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Deck.objects.filter(owner__in=users).count(), 6)
+        self.assertEqual(Card.objects.filter(deck__owner__in=users).count(), 24)
+        # own cards + starter cards for every user
+        self.assertEqual(UserCard.objects.count(), 3 * (8 + 5))
+        self.assertTrue(UserCard.objects.filter(status="new").exists())
+        self.assertTrue(UserCard.objects.exclude(last_rating="").exists())
+
+    def test_refuses_existing_prefix(self):
+        User.objects.create_user(username="load0000000", password="pw123456")
+        with self.assertRaises(CommandError):
+            call_command("seed_scale", users=1, stdout=StringIO())
+
+
+class LoadReviewsCommandTest(TransactionTestCase):
+    # The in-memory test database uses shared-cache table locks, which fail
+    # concurrent writers immediately instead of waiting, so drive it from a
+    # single thread here.
+    def test_reports_latency_per_endpoint(self):
+        call_command(
+            "seed_scale", users=2, decks_per_user=1, cards_per_deck=3, stdout=StringIO()
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "run.json"
+            call_command(
+                "load_reviews",
+                threads=1,
+                sessions=4,
+                reviews_per_session=2,
+                output=str(output),
+                seed=3,
+                stdout=StringIO(),
+            )
+            report = json.loads(output.read_text())
+        endpoints = report["endpoints"]
+        self.assertEqual(endpoints["GET queue"]["count"], 8)
+        self.assertEqual(endpoints["GET queue"]["errors"], 0)
+        self.assertEqual(endpoints["PUT usercard"]["errors"], 0)
+        for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            self.assertIn(key, endpoints["GET queue"])
+
+
+class RequestTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="timed", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="T", fields=["f"])
+        deck = Deck.objects.create(name="D", card_type=card_type, owner=self.user)
+        card = Card.objects.create(deck=deck, data={"f": "v"})
+        self.usercard = UserCard.objects.create(user=self.user, card=card)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        r = self.client.get(f"/api/usercards/{self.usercard.id}/")
+        self.assertEqual(r.status_code, 200)
+        header = r["Server-Timing"]
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("serialize;dur=", header)
+        self.assertIn("view;dur=", header)
+        self.assertIn("total;dur=", header)
+
+    def test_slow_request_logs_top_sql(self):
+        timing = {"SAMPLE_RATE": 1.0, "SLOW_REQUEST_MS": 0, "TOP_SQL": 2}
+        with self.settings(REQUEST_TIMING=timing):
+            with self.assertLogs("flashcards.timing", level="WARNING") as logs:
+                streamed_json(self.client.get("/api/usercards/queue/"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "usercard-queue")
+        self.assertGreater(record["queries"], 0)
+        self.assertLessEqual(len(record["top_sql"]), 2)
+        self.assertIn("count", record["top_sql"][0])
+
+    def test_streamed_responses_are_logged_once_sent(self):
+        timing = {"SAMPLE_RATE": 1.0, "SLOW_REQUEST_MS": 0}
+        with self.settings(REQUEST_TIMING=timing):
+            with self.assertLogs("flashcards.timing", level="WARNING") as logs:
+                r = self.client.get("/api/usercards/")
+                self.assertEqual(logs.records, [])
+                header = r["Server-Timing"]
+                self.assertIn("headers;dur=", header)
+                self.assertNotIn("total;dur=", header)
+                streamed_json(r)
+        (record,) = [json.loads(log.getMessage()) for log in logs.records]
+        self.assertTrue(record["streamed"])
+        # the body's SELECTs count too
+        before = int(re.search(r'desc="(\d+) queries"', header).group(1))
+        self.assertGreater(record["queries"], before)
+
+    def test_unsampled_requests_are_untouched(self):
+        with self.settings(REQUEST_TIMING={"SAMPLE_RATE": 0.0}):
+            r = self.client.get("/api/usercards/queue/")
+        self.assertNotIn("Server-Timing", r)
+
+
+@override_settings(METRICS={"TOKEN": "scrape-me", "ALLOWED_IPS": []})
+class MetricsEndpointTest(TestCase):
+    def test_exposes_per_view_latency(self):
+        user = User.objects.create_user(username="metrics", password="pw123456")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        streamed_json(client.get("/api/usercards/queue/"))
+        r = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r["Content-Type"].startswith("text/plain"))
+        body = r.content.decode()
+        self.assertIn(
+            'flashcards_request_duration_seconds_count{handler="UserCardViewSet.queue",method="GET"}',
+            body,
+        )
+        self.assertIn(
+            'flashcards_db_queries_per_request_count{handler="UserCardViewSet.queue"}',
+            body,
+        )
+        self.assertIn("flashcards_reviews_total", body)
+
+    def test_reviews_are_labelled_with_known_ratings_only(self):
+        user = User.objects.create_user(username="rater", password="pw123456")
+        card_type = CardType.objects.create(owner=user, name="R", fields=["f"])
+        deck = Deck.objects.create(name="R", card_type=card_type, owner=user)
+        card = Card.objects.create(deck=deck, data={"f": "x"})
+        uc = UserCard.objects.create(user=user, card=card)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        url = f"/api/usercards/{uc.id}/"
+        r = client.patch(url, {"last_rating": "bogus-rating"}, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("last_rating", r.json())
+        r = client.patch(url, {"last_rating": "good"}, format="json")
+        self.assertEqual(r.status_code, 200)
+        r = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        body = r.content.decode()
+        self.assertIn('flashcards_reviews_total{rating="good"}', body)
+        self.assertNotIn("bogus-rating", body)
+
+    def test_requires_token_or_allowed_ip(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        r = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(r.status_code, 403)
+        with self.settings(METRICS={"ALLOWED_IPS": ["127.0.0.1"]}):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_handler_name(self):
+        from flashcards.metrics import handler_name
+        from flashcards.views import CardGenerationAPIView, UserCardViewSet
+
+        view = UserCardViewSet.as_view({"get": "queue"})
+        self.assertEqual(handler_name(view, "GET"), "UserCardViewSet.queue")
+        view = CardGenerationAPIView.as_view()
+        self.assertEqual(handler_name(view, "POST"), "CardGenerationAPIView.post")
+
+
+@override_settings(
+    PROFILING={"OUTPUT_DIR": tempfile.mkdtemp(), "SIGNAL_ENABLED": False}
+)
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="staff", password="pw123456", is_staff=True
+        )
+        self.user = User.objects.create_user(username="plain", password="pw123456")
+
+    def bearer(self, user):
+        return f"Bearer {RefreshToken.for_user(user).access_token}"
+
+    def test_sampler_collects_collapsed_stacks(self):
+        def spin(stop):
+            while not stop.is_set():
+                sum(range(1000))
+
+        stop = threading.Event()
+        worker = threading.Thread(target=spin, args=(stop,))
+        worker.start()
+        sampler = StackSampler(hz=500, thread_id=worker.ident).start()
+        time.sleep(0.1)
+        counts = sampler.stop()
+        stop.set()
+        worker.join()
+        self.assertGreater(sum(counts.values()), 0)
+        stack = next(iter(counts))
+        # the innermost frame may be Event.is_set rather than spin itself
+        self.assertIn("spin (tests.py:", stack)
+        line = render_collapsed(counts).splitlines()[0]
+        self.assertRegex(line, r"^.+ \d+$")
+
+    def test_per_request_profile_for_staff(self):
+        r = self.client.get(
+            "/api/usercards/queue/",
+            HTTP_AUTHORIZATION=self.bearer(self.staff),
+            HTTP_X_PROFILE="1",
+            HTTP_X_PROFILE_HZ="1000",
+        )
+        self.assertEqual(r.status_code, 200)
+        name = r["X-Profile-File"]
+        admin = APIClient()
+        admin.force_authenticate(user=self.staff)
+        saved = admin.get("/api/admin/profile/", {"file": name})
+        self.assertEqual(saved.status_code, 200)
+
+    def test_per_request_profile_ignored_for_non_staff(self):
+        r = self.client.get(
+            "/api/usercards/queue/",
+            HTTP_AUTHORIZATION=self.bearer(self.user),
+            HTTP_X_PROFILE="1",
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("X-Profile-File", r)
+
+    def test_admin_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get("/api/admin/profile/").status_code, 403)
+        client.force_authenticate(user=self.staff)
+        r = client.get("/api/admin/profile/", {"seconds": "0.05", "hz": "200"})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r["Content-Type"].startswith("text/plain"))
+        for seconds in ["-1", "0", "nan", "inf", "61", "x"]:
+            r = client.get("/api/admin/profile/", {"seconds": seconds})
+            self.assertEqual(r.status_code, 400, seconds)
+        r = client.get("/api/admin/profile/", {"seconds": "0.05", "hz": "-5"})
+        self.assertEqual(r.status_code, 400)
+
+
+class DeckStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="stats", password="pw123456")
+        self.card_type = CardType.objects.create(
+            owner=self.user, name="S", fields=["f"]
+        )
+        self.deck = Deck.objects.create(
+            name="Stats Deck", card_type=self.card_type, owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            r = self.client.post(
+                "/api/cards/",
+                {"deck_id": self.deck.id, "data": {"f": str(i)}},
+                format="json",
+            )
+            self.assertEqual(r.status_code, 201)
+        self.usercards = list(UserCard.objects.filter(user=self.user).order_by("id"))
+
+    def deck_stats(self):
+        return DeckStats.objects.get(user=self.user, deck=self.deck).as_dict()
+
+    def assert_matches_rebuild(self):
+        incremental = self.deck_stats()
+        stats.rebuild(user_ids=[self.user.id])
+        self.assertEqual(incremental, self.deck_stats())
+
+    def test_created_cards_are_new_and_due(self):
+        self.assertEqual(
+            self.deck_stats(),
+            {"total": 3, "due": 3, "new": 3, "review": 0, "known": 0},
+        )
+
+    def test_review_moves_card_out_of_due(self):
+        uc = self.usercards[0]
+        r = self.client.put(
+            f"/api/usercards/{uc.id}/", {"last_rating": "good"}, format="json"
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.deck_stats()["due"], 2)
+        self.assert_matches_rebuild()
+
+    def test_review_query_count(self):
+        url = f"/api/usercards/{self.usercards[0].id}/"
+        self.client.put(url, {"last_rating": "again"}, format="json")
+        # the UserCard joined to its card and deck, the conditional UPDATE,
+        # the stats row (SELECT and UPDATE in a savepoint), the activity
+        # upsert and the deck's card ids for the response
+        with self.assertNumQueries(8):
+            r = self.client.put(url, {"last_rating": "good"}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assert_matches_rebuild()
+
+    def test_set_status_and_reset(self):
+        uc = self.usercards[1]
+        self.client.patch(
+            f"/api/usercards/{uc.id}/set_status/", {"status": "known"}, format="json"
+        )
+        self.assertEqual(self.deck_stats()["known"], 1)
+        self.assertEqual(self.deck_stats()["new"], 2)
+        self.assert_matches_rebuild()
+        self.client.post(f"/api/usercards/reset/?deck={self.deck.id}")
+        self.assertEqual(self.deck_stats()["new"], 3)
+        self.assertEqual(self.deck_stats()["known"], 0)
+
+    def test_card_delete_updates_stats(self):
+        card_id = self.usercards[2].card_id
+        self.assertEqual(self.client.delete(f"/api/cards/{card_id}/").status_code, 204)
+        self.assertEqual(self.deck_stats()["total"], 2)
+
+    def test_due_count_uses_the_local_date(self):
+        row = DeckStats(due_by_day={"2026-01-02": 1})
+        # 20:00 UTC on Jan 1 is already Jan 2 in Auckland
+        now = datetime(2026, 1, 1, 20, tzinfo=dt_timezone.utc)
+        with self.settings(TIME_ZONE="Pacific/Auckland"), mock.patch.object(
+            timezone, "now", return_value=now
+        ):
+            self.assertEqual(row.due_count(), 1)
+
+    def test_usercard_delete_updates_stats(self):
+        uc = self.usercards[0]
+        self.assertEqual(
+            self.client.delete(f"/api/usercards/{uc.id}/").status_code, 204
+        )
+        self.assertEqual(
+            self.deck_stats(),
+            {"total": 2, "due": 2, "new": 2, "review": 0, "known": 0},
+        )
+        self.assert_matches_rebuild()
+
+    def test_deck_list_includes_stats(self):
+        r = self.client.get("/api/decks/")
+        decks = {d["id"]: d for d in r.json()["results"]}
+        self.assertEqual(decks[self.deck.id]["stats"]["due"], 3)
+        # the user's personal deck has no cards yet
+        others = [d for d in decks.values() if d["id"] != self.deck.id]
+        self.assertEqual(others[0]["stats"]["total"], 0)
+
+    def test_rebuild_command(self):
+        DeckStats.objects.all().delete()
+        call_command("rebuild_deck_stats", stdout=StringIO())
+        self.assertEqual(self.deck_stats()["total"], 3)
+
+
+class DailyActivityTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="active", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="A", fields=["f"])
+        deck = Deck.objects.create(name="A", card_type=card_type, owner=self.user)
+        self.usercards = [
+            UserCard.objects.create(
+                user=self.user, card=Card.objects.create(deck=deck, data={"f": str(i)})
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def review(self, uc, rating, **extra):
+        r = self.client.put(
+            f"/api/usercards/{uc.id}/", {"last_rating": rating, **extra}, format="json"
+        )
+        self.assertEqual(r.status_code, 200)
+
+    def test_reviews_are_rolled_up_per_day(self):
+        self.review(self.usercards[0], "good", time_spent_ms=1500)
+        self.review(self.usercards[1], "again")
+        self.review(self.usercards[0], "easy", time_spent_ms=500)
+        row = DailyUserActivity.objects.get(user=self.user)
+        self.assertEqual(row.reviews, 3)
+        self.assertEqual(row.good_count, 1)
+        self.assertEqual(row.again_count, 1)
+        self.assertEqual(row.easy_count, 1)
+        self.assertEqual(row.new_introduced, 2)
+        self.assertEqual(row.time_spent_ms, 2000)
+
+    def test_activity_endpoint_returns_range(self):
+        self.review(self.usercards[0], "hard")
+        today = timezone.localdate()
+        DailyUserActivity.objects.create(
+            user=self.user, date=today - timedelta(days=400), reviews=9
+        )
+        r = self.client.get("/api/activity/")
+        self.assertEqual(r.status_code, 200)
+        days = r.json()["days"]
+        self.assertEqual(len(days), 1)
+        self.assertEqual(days[0]["date"], today.isoformat())
+        self.assertEqual(days[0]["hard_count"], 1)
+        r = self.client.get("/api/activity/", {"start": "bad"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_backfill_from_scheduling_state(self):
+        self.review(self.usercards[0], "good")
+        self.review(self.usercards[1], "easy")
+        DailyUserActivity.objects.all().delete()
+        call_command("backfill_daily_activity", stdout=StringIO())
+        row = DailyUserActivity.objects.get(user=self.user)
+        self.assertEqual(row.reviews, 2)
+        self.assertEqual(row.new_introduced, 2)
+
+    def test_backfill_keeps_existing_rows_unless_forced(self):
+        self.review(self.usercards[0], "good", time_spent_ms=1500)
+        self.review(self.usercards[0], "easy")
+        call_command("backfill_daily_activity", stdout=StringIO())
+        row = DailyUserActivity.objects.get(user=self.user)
+        self.assertEqual((row.reviews, row.time_spent_ms), (2, 1500))
+        call_command("backfill_daily_activity", "--force", stdout=StringIO())
+        row = DailyUserActivity.objects.get(user=self.user)
+        self.assertEqual((row.reviews, row.time_spent_ms), (1, 0))
+
+
+class UserCardResetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="resetter", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="R", fields=["f"])
+        self.deck = Deck.objects.create(name="R", card_type=card_type, owner=self.user)
+        cards = [
+            Card.objects.create(deck=self.deck, data={"f": str(i)}) for i in range(5)
+        ]
+        # only some cards have a UserCard yet
+        for card in cards[:2]:
+            UserCard.objects.create(
+                user=self.user, card=card, status="known", repetitions=3, interval=9
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_reset_returns_counts(self):
+        r = self.client.post(f"/api/usercards/reset/?deck={self.deck.id}")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"deck": self.deck.id, "reset": 5, "created": 3})
+        qs = UserCard.objects.filter(user=self.user, card__deck=self.deck)
+        self.assertEqual(qs.count(), 5)
+        self.assertFalse(qs.exclude(status="new").exists())
+        self.assertFalse(qs.exclude(repetitions=0).exists())
+
+    def test_reset_query_count_does_not_grow_with_deck(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(f"/api/usercards/reset/?deck={self.deck.id}")
+        for i in range(50):
+            Card.objects.create(deck=self.deck, data={"f": f"more {i}"})
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(f"/api/usercards/reset/?deck={self.deck.id}")
+        self.assertLessEqual(len(large), len(small) + 1)
+
+    def test_reset_rows_opt_in(self):
+        r = self.client.post(f"/api/usercards/reset/?deck={self.deck.id}&rows=1")
+        body = r.json()
+        self.assertEqual(len(body["results"]), 5)
+        self.assertIsNone(body["next"])
+        r = self.client.post(
+            f"/api/usercards/reset/?deck={self.deck.id}&rows=1&page_size=2"
+        )
+        body = r.json()
+        self.assertEqual(len(body["results"]), 2)
+        self.assertIn("/api/usercards/?", body["next"])
+        page2 = self.client.get(body["next"]).json()
+        self.assertEqual(len(page2["results"]), 2)
+        # the rows are the list endpoint's, filters included
+        listed = self.client.get(
+            "/api/usercards/", {"deck": self.deck.id, "page_size": 2}
+        ).json()
+        self.assertEqual(body["results"], listed["results"])
+        r = self.client.post(
+            f"/api/usercards/reset/?deck={self.deck.id}&rows=1&status=known"
+        )
+        self.assertEqual(r.json()["results"], [])
+
+    def test_list_stays_unpaginated_by_default(self):
+        r = self.client.get(f"/api/usercards/?deck={self.deck.id}")
+        self.assertIsInstance(streamed_json(r), list)
+
+    def test_cannot_create_rows_for_other_users_decks(self):
+        other = User.objects.create_user(username="other", password="pw123456")
+        client = APIClient()
+        client.force_authenticate(user=other)
+        r = client.post(f"/api/usercards/reset/?deck={self.deck.id}")
+        self.assertEqual(r.json()["created"], 0)
+
+
+class BulkStatusTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="bulk", password="pw123456")
+        card_type = CardType.objects.create(
+            owner=self.user, name="B", fields=["f", "difficulty"]
+        )
+        self.deck = Deck.objects.create(name="B", card_type=card_type, owner=self.user)
+        self.usercards = []
+        for i, (tags, diff) in enumerate(
+            [("graph", "Easy"), ("graphql", "Hard"), ("dp", "easy"), ("", "Medium")]
+        ):
+            card = Card.objects.create(
+                deck=self.deck, data={"f": str(i), "difficulty": diff}, tags=tags
+            )
+            self.usercards.append(UserCard.objects.create(user=self.user, card=card))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def patch(self, body, client=None):
+        return (client or self.client).patch(
+            "/api/usercards/bulk_status/", body, format="json"
+        )
+
+    def test_by_ids(self):
+        ids = [uc.id for uc in self.usercards[:2]]
+        r = self.patch({"status": "known", "ids": ids})
+        self.assertEqual(r.json(), {"status": "known", "updated": 2})
+        self.assertEqual(UserCard.objects.filter(status="known").count(), 2)
+        deck_stats = DeckStats.objects.get(user=self.user, deck=self.deck)
+        self.assertEqual(deck_stats.known_count, 2)
+
+    def test_by_filter(self):
+        r = self.patch(
+            {
+                "status": "review",
+                "filter": {"deck": self.deck.id, "difficulties": "easy"},
+            }
+        )
+        self.assertEqual(r.json()["updated"], 2)
+        r = self.patch({"status": "known", "filter": {"tags": "dp"}})
+        self.assertEqual(r.json()["updated"], 1)
+
+    def test_scoped_to_requesting_user(self):
+        other = User.objects.create_user(username="bulk2", password="pw123456")
+        client = APIClient()
+        client.force_authenticate(user=other)
+        r = self.patch(
+            {"status": "known", "ids": [uc.id for uc in self.usercards]}, client
+        )
+        self.assertEqual(r.json()["updated"], 0)
+        self.assertFalse(UserCard.objects.filter(status="known").exists())
+
+    def test_validation(self):
+        self.assertEqual(self.patch({"status": "bogus", "ids": [1]}).status_code, 400)
+        self.assertEqual(self.patch({"status": "known"}).status_code, 400)
+        self.assertEqual(self.patch({"status": "known", "ids": "1,2"}).status_code, 400)
+        r = self.patch({"status": "known", "filter": {}})
+        self.assertEqual(r.status_code, 400)
+        r = self.patch({"status": "known", "filter": {"tags": ""}})
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(UserCard.objects.filter(status="known").exists())
+
+    def test_skips_soft_deleted_decks(self):
+        Deck.all_objects.filter(pk=self.deck.pk).update(deleted_at=timezone.now())
+        r = self.patch({"status": "known", "ids": [uc.id for uc in self.usercards]})
+        self.assertEqual(r.json()["updated"], 0)
+        r = self.patch({"status": "known", "filter": {"deck": self.deck.id}})
+        self.assertEqual(r.json()["updated"], 0)
+
+
+class ReviewConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rev", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="R", fields=["f"])
+        deck = Deck.objects.create(name="R", card_type=card_type, owner=self.user)
+        card = Card.objects.create(deck=deck, data={"f": "x"})
+        self.usercard = UserCard.objects.create(user=self.user, card=card)
+        stats.rebuild(user_ids=[self.user.id])
+
+    def test_schedule_is_pure(self):
+        state = scheduling.snapshot(self.usercard)
+        now = timezone.now()
+        after = scheduling.schedule(state, "good", now=now)
+        self.assertEqual(state, scheduling.snapshot(self.usercard))
+        self.assertEqual(after["interval"], 1)
+        self.assertEqual(after["repetitions"], 1)
+        self.assertEqual(after["due_date"], now + timedelta(days=1))
+
+    def test_stale_instance_does_not_lose_update(self):
+        first = UserCard.objects.get(pk=self.usercard.pk)
+        second = UserCard.objects.get(pk=self.usercard.pk)
+        scheduling.apply_review(first, "good")
+        before = scheduling.apply_review(second, "good")
+        self.assertEqual(before["repetitions"], 1)
+        self.usercard.refresh_from_db()
+        self.assertEqual(self.usercard.repetitions, 2)
+        self.assertEqual(self.usercard.interval, 2)
+
+    def test_review_is_one_usercard_write(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            r = client.put(
+                f"/api/usercards/{self.usercard.id}/",
+                {"last_rating": "easy"},
+                format="json",
+            )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["repetitions"], 1)
+        usercard_sql = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if '"flashcards_usercard"' in q["sql"]
+        ]
+        writes = [sql for sql in usercard_sql if sql.startswith("UPDATE")]
+        # get_object() and the conditional UPDATE, nothing else
+        self.assertEqual(len(usercard_sql), 2)
+        self.assertEqual(len(writes), 1)
+
+    def test_concurrent_reviews(self):
+        threads, reviews = 4, 5
+        start = threading.Barrier(threads)
+        errors = []
+
+        def worker():
+            try:
+                start.wait()
+                for _ in range(reviews):
+                    # every worker reviews from a possibly stale copy
+                    usercard = UserCard.objects.get(pk=self.usercard.pk)
+                    while True:
+                        try:
+                            scheduling.apply_review(usercard, "good")
+                            break
+                        except OperationalError:
+                            # the shared-cache test database reports a busy
+                            # table at once instead of waiting; a locked
+                            # statement wrote nothing, so just retry
+                            time.sleep(0.001)
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        self.assertEqual(errors, [])
+        self.usercard.refresh_from_db()
+        self.assertEqual(self.usercard.repetitions, threads * reviews)
+        self.assertEqual(self.usercard.interval, threads * reviews)
+
+
+class CramTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cram", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="C", fields=["f"])
+        self.deck = Deck.objects.create(name="C", card_type=card_type, owner=self.user)
+        cards = Card.objects.bulk_create(
+            Card(deck=self.deck, data={"f": str(i)}) for i in range(25)
+        )
+        UserCard.objects.bulk_create(UserCard(user=self.user, card=c) for c in cards)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def ids(self, body):
+        return [row["id"] for row in body["results"]]
+
+    def test_soft_deleted_decks_are_not_crammed(self):
+        Deck.all_objects.filter(pk=self.deck.pk).update(deleted_at=timezone.now())
+        r = self.client.get(f"/api/usercards/cram/?deck={self.deck.id}&n=10")
+        self.assertEqual(r.json()["results"], [])
+
+    def test_seed_is_reproducible(self):
+        url = f"/api/usercards/cram/?deck={self.deck.id}&n=10&seed=abc"
+        first, second = self.client.get(url).json(), self.client.get(url).json()
+        self.assertEqual(first["seed"], "abc")
+        self.assertEqual(self.ids(first), self.ids(second))
+        self.assertEqual(len(set(self.ids(first))), 10)
+
+    def test_session_serves_every_card_once(self):
+        url = f"/api/usercards/cram/?deck={self.deck.id}&n=10"
+        served = []
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                body = self.client.get(url).json()
+                served += self.ids(body)
+                url = body["next"]
+        self.assertEqual(len(served), 25)
+        self.assertEqual(
+            set(served), set(UserCard.objects.values_list("id", flat=True))
+        )
+        self.assertFalse(any("RANDOM()" in q["sql"] for q in ctx.captured_queries))
+
+    def test_validation(self):
+        self.assertEqual(self.client.get("/api/usercards/cram/").status_code, 400)
+        r = self.client.get(f"/api/usercards/cram/?deck={self.deck.id}&n=0")
+        self.assertEqual(r.status_code, 400)
+
+
+class LiveUpdatesTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="live", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="L", fields=["f"])
+        self.deck = Deck.objects.create(name="L", card_type=card_type, owner=self.user)
+        card = Card.objects.create(deck=self.deck, data={"f": "x"})
+        self.usercard = UserCard.objects.create(user=self.user, card=card)
+        stats.rebuild(user_ids=[self.user.id])
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def open_stream(self, query):
+        sent, disconnect = asyncio.Queue(), asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http",
+            "path": "/api/live/",
+            "query_string": query.encode(),
+            "headers": [],
+        }
+        task = asyncio.create_task(live.LiveUpdatesApp(None)(scope, receive, sent.put))
+        return task, sent, disconnect
+
+    async def next_event(self, sent):
+        while True:
+            message = await asyncio.wait_for(sent.get(), 5)
+            body = message.get("body", b"").decode()
+            if body.startswith("event: stats"):
+                return json.loads(body.split("data: ", 1)[1])["decks"]
+
+    def review(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        client.put(
+            f"/api/usercards/{self.usercard.id}/",
+            {"last_rating": "good"},
+            format="json",
+        )
+
+    async def test_pushes_counts_after_review(self):
+        task, sent, disconnect = await self.open_stream(f"token={self.token}")
+        self.assertEqual((await sent.get())["status"], 200)
+        decks = await self.next_event(sent)
+        self.assertEqual(decks[str(self.deck.id)]["due"], 1)
+
+        await sync_to_async(self.review)()
+        decks = await self.next_event(sent)
+        self.assertEqual(decks[str(self.deck.id)]["due"], 0)
+        self.assertEqual(decks[str(self.deck.id)]["new"], 1)
+
+        disconnect.set()
+        await task
+        self.assertEqual(live.hub.subscriber_count(), 0)
+
+    async def test_requires_token(self):
+        task, sent, disconnect = await self.open_stream("token=bogus")
+        await task
+        self.assertEqual((await sent.get())["status"], 401)
+
+    async def test_socket_broker_fans_out(self):
+        directory = tempfile.mkdtemp()
+        hub = live.Hub()
+        receiver = live.SocketBroker(directory, hub, name="receiver")
+        sender = live.SocketBroker(directory, live.Hub(), name="sender")
+        receiver.listen()
+        try:
+            queue = hub.subscribe(7)
+            sender.publish([7], [3])
+            self.assertEqual(await asyncio.wait_for(queue.get(), 5), [3])
+        finally:
+            receiver.close()
+            sender.close()
+
+    async def test_notify_accepts_any_iterable_of_ids(self):
+        directory = tempfile.mkdtemp()
+        hub = live.Hub()
+        receiver = live.SocketBroker(directory, hub, name="receiver")
+        receiver.listen()
+        try:
+            with self.settings(
+                LIVE_UPDATES={"BROKER_DIR": directory}
+            ), mock.patch.object(live, "_broker", None):
+                queue = hub.subscribe(7)
+                live.notify(user_ids={7}, deck_ids=(d for d in (3, 4)))
+                self.assertEqual(await asyncio.wait_for(queue.get(), 5), [3, 4])
+                live.broker().close()
+        finally:
+            receiver.close()
+
+    def test_socket_broker_does_not_block_on_a_full_receiver(self):
+        directory = tempfile.mkdtemp()
+        # bound but never read from
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        stalled.bind(os.path.join(directory, "stalled.sock"))
+        sender = live.SocketBroker(directory, live.Hub(), name="sender")
+        try:
+            publisher = threading.Thread(
+                target=lambda: [sender.publish([7], [3]) for _ in range(1000)],
+                daemon=True,
+            )
+            publisher.start()
+            publisher.join(5)
+            self.assertFalse(publisher.is_alive())
+        finally:
+            stalled.close()
+            sender.close()
+
+
+@override_settings(
+    STARTER_DECK={"VERSION_FILE": Path(tempfile.mkdtemp()) / "starter.version"}
+)
+class StarterDeckCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="starter", password="pw123456")
+        self.deck = Deck.objects.get(name="Starter Deck", owner=None)
+        self.cards = [
+            Card.objects.create(deck=self.deck, data={"problem": f"p{i}"})
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = f"/api/cards/?deck={self.deck.id}"
+
+    def test_steady_state_runs_no_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(len(first.json()["results"]), 3)
+        other = User.objects.create_user(username="starter2", password="pw123456")
+        client = APIClient()
+        client.force_authenticate(user=other)
+        with self.assertNumQueries(0):
+            second = client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+    def test_edit_bumps_version(self):
+        first = self.client.get(self.url)
+        card = self.cards[0]
+        card.data = {"problem": "changed"}
+        card.save()
+        second = self.client.get(self.url)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        problems = [c["data"]["problem"] for c in second.json()["results"]]
+        self.assertIn("changed", problems)
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(r.status_code, 200)
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="etag", password="pw123456")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_unchanged_reload_is_304_after_one_cache_lookup(self):
+        first = self.client.get("/api/decks/")
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            again = self.client.get("/api/decks/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        first = self.client.get("/api/cardtypes/")
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/cardtypes/")
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached.status_code, 200)
+
+    def test_writes_bump_the_version(self):
+        first = self.client.get("/api/decks/")
+        deck = Deck.objects.get(owner=self.user)
+        Card.objects.create(deck=deck, data={"problem": "p"})
+        second = self.client.get("/api/decks/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(len(second.json()["results"][0]["cards"]), 1)
+
+        etag = self.client.get("/api/cardtypes/")["ETag"]
+        CardType.objects.create(owner=self.user, name="New", fields=["f"])
+        r = self.client.get("/api/cardtypes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(r.json()), 2)
+
+    def test_versions_are_per_user(self):
+        etag = self.client.get("/api/decks/")["ETag"]
+        other = User.objects.create_user(username="etag2", password="pw123456")
+        Deck.objects.create(
+            name="Other", owner=other, card_type=CardType.objects.get(owner=other)
+        )
+        r = self.client.get("/api/decks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+
+class CardSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="search", password="pw123456")
+        card_type = CardType.objects.create(
+            owner=self.user, name="S", fields=["problem", "solution"]
+        )
+        self.deck = Deck.objects.create(name="S", card_type=card_type, owner=self.user)
+        self.card = Card.objects.create(
+            deck=self.deck,
+            data={"problem": "Merge intervals", "solution": "sort <b>then</b> sweep"},
+        )
+        Card.objects.bulk_create(
+            [
+                Card(
+                    deck=self.deck,
+                    data={"problem": "Meeting rooms", "solution": "heap"},
+                ),
+                Card(
+                    deck=self.deck,
+                    data={
+                        "problem": "Insert interval",
+                        "solution": "walk the list " * 20 + "then merge once",
+                    },
+                ),
+            ]
+        )
+        other = User.objects.create_user(username="search2", password="pw123456")
+        other_deck = Deck.objects.get(owner=other)
+        Card.objects.create(deck=other_deck, data={"problem": "Merge k sorted lists"})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, q):
+        return self.client.get("/api/cards/search/", {"q": q})
+
+    def test_ranked_and_scoped_to_visible_decks(self):
+        results = self.search("merge").json()["results"]
+        self.assertEqual(
+            [r["data"]["problem"] for r in results],
+            ["Merge intervals", "Insert interval"],
+        )
+        self.assertLessEqual(results[0]["rank"], results[1]["rank"])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        snippet = self.search("sweep").json()["results"][0]["snippet"]
+        self.assertIn("<mark>sweep</mark>", snippet)
+        self.assertIn("&lt;b&gt;then&lt;/b&gt;", snippet)
+
+    def test_index_follows_writes(self):
+        self.card.data = {"problem": "Two sum", "solution": "hash map"}
+        self.card.save()
+        self.assertEqual(len(self.search("sweep").json()["results"]), 0)
+        self.assertEqual(len(self.search("hash").json()["results"]), 1)
+        self.card.delete()
+        self.assertEqual(len(self.search("hash").json()["results"]), 0)
+
+    def test_prefix_and_query_syntax(self):
+        self.assertEqual(len(self.search("meet").json()["results"]), 1)
+        r = self.search('merge" OR NEAR(heap')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.search("").status_code, 400)
+
+
+class TagIndexTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="tags", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="T", fields=["f"])
+        self.deck = Deck.objects.create(
+            name="T", card_type=card_type, owner=self.user, tags="Graphs, Interview"
+        )
+        for i, tags in enumerate(["graph,dp", "graphql", "graph", "dp, Greedy"]):
+            Card.objects.create(deck=self.deck, data={"f": str(i)}, tags=tags)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def problems(self, params):
+        r = self.client.get("/api/cards/", {"deck": self.deck.id, **params})
+        return sorted(c["data"]["f"] for c in r.json()["results"])
+
+    def test_index_mirrors_tag_string(self):
+        card = Card.objects.get(data__f="0")
+        self.assertEqual(
+            set(card.tag_index.values_list("name", flat=True)), {"graph", "dp"}
+        )
+        card.tags = "trees"
+        card.save()
+        self.assertEqual(list(card.tag_index.values_list("name", flat=True)), ["trees"])
+
+    def test_exact_any_and_all(self):
+        self.assertEqual(self.problems({"tags": "graph"}), ["0", "2"])
+        self.assertEqual(self.problems({"tags": "graph,greedy"}), ["0", "2", "3"])
+        self.assertEqual(self.problems({"tags": "graph,dp", "tags_mode": "all"}), ["0"])
+        r = self.client.get("/api/cards/", {"tags": "dp", "tags_mode": "some"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_deck_filter_is_exact(self):
+        r = self.client.get("/api/decks/", {"tags": "graph"})
+        self.assertEqual(r.json()["results"], [])
+        r = self.client.get("/api/decks/", {"tags": "graphs"})
+        self.assertEqual([d["id"] for d in r.json()["results"]], [self.deck.id])
+
+    def test_tag_facets_in_one_query(self):
+        url = f"/api/cards/tag_facets/?deck={self.deck.id}"
+        self.client.get(url)  # warm the Starter Deck id cache
+        with self.assertNumQueries(1):
+            r = self.client.get(url)
+        self.assertEqual(
+            r.json()["results"],
+            [
+                {"tag": "dp", "count": 2},
+                {"tag": "graph", "count": 2},
+                {"tag": "graphql", "count": 1},
+                {"tag": "greedy", "count": 1},
+            ],
+        )
+
+
+class DataFieldIndexTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="fields", password="pw123456")
+        self.card_type = CardType.objects.create(
+            owner=self.user,
+            name="F",
+            fields=["front", "level", "difficulty"],
+            indexed_fields=["level"],
+        )
+        self.deck = Deck.objects.create(
+            name="F", card_type=self.card_type, owner=self.user
+        )
+        for i, level in enumerate(["Hard", "easy", "Medium", "hard"]):
+            Card.objects.create(deck=self.deck, data={"front": str(i), "level": level})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def fronts(self, params):
+        r = self.client.get("/api/cards/", {"deck": self.deck.id, **params})
+        self.assertEqual(r.status_code, 200, r.content)
+        return [c["data"]["front"] for c in r.json()["results"]]
+
+    def test_declared_fields_are_indexed(self):
+        # saving a card type does no index work
+        self.assertNotIn(datafields.index_name("level"), datafields.existing_indexes())
+        call_command("ensure_data_indexes", stdout=StringIO())
+        self.assertIn(datafields.index_name("level"), datafields.existing_indexes())
+        plan = Card.objects.filter(datafields.data_q("level", ["hard"])).explain()
+        self.assertIn(datafields.index_name("level"), plan)
+        self.card_type.indexed_fields = []
+        self.card_type.save()
+        call_command("ensure_data_indexes", stdout=StringIO())
+        self.assertNotIn(datafields.index_name("level"), datafields.existing_indexes())
+
+    def test_fields_are_ranked_by_owners(self):
+        for i in range(3):
+            CardType.objects.create(
+                owner=self.user, name=f"Z{i}", fields=["zz"], indexed_fields=["zz"]
+            )
+        other = User.objects.create_user(username="other", password="pw123456")
+        CardType.objects.filter(owner=other).update(indexed_fields=["level"])
+        with self.settings(DATA_FIELDS={"MAX_INDEXES": 1}):
+            self.assertEqual(datafields.declared_fields(), ["level"])
+
+    def test_indexed_fields_are_limited_per_owner(self):
+        def create(name, indexed):
+            return self.client.post(
+                "/api/cardtypes/",
+                {"name": name, "fields": ["a", "b", "c"], "indexed_fields": indexed},
+                format="json",
+            )
+
+        # the Default type declares difficulty and category, this one level
+        with self.settings(DATA_FIELDS={"MAX_PER_OWNER": 4}):
+            self.assertEqual(create("G", ["a"]).status_code, 201)
+            r = create("H", ["b", "c"])
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("indexed_fields", r.json())
+
+    def test_filter_and_sort_by_data_field(self):
+        self.assertEqual(sorted(self.fronts({"data.level": "HARD"})), ["0", "3"])
+        self.assertEqual(
+            sorted(self.fronts({"data.level": "hard,medium"})), ["0", "2", "3"]
+        )
+        self.assertEqual(self.fronts({"ordering": "data.level"}), ["1", "0", "3", "2"])
+        self.assertEqual(self.fronts({"ordering": "-data.level"}), ["2", "3", "0", "1"])
+        r = self.client.get("/api/cards/", {"data.le'vel": "x"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_difficulties_filter_reads_data(self):
+        Card.objects.create(
+            deck=self.deck, data={"front": "4", "difficulty": "Easy"}, difficulty=""
+        )
+        self.assertEqual(self.fronts({"difficulties": "easy"}), ["4"])
+
+    def test_indexed_fields_must_be_card_type_fields(self):
+        r = self.client.post(
+            "/api/cardtypes/",
+            {"name": "G", "fields": ["front"], "indexed_fields": ["level"]},
+            format="json",
+        )
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("indexed_fields", r.json())
+
+
+class FacetsTest(TestCase):
+    def setUp(self):
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="facets", password="pw123456")
+        card_type = CardType.objects.create(
+            owner=self.user, name="F", fields=["f", "difficulty", "category"]
+        )
+        self.decks = [
+            Deck.objects.create(name=f"F{i}", card_type=card_type, owner=self.user)
+            for i in range(2)
+        ]
+        for deck, diff, category, tags in [
+            (0, "Easy", "Graphs", "bfs,dp"),
+            (0, "hard", "Graphs", "dp"),
+            (1, "Easy", "Arrays", ""),
+        ]:
+            Card.objects.create(
+                deck=self.decks[deck],
+                data={"f": "x", "difficulty": diff, "category": category},
+                tags=tags,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def facets(self, params=None):
+        r = self.client.get("/api/cards/facets/", params or {})
+        self.assertEqual(r.status_code, 200, r.content)
+        return {k: {c["value"]: c["count"] for c in v} for k, v in r.json().items()}
+
+    def test_counts(self):
+        d0, d1 = (d.id for d in self.decks)
+        self.assertEqual(
+            self.facets(),
+            {
+                "deck": {d0: 2, d1: 1},
+                "tag": {"dp": 2, "bfs": 1},
+                "difficulty": {"easy": 2, "hard": 1},
+                "category": {"graphs": 2, "arrays": 1},
+            },
+        )
+        self.assertEqual(
+            self.facets({"difficulties": "easy"}),
+            {
+                "deck": {d0: 1, d1: 1},
+                "tag": {"dp": 1, "bfs": 1},
+                "difficulty": {"easy": 2},
+                "category": {"graphs": 1, "arrays": 1},
+            },
+        )
+        self.assertEqual(self.facets({"deck": d1})["deck"], {d1: 1})
+
+    def test_summaries_are_cached_until_cards_change(self):
+        self.facets()
+        with self.assertNumQueries(1):  # the user's deck ids
+            self.facets()
+        card = Card.objects.filter(deck=self.decks[1]).get()
+        card.deck = self.decks[0]
+        card.save()
+        self.assertEqual(self.facets()["deck"], {self.decks[0].id: 3})
+
+
+class ReshapeCardDataTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reshape", password="pw123456")
+        self.card_type = CardType.objects.create(
+            owner=self.user,
+            name="R",
+            fields=["front", "back", "level"],
+            indexed_fields=["level"],
+        )
+        deck = Deck.objects.create(name="R", card_type=self.card_type, owner=self.user)
+        self.cards = [
+            Card.objects.create(deck=deck, data=data)
+            for data in [
+                {"front": "Q", "back": {"code": [1, 2]}, "level": 3},
+                {"front": "Q2"},
+                {"front": "Q3", "back": "A3", "level": "hard"},
+            ]
+        ]
+
+    def data(self):
+        return [Card.objects.get(pk=c.pk).data for c in self.cards]
+
+    def test_command_renames_and_drops_fields_in_sql(self):
+        out = StringIO()
+        call_command(
+            "reshape_card_data",
+            str(self.card_type.id),
+            "--fields=front,back,level,notes",
+            "--rename=level=difficulty",
+            "--rename=back=answer",
+            "--chunk-size=2",
+            stdout=out,
+        )
+        self.assertIn("Reshaped 3 cards", out.getvalue())
+        self.assertIn("3/3 cards", out.getvalue())
+        self.card_type.refresh_from_db()
+        self.assertEqual(
+            self.card_type.fields, ["front", "answer", "difficulty", "notes"]
+        )
+        self.assertEqual(self.card_type.indexed_fields, ["difficulty"])
+        expected = [
+            {"front": "Q", "answer": {"code": [1, 2]}, "difficulty": 3, "notes": ""},
+            {"front": "Q2", "answer": "", "difficulty": "", "notes": ""},
+            {"front": "Q3", "answer": "A3", "difficulty": "hard", "notes": ""},
+        ]
+        self.assertEqual(self.data(), expected)
+        self.assertEqual([list(d) for d in self.data()], [list(e) for e in expected])
+
+    def test_only_cards_that_differ_are_updated(self):
+        self.assertEqual(card_data.reshape_cards(self.card_type), 1)
+        self.assertEqual(self.data()[1], {"front": "Q2", "back": "", "level": ""})
+        self.assertEqual(card_data.reshape_cards(self.card_type), 0)
+
+    def test_api_update_reshapes_cards(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        r = client.patch(
+            f"/api/cardtypes/{self.card_type.id}/",
+            {"description": "new"},
+            format="json",
+        )
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(self.data()[1], {"front": "Q2", "back": "", "level": ""})
+
+
+class DeletionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="deleter", password="pw123456")
+        self.card_type = CardType.objects.create(
+            owner=self.user, name="D", fields=["f"]
+        )
+        self.deck = Deck.objects.create(
+            name="D", card_type=self.card_type, owner=self.user, tags="big"
+        )
+        for i in range(30):
+            card = Card.objects.create(deck=self.deck, data={"f": str(i)}, tags="x")
+            UserCard.objects.create(user=self.user, card=card)
+        stats.rebuild(user_ids=[self.user.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertPurged(self):
+        self.assertFalse(Deck.all_objects.filter(pk=self.deck.pk).exists())
+        self.assertFalse(Card.objects.filter(deck_id=self.deck.pk).exists())
+        self.assertFalse(UserCard.objects.filter(user=self.user).exists())
+        self.assertFalse(DeckStats.objects.filter(deck_id=self.deck.pk).exists())
+        self.assertFalse(Card.tag_index.through.objects.exists())
+
+    def test_deck_delete_does_not_load_cards(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.delete(f"/api/decks/{self.deck.id}/")
+        self.assertEqual(r.status_code, 204)
+        self.assertPurged()
+        self.assertFalse(
+            [q for q in ctx.captured_queries if 'flashcards_card"."data' in q["sql"]]
+        )
+
+    def test_card_type_delete_removes_its_decks(self):
+        r = self.client.delete(f"/api/cardtypes/{self.card_type.id}/")
+        self.assertEqual(r.status_code, 204)
+        self.assertPurged()
+        self.assertFalse(CardType.all_objects.filter(pk=self.card_type.pk).exists())
+
+    @override_settings(DELETION={"SOFT_DELETE": True, "CHUNK_SIZE": 7})
+    def test_soft_delete_hides_then_purges(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            r = self.client.delete(f"/api/cardtypes/{self.card_type.id}/")
+        self.assertEqual(r.status_code, 204)
+        self.assertEqual(len(callbacks), 1)  # the background purge
+        names = [t["name"] for t in self.client.get("/api/cardtypes/").json()]
+        self.assertNotIn("D", names)
+        self.assertEqual(self.client.get("/api/cards/").json()["results"], [])
+        self.assertEqual(streamed_json(self.client.get("/api/usercards/")), [])
+        # the names are free again
+        r = self.client.post(
+            "/api/cardtypes/", {"name": "D", "fields": ["f"]}, format="json"
+        )
+        self.assertEqual(r.status_code, 201, r.content)
+
+        out = StringIO()
+        call_command("purge_deleted", stdout=out)
+        self.assertIn("Purged 1 decks and 1 card types", out.getvalue())
+        self.assertPurged()
+
+
+class CloneDeckTest(TestCase):
+    def setUp(self):
+        caches["responses"].clear()
+        self.author = User.objects.create_user(username="author", password="pw123456")
+        self.user = User.objects.create_user(username="cloner", password="pw123456")
+        self.card_type = CardType.objects.create(
+            owner=self.author, name="Algo", fields=["f", "difficulty"]
+        )
+        self.deck = Deck.objects.create(
+            name="Shared", card_type=self.card_type, owner=self.author, shared=True
+        )
+        self.cards = [
+            Card.objects.create(
+                deck=self.deck, data={"f": str(i), "difficulty": "Easy"}, tags="dp,x"
+            )
+            for i in range(5)
+        ]
+        learned = UserCard.objects.create(
+            user=self.user, card=self.cards[2], repetitions=3, status="known"
+        )
+        self.learned_due = learned.due_date
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def clone(self, body=None):
+        return self.client.post(
+            f"/api/decks/{self.deck.id}/clone/", body or {}, format="json"
+        )
+
+    def test_copies_cards_tags_and_card_type(self):
+        r = self.clone()
+        self.assertEqual(r.status_code, 201, r.content)
+        clone = Deck.objects.get(pk=r.json()["id"])
+        self.assertEqual(clone.owner, self.user)
+        self.assertEqual(clone.card_type.owner, self.user)
+        self.assertEqual(clone.card_type.fields, ["f", "difficulty"])
+        copies = list(clone.cards.order_by("id"))
+        self.assertEqual([c.data for c in copies], [c.data for c in self.cards])
+        self.assertEqual(
+            sorted(copies[0].tag_index.values_list("name", flat=True)), ["dp", "x"]
+        )
+        usercards = UserCard.objects.filter(user=self.user, card__deck=clone)
+        self.assertEqual(usercards.count(), 5)
+        self.assertFalse(usercards.exclude(status="new").exists())
+        self.assertEqual(r.json()["stats"]["new"], 5)
+        # a second copy gets a free name and reuses the copied card type
+        again = self.clone().json()
+        self.assertEqual(again["name"], "Shared (copy)")
+        self.assertEqual(again["card_type"]["id"], clone.card_type_id)
+
+    def test_copy_progress(self):
+        r = self.clone({"copy_progress": True})
+        copied = UserCard.objects.get(
+            user=self.user, card__deck_id=r.json()["id"], card__data__f="2"
+        )
+        self.assertEqual(
+            (copied.status, copied.repetitions, copied.due_date),
+            ("known", 3, self.learned_due),
+        )
+
+    def test_statement_count_does_not_grow_with_the_deck(self):
+        self.clone()  # copies the card type
+        with CaptureQueriesContext(connection) as small:
+            self.clone()
+        for i in range(40):
+            Card.objects.create(deck=self.deck, data={"f": f"more {i}"})
+        with CaptureQueriesContext(connection) as large:
+            self.clone()
+        self.assertEqual(len(large), len(small))
+
+    def test_card_types_of_others_are_always_copied(self):
+        r = self.clone({"copy_card_type": False})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(Deck.objects.filter(owner=self.user).count(), 1)
+        clone = cloning.clone_deck(self.deck, self.user, copy_card_type=False)
+        self.assertEqual(clone.card_type.owner, self.user)
+
+    def test_copy_card_type_of_an_own_deck(self):
+        own = Deck.objects.get(pk=self.clone().json()["id"])
+        r = self.client.post(
+            f"/api/decks/{own.id}/clone/", {"copy_card_type": True}, format="json"
+        )
+        self.assertEqual(r.status_code, 201, r.content)
+        copied = CardType.objects.get(pk=r.json()["card_type"]["id"])
+        self.assertNotEqual(copied.id, own.card_type_id)
+        self.assertEqual(copied.owner, self.user)
+        self.assertEqual(copied.name, "Algo (copy)")
+        self.assertEqual(copied.fields, own.card_type.fields)
+        # without it the clone shares the type
+        r = self.client.post(f"/api/decks/{own.id}/clone/", {}, format="json")
+        self.assertEqual(r.json()["card_type"]["id"], own.card_type_id)
+
+    def test_private_decks_of_others_are_not_found(self):
+        self.deck.shared = False
+        self.deck.save()
+        self.assertEqual(self.clone().status_code, 404)
+
+
+class BulkCardsTest(TestCase):
+    def setUp(self):
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="bulker", password="pw123456")
+        self.card_type = CardType.objects.create(
+            owner=self.user, name="T", fields=["f", "difficulty"]
+        )
+        self.deck = Deck.objects.create(
+            name="A", card_type=self.card_type, owner=self.user
+        )
+        self.other_deck = Deck.objects.create(
+            name="B", card_type=self.card_type, owner=self.user
+        )
+        self.cards = []
+        for i, tags in enumerate(["graph", "", "dp,graph", "dp"]):
+            card = Card.objects.create(
+                deck=self.deck, data={"f": str(i), "difficulty": "Easy"}, tags=tags
+            )
+            UserCard.objects.create(user=self.user, card=card)
+            self.cards.append(card)
+        stats.rebuild(user_ids=[self.user.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def post(self, body):
+        return self.client.post("/api/cards/bulk/", body, format="json")
+
+    def tags(self):
+        return [
+            (
+                Card.objects.get(pk=c.pk).tags,
+                sorted(c.tag_index.values_list("name", flat=True)),
+            )
+            for c in self.cards
+        ]
+
+    def test_move_by_ids(self):
+        stranger = User.objects.create_user(username="stranger", password="pw123456")
+        foreign = Deck.objects.filter(owner=stranger).first()
+        foreign_card = Card.objects.create(
+            deck=foreign, data={f: "" for f in foreign.card_type.fields}
+        )
+        ids = [self.cards[0].id, self.cards[1].id, foreign_card.id]
+        r = self.post({"op": "move", "deck": self.other_deck.id, "ids": ids})
+        self.assertEqual(r.json(), {"op": "move", "updated": 2})
+        self.assertEqual(self.other_deck.cards.count(), 2)
+        self.assertEqual(Card.objects.get(pk=foreign_card.pk).deck, foreign)
+        self.assertEqual(
+            DeckStats.objects.get(user=self.user, deck=self.other_deck).new_count, 2
+        )
+        self.assertEqual(
+            DeckStats.objects.get(user=self.user, deck=self.deck).new_count, 2
+        )
+
+    def test_move_checks_card_types(self):
+        other_type = CardType.objects.create(owner=self.user, name="U", fields=["g"])
+        target = Deck.objects.create(name="C", card_type=other_type, owner=self.user)
+        r = self.post(
+            {"op": "move", "deck": target.id, "filter": {"deck": self.deck.id}}
+        )
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("'U'", r.json()["error"])
+        # the same fields under another type fit
+        same = CardType.objects.create(
+            owner=self.user, name="V", fields=["difficulty", "f"]
+        )
+        target = Deck.objects.create(name="D", card_type=same, owner=self.user)
+        r = self.post({"op": "move", "deck": target.id, "filter": {"tags": "dp"}})
+        self.assertEqual(r.json()["updated"], 2)
+        stranger = User.objects.create_user(username="stranger", password="pw123456")
+        foreign = Deck.objects.filter(owner=stranger).first()
+        r = self.post({"op": "move", "deck": foreign.id, "filter": {"tags": "dp"}})
+        self.assertEqual(r.status_code, 400)
+
+    def test_add_and_remove_tags(self):
+        r = self.post(
+            {"op": "add_tags", "tags": "DP, new", "filter": {"deck": self.deck.id}}
+        )
+        self.assertEqual(r.json()["updated"], 4)
+        self.assertEqual(
+            self.tags(),
+            [
+                ("graph,dp,new", ["dp", "graph", "new"]),
+                ("dp,new", ["dp", "new"]),
+                ("dp,graph,new", ["dp", "graph", "new"]),
+                ("dp,new", ["dp", "new"]),
+            ],
+        )
+        r = self.post(
+            {"op": "remove_tags", "tags": ["graph", "dp"], "filter": {"tags": "graph"}}
+        )
+        self.assertEqual(r.json()["updated"], 2)
+        self.assertEqual(
+            [tags for tags, _ in self.tags()], ["new", "dp,new", "new", "dp,new"]
+        )
+        r = self.post({"op": "remove_tags", "tags": "new", "ids": [self.cards[0].id]})
+        self.assertEqual(self.tags()[0], ("", []))
+        # filters see the new tags
+        r = self.client.get("/api/cards/", {"tags": "new", "deck": self.deck.id})
+        self.assertEqual(len(r.json()["results"]), 3)
+
+    def test_delete_by_filter(self):
+        r = self.post({"op": "delete", "filter": {"deck": self.deck.id, "tags": "dp"}})
+        self.assertEqual(r.json(), {"op": "delete", "updated": 2})
+        self.assertEqual(self.deck.cards.count(), 2)
+        self.assertEqual(UserCard.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            DeckStats.objects.get(user=self.user, deck=self.deck).new_count, 2
+        )
+
+    def test_delete_publishes_to_the_live_broker(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            LIVE_UPDATES={"BROKER_DIR": directory}
+        ), mock.patch.object(live, "_broker", None):
+            with self.captureOnCommitCallbacks(execute=True):
+                r = self.post({"op": "delete", "ids": [c.id for c in self.cards]})
+            live.broker().close()
+        self.assertEqual(r.json(), {"op": "delete", "updated": 4})
+
+    def test_statement_count_does_not_grow_with_the_selection(self):
+        body = {"op": "add_tags", "tags": "x", "filter": {"deck": self.deck.id}}
+        with CaptureQueriesContext(connection) as small:
+            self.post(body)
+        for i in range(40):
+            Card.objects.create(deck=self.deck, data={"f": f"more {i}"})
+        body["tags"] = "y"
+        with CaptureQueriesContext(connection) as large:
+            self.post(body)
+        self.assertEqual(len(large), len(small))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post({"op": "rename", "filter": {}}).status_code, 400)
+        self.assertEqual(self.post({"op": "delete"}).status_code, 400)
+        self.assertEqual(
+            self.post(
+                {"op": "add_tags", "tags": "", "filter": {"tags": "dp"}}
+            ).status_code,
+            400,
+        )
+        # "dp,graph" plus both would pass Card.tags' 200 characters
+        body = {
+            "op": "add_tags",
+            "tags": ["t" * 96, "u" * 96],
+            "filter": {"tags": "dp"},
+        }
+        r = self.post(body)
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(Card.objects.filter(tags__contains="ttt").exists())
+        r = self.post({"op": "add_tags", "tags": "a" * 99, "filter": {"deck": 0}})
+        self.assertEqual(r.json()["updated"], 0)
+        # a filter must narrow the selection down, not match every card
+        for filters in ({}, {"tags": "", "tags_mode": "all"}, {"dekc": self.deck.id}):
+            r = self.post({"op": "delete", "filter": filters})
+            self.assertEqual(r.status_code, 400)
+        self.assertEqual(Card.objects.filter(deck__owner=self.user).count(), 4)
+
+
+class ProjectionContractTest(TestCase):
+    """The hand-built list responses match the serializers' JSON exactly."""
+
+    def setUp(self):
+        caches["responses"].clear()
+        self.user = User.objects.create_user(username="reader", password="pw123456")
+        self.deck = Deck.objects.get(owner=self.user)
+        self.starter = Deck.objects.get(name="Starter Deck", owner=None)
+        custom = CardType.objects.create(
+            owner=self.user, name="Custom", fields=["front", "difficulty"]
+        )
+        self.custom_deck = Deck.objects.create(
+            name="Custom", card_type=custom, owner=self.user, tags="a,b", shared=True
+        )
+        full = {f: f"{f} {i}" for i, f in enumerate(self.deck.card_type.fields)}
+        for deck, data, tags in [
+            (self.deck, full, "dp,graph"),
+            (self.deck, {"problem": "only a problem", "difficulty": None}, ""),
+            (self.custom_deck, {"front": "q", "difficulty": 3}, "x"),
+            (self.custom_deck, {}, ""),
+            (self.starter, dict(full, difficulty="Hard"), "starter"),
+        ]:
+            card = Card.objects.create(deck=deck, data=data, tags=tags)
+            UserCard.objects.create(user=self.user, card=card)
+        UserCard.objects.filter(card__deck=self.custom_deck).update(
+            last_rating="good", ease_factor=2.36, interval=3, repetitions=2
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def expected(self, serializer_class, instances):
+        data = serializer_class(instances, many=True).data
+        return json.loads(JSONRenderer().render(data))
+
+    def test_card_lists(self):
+        cards = Card.objects.order_by("id")
+        for params, expected in [
+            ({}, cards),
+            ({"deck": self.custom_deck.id}, cards.filter(deck=self.custom_deck)),
+            ({"deck": self.starter.id}, cards.filter(deck=self.starter)),
+            (
+                # "difficulty 1" before the card without one
+                {"ordering": "-data.difficulty", "deck": self.deck.id},
+                cards.filter(deck=self.deck),
+            ),
+        ]:
+            r = self.client.get("/api/cards/", {**params, "data": "full"})
+            self.assertEqual(
+                r.json()["results"], self.expected(CardSerializer, expected), params
+            )
+
+    def test_usercard_lists(self):
+        usercards = UserCard.objects.filter(user=self.user).order_by("id")
+        full = {"data": "full"}
+        r = self.client.get("/api/usercards/", full)
+        self.assertEqual(streamed_json(r), self.expected(UserCardSerializer, usercards))
+        r = self.client.get("/api/usercards/", {"page_size": 2, **full})
+        self.assertEqual(
+            r.json()["results"], self.expected(UserCardSerializer, usercards[:2])
+        )
+        r = self.client.get(
+            "/api/usercards/queue/", {"deck": self.custom_deck.id, **full}
+        )
+        queue = usercards.filter(card__deck=self.custom_deck).order_by("due_date")
+        self.assertEqual(
+            streamed_json(r)["results"], self.expected(UserCardSerializer, queue)
+        )
+
+
+class CardFrontTest(TestCase):
+    """Lists carry the front of each card; /back/ has the rest."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="flipper", password="pw123456")
+        self.deck = Deck.objects.get(owner=self.user)
+        self.data = {f: f"{f} text" for f in self.deck.card_type.fields}
+        self.card = Card.objects.create(deck=self.deck, data=self.data, tags="dp")
+        UserCard.objects.create(user=self.user, card=self.card)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_lists_show_the_front(self):
+        # the Default layout's front, without the hidden hint
+        front = {f: self.data[f] for f in ("problem", "difficulty", "category")}
+        r = self.client.get("/api/cards/", {"deck": self.deck.id})
+        (card,) = r.json()["results"]
+        self.assertEqual(card["data"], front)
+        self.assertEqual(card["problem"], "problem text")
+        self.assertNotIn("solution", card)
+        r = self.client.get("/api/usercards/queue/")
+        self.assertEqual(streamed_json(r)["results"][0]["card"]["data"], front)
+        r = self.client.get("/api/usercards/", {"page_size": 5})
+        self.assertEqual(r.json()["results"][0]["card"]["data"], front)
+        r = self.client.get("/api/usercards/", {"data": "full"})
+        self.assertEqual(streamed_json(r)[0]["card"]["data"], self.data)
+
+    def test_back(self):
+        r = self.client.get(f"/api/cards/{self.card.id}/back/")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            r.json(),
+            {
+                "id": self.card.id,
+                "data": {
+                    f: self.data[f]
+                    for f in ("hint", "pseudo", "solution", "complexity")
+                },
+            },
+        )
+        other = User.objects.create_user(username="peeker", password="pw123456")
+        self.client.force_authenticate(user=other)
+        r = self.client.get(f"/api/cards/{self.card.id}/back/")
+        self.assertEqual(r.status_code, 404)
+
+    def test_split_matches_the_database(self):
+        data = {"a": "1", "b": [1, {"c": None}], "c": {"d": 2}, "e": None}
+        for layout in [
+            {},
+            {"front": []},
+            {"front": "a"},
+            {"front": ["a", "b", "c", "missing"], "hidden": ["b", None]},
+            {"front": ["a", "e"], "back": ["b"], "hidden": "a"},
+        ]:
+            card_type = CardType.objects.create(
+                owner=self.user, name=str(layout), fields=list(data), layout=layout
+            )
+            deck = Deck.objects.create(
+                name=str(layout), card_type=card_type, owner=self.user
+            )
+            card = Card.objects.create(deck=deck, data=data)
+            r = self.client.get("/api/cards/", {"deck": deck.id})
+            front, back = projections.split_data(data, layout)
+            self.assertEqual(r.json()["results"][0]["data"], front, layout)
+            self.assertEqual({**front, **back}, data)
+            r = self.client.get(f"/api/cards/{card.id}/back/")
+            self.assertEqual(r.json()["data"], back, layout)
+
+
+class FastJSONTest(TestCase):
+    payload = {
+        "when": datetime(2024, 5, 1, 12, 30, 0, 123000, tzinfo=dt_timezone.utc),
+        "naive": datetime(2024, 5, 1, 12, 30),
+        "day": date(2024, 5, 1),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "price": Decimal("1.10"),
+        "lazy": gettext_lazy("Not found."),
+        "text": "na\u00efve \u2028 line \u2029 end",
+        "counts": {1: 2, "x": [1.5, None, True]},
+        "ids": (1, 2),
+    }
+
+    def test_renders_like_drf(self):
+        self.assertEqual(
+            fastjson.JSONRenderer().render(self.payload),
+            drf_renderers.JSONRenderer().render(self.payload),
+        )
+        huge = {"n": 2**70}
+        self.assertEqual(
+            fastjson.JSONRenderer().render(huge),
+            drf_renderers.JSONRenderer().render(huge),
+        )
+        with mock.patch.object(fastjson, "orjson", None):
+            self.assertEqual(
+                fastjson.JSONRenderer().render(self.payload),
+                drf_renderers.JSONRenderer().render(self.payload),
+            )
+        indented = {"renderer_context": {"indent": 4}}
+        self.assertEqual(
+            fastjson.JSONRenderer().render(self.payload, **indented),
+            drf_renderers.JSONRenderer().render(self.payload, **indented),
+        )
+
+    def test_parses_like_drf(self):
+        content = drf_renderers.JSONRenderer().render(self.payload)
+        self.assertEqual(
+            fastjson.JSONParser().parse(BytesIO(content)),
+            drf_parsers.JSONParser().parse(BytesIO(content)),
+        )
+        for bad in [b"{", b'{"x": NaN}']:
+            with self.assertRaises(ParseError):
+                fastjson.JSONParser().parse(BytesIO(bad))
+
+    def test_api_uses_it(self):
+        user = User.objects.create_user(username="json", password="pw123456")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        r = client.post(
+            "/api/cardtypes/",
+            json.dumps({"name": "Ünïcode", "fields": ["front"]}),
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertIn("Ünïcode".encode(), r.content)
+        self.assertIsInstance(r.accepted_renderer, fastjson.JSONRenderer)
+
+
+class StreamingListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="streamer", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="S", fields=["f"])
+        self.decks = [
+            Deck.objects.create(name=f"S{i}", card_type=card_type, owner=self.user)
+            for i in range(2)
+        ]
+        for i in range(5):
+            card = Card.objects.create(deck=self.decks[i % 2], data={"f": str(i)})
+            UserCard.objects.create(user=self.user, card=card)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.expected = json.loads(
+            JSONRenderer().render(
+                UserCardSerializer(
+                    UserCard.objects.filter(user=self.user).order_by("due_date"),
+                    many=True,
+                ).data
+            )
+        )
+
+    def test_queue_streams_in_chunks(self):
+        with mock.patch.multiple(streaming, CHUNK_SIZE=2, BUFFER_BYTES=1):
+            r = self.client.get("/api/usercards/queue/")
+            self.assertTrue(r.streaming)
+            parts = list(r.streaming_content)
+        self.assertGreater(len(parts), 3)
+        self.assertEqual(json.loads(b"".join(parts)), {"results": self.expected})
+
+    def test_ndjson(self):
+        r = self.client.get("/api/usercards/", HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(r["Content-Type"], "application/x-ndjson")
+        lines = b"".join(r.streaming_content).splitlines()
+        self.assertEqual(
+            sorted((json.loads(line) for line in lines), key=lambda u: u["id"]),
+            sorted(self.expected, key=lambda u: u["id"]),
+        )
+
+    def test_browsable_api_is_not_streamed(self):
+        r = self.client.get("/api/usercards/queue/", HTTP_ACCEPT="text/html")
+        self.assertFalse(r.streaming)
+        self.assertEqual(r.status_code, 200)
+
+
+class StreamingASGITest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="asgi", password="pw123456")
+        card_type = CardType.objects.create(owner=self.user, name="A", fields=["f"])
+        deck = Deck.objects.create(name="A", card_type=card_type, owner=self.user)
+        card = Card.objects.create(deck=deck, data={"f": "x"})
+        self.usercard = UserCard.objects.create(user=self.user, card=card)
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def test_streams_asynchronously(self):
+        # a synchronous iterator would be read to the end before sending
+        r = await AsyncClient().get(
+            "/api/usercards/queue/", headers={"Authorization": f"Bearer {self.token}"}
+        )
+        self.assertTrue(r.is_async)
+        body = b"".join([part async for part in r.streaming_content])
+        self.assertEqual(
+            [u["id"] for u in json.loads(body)["results"]], [self.usercard.id]
+        )
@@ -1,19 +1,29 @@
 import os
 import json
 import re
+from datetime import date, timedelta
+from time import perf_counter
+
 import openai
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from django.utils import timezone
 from rest_framework import viewsets, generics, permissions, status
+from rest_framework.generics import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
+from django.urls import reverse
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
-from flashcards.pagination import CardCursorPagination
-from .models import Deck, Card, UserCard, CardType
+from flashcards.pagination import CardCursorPagination, UserCardCursorPagination
+from .models import Deck, Card, UserCard, CardType, DeckStats, normalize_tags
 from .serializers import (
     DeckSerializer,
     CardSerializer,
@@ -22,6 +32,26 @@ from .serializers import (
     CardTypeSerializer,
 )
 from .permissions import IsOwnerOrReadOnly, IsDeckOwnerOrReadOnly
+from .filters import card_filter_q, split_param, tag_mode, tag_q
+from .response_cache import VersionedListMixin
+from . import (
+    activity,
+    bulk_cards,
+    card_data,
+    cloning,
+    cram,
+    deletion,
+    datafields,
+    facets,
+    metrics,
+    profiling,
+    projections,
+    scheduling,
+    search,
+    starter,
+    stats,
+    streaming,
+)
 
 client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -35,7 +65,7 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class DeckViewSet(viewsets.ModelViewSet):
+class DeckViewSet(VersionedListMixin, viewsets.ModelViewSet):
     queryset = Deck.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     serializer_class = DeckSerializer
@@ -59,21 +89,38 @@ class DeckViewSet(viewsets.ModelViewSet):
                 qs = qs | starter
         else:
             qs = Deck.objects.none()
-        # Tag filtering (comma-separated, match any)
-        tags_param = self.request.query_params.get("tags")
-        if tags_param:
-            tags = [t.strip().lower() for t in tags_param.split(",") if t.strip()]
-            if tags:
-                tag_q = Q()
-                for tag in tags:
-                    tag_q |= Q(tags__icontains=tag)
-                qs = qs.filter(tag_q)
+        # Tag filtering (comma-separated, exact names; ?tags_mode=all for all)
+        tags = split_param(self.request.query_params.get("tags"), lower=True)
+        if tags:
+            mode = tag_mode(self.request.query_params.get("tags_mode"))
+            qs = qs.filter(tag_q(Deck, tags, mode))
         # Search by name (case-insensitive substring)
         search_param = self.request.query_params.get("search")
         if search_param:
             qs = qs.filter(name__icontains=search_param)
+        if user.is_authenticated:
+            # one indexed lookup per page for the "due / new / known" badges
+            qs = qs.prefetch_related(
+                Prefetch(
+                    "stats",
+                    queryset=DeckStats.objects.filter(user=user),
+                    to_attr="user_stats",
+                )
+            )
         return qs.distinct()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_stats"] = True
+        return context
+
+    def cache_vary(self):
+        # due counts roll over at midnight; superusers also see the Starter Deck
+        vary = [timezone.localdate().isoformat()]
+        if self.request.user.is_superuser:
+            vary.append(starter.current_version())
+        return vary
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -86,6 +133,40 @@ class DeckViewSet(viewsets.ModelViewSet):
             serializer.data, status=status.HTTP_201_CREATED, headers=headers
         )
 
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def clone(self, request, pk=None):
+        """
+        POST /api/decks/<id>/clone/ {"name", "copy_card_type", "copy_progress"}
+        (all optional): copy one of the user's decks, a shared deck or the
+        Starter Deck, with all of its cards, into the user's collection.
+        The card type is copied unless it is already the user's (then only
+        with copy_card_type); copy_progress keeps the user's scheduling state of the cards.
+        """
+        visible = Deck.objects.filter(
+            Q(owner=request.user) | Q(shared=True) | Q(owner=None, name="Starter Deck")
+        )
+        deck = visible.filter(pk=pk).select_related("card_type").first()
+        if deck is None:
+            return Response({"detail": "Not found."}, status=404)
+        copy_card_type = bool(request.data.get("copy_card_type", False))
+        if (
+            "copy_card_type" in request.data
+            and not copy_card_type
+            and deck.card_type.owner_id != request.user.id
+        ):
+            return Response(
+                {"copy_card_type": "The card type isn't yours; it must be copied."},
+                status=400,
+            )
+        clone = cloning.clone_deck(
+            deck,
+            request.user,
+            name=str(request.data.get("name") or "").strip()[:100] or None,
+            copy_card_type=copy_card_type,
+            copy_progress=bool(request.data.get("copy_progress", False)),
+        )
+        return Response(self.get_serializer(clone).data, status=status.HTTP_201_CREATED)
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         # Allow any superuser to access the Starter Deck
@@ -105,7 +186,9 @@ class DeckViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         if instance.owner != request.user:
             return Response({"detail": "Not found."}, status=404)
-        return super().destroy(request, *args, **kwargs)
+        # chunked raw deletes instead of the collector's in-memory cascade
+        deletion.delete_decks([instance.id])
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class CardViewSet(viewsets.ModelViewSet):
@@ -118,36 +201,306 @@ class CardViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             # User's own cards
-            qs = Card.objects.filter(deck__owner=user)
+            qs = Card.objects.filter(deck__owner=user, deck__deleted_at=None)
             # Also include cards in the Starter Deck for any authenticated user
-            starter_deck = Deck.objects.filter(name="Starter Deck", owner=None).first()
-            if starter_deck:
-                qs = qs | Card.objects.filter(deck=starter_deck)
+            starter_deck_id = starter.starter_deck_id()
+            if starter_deck_id:
+                qs = qs | Card.objects.filter(deck_id=starter_deck_id)
             # If superuser, this is redundant but harmless
             deck_id = self.request.query_params.get("deck")
             if deck_id:
                 qs = qs.filter(deck_id=deck_id)
-            # --- Filtering by tags (comma-separated, match any) ---
-            tags_param = self.request.query_params.get("tags")
-            if tags_param:
-                tags = [t.strip().lower() for t in tags_param.split(",") if t.strip()]
-                if tags:
-                    tag_q = Q()
-                    for tag in tags:
-                        tag_q |= Q(tags__icontains=tag)
-                    qs = qs.filter(tag_q)
-            # --- Filtering by difficulties (comma-separated, match any) ---
-            diffs_param = self.request.query_params.get("difficulties")
-            if diffs_param:
-                diffs = [d.strip() for d in diffs_param.split(",") if d.strip()]
-                if diffs:
-                    diff_q = Q()
-                    for diff in diffs:
-                        diff_q |= Q(difficulty__iexact=diff)
-                    qs = qs.filter(diff_q)
+            # --- Filtering by tags and difficulties (comma-separated, match any) ---
+            qs = qs.filter(
+                card_filter_q(
+                    tags=self.request.query_params.get("tags"),
+                    difficulties=self.request.query_params.get("difficulties"),
+                    tag_mode=tag_mode(self.request.query_params.get("tags_mode")),
+                )
+            )
+            # ?data.<field>=a,b (any of, ignoring case) on indexed data fields
+            for field, values in datafields.filter_params(self.request.query_params):
+                qs = qs.filter(datafields.data_q(field, values))
+            sort = datafields.sort_param(self.request.query_params.get("ordering"))
+            if sort:
+                qs = qs.annotate(
+                    **{datafields.SORT_ALIAS: datafields.DataValue(sort[0])}
+                )
             return qs.distinct()
         return Card.objects.none()
 
+    def cursor_ordering(self):
+        """``?ordering=data.<field>`` / ``-data.<field>``, ties broken by id."""
+        sort = datafields.sort_param(self.request.query_params.get("ordering"))
+        if not sort:
+            return None
+        if sort[1]:
+            return (f"-{datafields.SORT_ALIAS}", "-id")
+        return (datafields.SORT_ALIAS, "id")
+
+    def list(self, request, *args, **kwargs):
+        deck_id = request.query_params.get("deck")
+        if (
+            request.user.is_authenticated
+            and deck_id
+            and deck_id == str(starter.starter_deck_id())
+        ):
+            return self.starter_list(request, *args, **kwargs)
+        return self.projected_list(request)
+
+    def projected_list(self, request):
+        # CardSerializer's output, built from .values() rows by flashcards.projections
+        extra = (datafields.SORT_ALIAS,) if self.cursor_ordering() else ()
+        queryset = projections.card_values(
+            self.filter_queryset(self.get_queryset()),
+            projections.front_only(request),
+            extra,
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(projections.cards(page))
+        return Response(projections.cards(queryset))
+
+    def starter_list(self, request, *args, **kwargs):
+        # Starter Deck pages are the same for every user: serve them from the
+        # per-version cache, with a strong ETag so unchanged pages are a 304
+        key = request.build_absolute_uri()
+        etag = starter.etag_for(starter.current_version(), key)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        data, etag = starter.cached_page(key, lambda: self.projected_list(request).data)
+        return Response(
+            data, headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+        )
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def tag_facets(self, request):
+        """
+        /api/cards/tag_facets/?deck=&tags=&difficulties=:
+        how many of the cards matching the current filters carry each tag,
+        most used first, from one grouped query over the tag index.
+        """
+        cards = self.filter_queryset(self.get_queryset())
+        counts = (
+            Card.tag_index.through.objects.filter(card_id__in=cards.values("pk"))
+            .values("tag__name")
+            .annotate(count=Count("card_id"))
+            .order_by("-count", "tag__name")
+        )
+        return Response(
+            {"results": [{"tag": c["tag__name"], "count": c["count"]} for c in counts]}
+        )
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def facets(self, request):
+        """
+        /api/cards/facets/?deck=&tags=&difficulties=&data.<field>=:
+        how many of the cards matching the current filters are in each deck,
+        carry each tag and have each difficulty and category. Without
+        narrowing filters the counts are summed from cached per-deck
+        summaries; otherwise they come from one grouped query.
+        """
+        params = request.query_params
+        deck_ids = set(
+            Deck.objects.filter(owner=request.user).values_list("id", flat=True)
+        )
+        if starter_deck_id := starter.starter_deck_id():
+            deck_ids.add(starter_deck_id)
+        if params.get("deck"):
+            try:
+                deck_ids &= {int(params["deck"])}
+            except ValueError:
+                return Response(
+                    {"detail": "deck must be an integer."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        # the same filters as get_queryset(), on explicit deck ids so that
+        # the data field indexes apply
+        q = card_filter_q(
+            tags=params.get("tags"),
+            difficulties=params.get("difficulties"),
+            tag_mode=tag_mode(params.get("tags_mode")),
+        )
+        for field, values in datafields.filter_params(params):
+            q &= datafields.data_q(field, values)
+        if q:
+            cards = Card.objects.filter(q, deck_id__in=deck_ids)
+            counts = facets.facet_counts(cards)
+        else:
+            counts = facets.merged(facets.deck_summaries(deck_ids).values())
+        return Response(facets.as_response(counts))
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def search(self, request):
+        """
+        /api/cards/search/?q=<text>&deck=<id>&limit=20:
+        full-text search over the cards the user can see (own decks plus the
+        Starter Deck), best match first, with a highlighted snippet.
+        """
+        q = request.query_params.get("q", "")
+        if not search.terms(q):
+            return Response({"error": "q is required."}, status=400)
+        try:
+            limit = int(request.query_params.get("limit", 20))
+            deck = request.query_params.get("deck")
+            deck = int(deck) if deck else None
+        except ValueError:
+            return Response({"error": "deck and limit must be integers."}, status=400)
+        limit = min(max(limit, 1), search.MAX_RESULTS)
+
+        deck_ids = set(
+            Deck.objects.filter(owner=request.user).values_list("id", flat=True)
+        )
+        starter_deck_id = starter.starter_deck_id()
+        if starter_deck_id:
+            deck_ids.add(starter_deck_id)
+        if deck is not None:
+            deck_ids &= {deck}
+
+        hits = search.search(q, deck_ids, limit)
+        cards = Card.objects.in_bulk([card_id for card_id, _, _ in hits])
+        results = [
+            {
+                "id": card_id,
+                "deck_id": cards[card_id].deck_id,
+                "data": cards[card_id].data,
+                "tags": cards[card_id].tags,
+                "rank": rank,
+                "snippet": snippet,
+            }
+            for card_id, rank, snippet in hits
+            if card_id in cards
+        ]
+        return Response({"results": results})
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def back(self, request, pk=None):
+        """
+        /api/cards/{id}/back/: the fields of the card's data that lists leave
+        out (its layout's back and hidden fields), for when it is flipped.
+        """
+        row = get_object_or_404(
+            self.get_queryset().values("id", "data", "deck__card_type__layout"),
+            pk=pk,
+        )
+        _, back = projections.split_data(row["data"], row["deck__card_type__layout"])
+        return Response({"id": row["id"], "data": back})
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        POST /api/cards/bulk/
+        { "op": "move", "deck": 7, "ids": [1, 2, 3] }
+        { "op": "add_tags", "tags": "dp,graph", "filter": {"deck": 4, "data.category": "trees"} }
+        { "op": "remove_tags" | "delete", "ids": [...] or "filter": {...} }
+        → a few set-based statements over the matching cards of the requesting
+        user's own decks; `filter` takes the card list filters.
+        """
+        op = request.data.get("op")
+        if op not in bulk_cards.OPS:
+            return Response(
+                {"error": f"op must be one of {', '.join(bulk_cards.OPS)}."},
+                status=400,
+            )
+        ids = request.data.get("ids")
+        filters = request.data.get("filter")
+        if (ids is None) == (filters is None):
+            return Response(
+                {"error": "Provide exactly one of 'ids' or 'filter'."}, status=400
+            )
+
+        # the cards a PUT or DELETE of each one would allow
+        cards = Card.objects.filter(deck__owner=request.user, deck__deleted_at=None)
+        try:
+            if ids is not None:
+                if not isinstance(ids, list):
+                    raise ValueError
+                cards = cards.filter(id__in=[int(i) for i in ids])
+            else:
+                if not isinstance(filters, dict):
+                    raise ValueError
+                unknown = sorted(
+                    key
+                    for key in filters
+                    if key not in bulk_cards.FILTER_KEYS
+                    and not key.startswith(datafields.PARAM_PREFIX)
+                )
+                if unknown:
+                    return Response(
+                        {"error": f"Unknown filter key(s): {', '.join(unknown)}."},
+                        status=400,
+                    )
+                if all(
+                    value in (None, "", [])
+                    for key, value in filters.items()
+                    if key != "tags_mode"
+                ):
+                    # an empty filter would match every card the user has
+                    return Response(
+                        {
+                            "error": "'filter' needs a deck, tags, difficulties "
+                            "or data.<field>."
+                        },
+                        status=400,
+                    )
+                if filters.get("deck") is not None:
+                    cards = cards.filter(deck_id=int(filters["deck"]))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "'ids' must be a list of ids and 'filter' an object."},
+                status=400,
+            )
+        if filters is not None:
+            cards = cards.filter(
+                card_filter_q(
+                    tags=filters.get("tags"),
+                    difficulties=filters.get("difficulties"),
+                    tag_mode=tag_mode(filters.get("tags_mode")),
+                )
+            )
+            for field, values in datafields.filter_params(filters):
+                cards = cards.filter(datafields.data_q(field, values))
+
+        if op == "move":
+            try:
+                target = Deck.objects.select_related("card_type").get(
+                    pk=int(request.data.get("deck")), owner=request.user
+                )
+            except (TypeError, ValueError, Deck.DoesNotExist):
+                return Response(
+                    {"error": "'deck' must be the id of one of your decks."},
+                    status=400,
+                )
+            # one check per card type involved, not per card
+            incompatible = bulk_cards.incompatible_types(cards, target)
+            if incompatible:
+                names = ", ".join(sorted(t.name for t in incompatible))
+                return Response(
+                    {
+                        "error": f"Cards of card type(s) {names} do not have the "
+                        f"fields of '{target.card_type.name}'."
+                    },
+                    status=400,
+                )
+            updated = bulk_cards.move_cards(cards, target)
+        elif op == "delete":
+            updated = deletion.purge_cards(cards)
+        else:
+            tags = request.data.get("tags")
+            if isinstance(tags, list):
+                tags = ",".join(str(t) for t in tags)
+            tags = normalize_tags(tags if isinstance(tags, str) else "")
+            if not tags or any(len(t) > 100 for t in tags):
+                return Response(
+                    {"error": "'tags' must name tags of up to 100 characters."},
+                    status=400,
+                )
+            if op == "add_tags":
+                updated = bulk_cards.add_tags(cards, tags)
+            else:
+                updated = bulk_cards.remove_tags(cards, tags)
+        return Response({"op": op, "updated": updated})
+
     def perform_create(self, serializer):
         deck = serializer.validated_data["deck"]
         # --- REMOVE RESTRICTION: allow any authenticated user to add cards to any deck ---
@@ -155,7 +508,25 @@ class CardViewSet(viewsets.ModelViewSet):
         #     raise PermissionDenied("You can only add cards to your own decks.")
         card = serializer.save()
         # create the initial UserCard for the creator
-        UserCard.objects.create(user=self.request.user, card=card)
+        usercard = UserCard.objects.create(user=self.request.user, card=card)
+        stats.record_transition(
+            usercard.user_id,
+            card.deck_id,
+            None,
+            stats.state_of(usercard.status, usercard.due_date),
+        )
+
+    def perform_update(self, serializer):
+        old_deck_id = serializer.instance.deck_id
+        card = serializer.save()
+        if card.deck_id != old_deck_id:
+            # the card's UserCards moved with it
+            stats.rebuild(deck_ids=[old_deck_id, card.deck_id])
+
+    def perform_destroy(self, instance):
+        deck_id = instance.deck_id
+        instance.delete()
+        stats.rebuild(deck_ids=[deck_id])
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -205,10 +576,41 @@ class CardViewSet(viewsets.ModelViewSet):
 class UserCardViewSet(viewsets.ModelViewSet):
     serializer_class = UserCardSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = None  # always return full list
+    # full list unless the client asks for ?page_size= or follows a ?cursor=
+    pagination_class = UserCardCursorPagination
+    # full lists stream as JSON or, for Accept: application/x-ndjson, NDJSON
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES,
+        streaming.NDJSONRenderer,
+    ]
+
+    def paginate_queryset(self, queryset):
+        # the queue is ordered by due date, not by id
+        if self.action == "queue":
+            return None
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        # UserCardSerializer's output, built from .values() rows
+        queryset = self.filter_queryset(self.get_queryset())
+        front_only = projections.front_only(request)
+        rows = projections.usercard_values(queryset, front_only)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projections.usercards(page))
+        if streaming.streams(request):
+            return streaming.usercards_response(
+                request, queryset, front_only=front_only
+            )
+        return Response(projections.usercards(rows))
 
     def get_queryset(self):
-        qs = UserCard.objects.filter(user=self.request.user)
+        # cards of soft-deleted decks are on their way out; the joins give a
+        # review the deck id and its response the nested card without more
+        # queries (the card list projects .values() and ignores them)
+        qs = UserCard.objects.filter(
+            user=self.request.user, card__deck__deleted_at=None
+        ).select_related("card__deck__card_type__owner")
         deck = self.request.query_params.get("deck", None)
         status = self.request.query_params.get("status", None)
         if deck is not None:
@@ -217,6 +619,16 @@ class UserCardViewSet(viewsets.ModelViewSet):
             qs = qs.filter(status=status)
         return qs
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            stats.record_transition(
+                instance.user_id,
+                instance.card.deck_id,
+                stats.state_of(instance.status, instance.due_date),
+                None,
+            )
+
     @action(detail=False, methods=["get"])
     def queue(self, request):
         """
@@ -224,11 +636,12 @@ class UserCardViewSet(viewsets.ModelViewSet):
         1) filter by current user and optional deck
         2) take all with due_date <= now, ordered by due_date
         3) if none are due, fall back to *all* sorted by due_date
-        4) paginate if needed, otherwise return as { "results": [...] }
+        4) stream them as { "results": [...] } (NDJSON: one per line), with
+           the front of each card only unless ?data=full
         """
         now = timezone.now()
         deck = request.query_params.get("deck", None)
-        qs = UserCard.objects.filter(user=request.user)
+        qs = UserCard.objects.filter(user=request.user, card__deck__deleted_at=None)
         if deck is not None:
             qs = qs.filter(card__deck_id=deck)
 
@@ -236,13 +649,52 @@ class UserCardViewSet(viewsets.ModelViewSet):
         if not due.exists():
             due = qs.order_by("due_date")
 
-        page = self.paginate_queryset(due)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        front_only = projections.front_only(request)
+        if streaming.streams(request):
+            return streaming.usercards_response(
+                request, due, key="results", front_only=front_only
+            )
+        rows = projections.usercard_values(due, front_only)
+        return Response({"results": projections.usercards(rows)})
+
+    @action(detail=False, methods=["get"])
+    def cram(self, request):
+        """
+        /api/usercards/cram/?deck=<id>&n=20&seed=<seed>:
+        a random sample of the deck's cards, ignoring due dates.
+        Follow `next` (same seed, `after` = last key served) for more cards
+        from the same session without repeats; `next` is null once the
+        whole deck has been served.
+        """
+        try:
+            deck_id = int(request.query_params["deck"])
+            n = int(request.query_params.get("n", 20))
+            after = request.query_params.get("after")
+            after = float(after) if after is not None else None
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"error": "deck and n must be integers and after a number."},
+                status=400,
+            )
+        if not 1 <= n <= cram.MAX_PAGE_SIZE or not (after is None or 0 <= after < 1):
+            return Response(
+                {"error": f"n must be 1-{cram.MAX_PAGE_SIZE} and after in [0, 1)."},
+                status=400,
+            )
+        seed = request.query_params.get("seed") or cram.new_seed()
 
-        serializer = self.get_serializer(due, many=True)
-        return Response({"results": serializer.data})
+        qs = UserCard.objects.filter(
+            user=request.user, card__deck_id=deck_id, card__deck__deleted_at=None
+        ).select_related("card")
+        rows = cram.sample(qs, seed, n, after)
+        next_url = None
+        if len(rows) == n:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "after", repr(rows[-1].card.random_key)
+            )
+            next_url = replace_query_param(next_url, "seed", seed)
+        serializer = self.get_serializer(rows, many=True)
+        return Response({"seed": seed, "next": next_url, "results": serializer.data})
 
     @action(detail=False, methods=["post"])
     def reset(self, request):
@@ -253,32 +705,131 @@ class UserCardViewSet(viewsets.ModelViewSet):
                 deck_id_int = int(deck_id)
             except (TypeError, ValueError):
                 return Response({"error": "Invalid deck id."}, status=400)
-        qs = self.get_queryset()
+        now = timezone.now()
+        qs = UserCard.objects.filter(user=request.user)
+        created = 0
         if deck_id_int is not None:
             qs = qs.filter(card__deck_id=deck_id_int)
-            # --- PATCH: ensure all UserCards exist for this user/deck ---
-            from .models import Card, UserCard
-            from django.utils import timezone
-
-            cards = Card.objects.filter(deck_id=deck_id_int)
-            now = timezone.now()
-            for card in cards:
-                UserCard.objects.get_or_create(
-                    user=request.user, card=card, defaults={"due_date": now}
+            # ensure all UserCards exist for this user/deck, in one INSERT per
+            # batch for only the cards that don't have one yet
+            missing = (
+                Card.objects.filter(deck_id=deck_id_int)
+                .filter(
+                    Q(deck__owner=request.user)
+                    | Q(deck__owner=None, deck__name="Starter Deck")
+                )
+                .exclude(
+                    Exists(
+                        UserCard.objects.filter(
+                            user=request.user, card_id=OuterRef("pk")
+                        )
+                    )
                 )
-            # refresh qs after possible creation
-            qs = self.get_queryset().filter(card__deck_id=deck_id_int)
+                .values_list("id", flat=True)
+            )
+            new_rows = [
+                UserCard(user=request.user, card_id=card_id, due_date=now)
+                for card_id in missing
+            ]
+            UserCard.objects.bulk_create(
+                new_rows, batch_size=1000, ignore_conflicts=True
+            )
+            created = len(new_rows)
         # reset scheduling + rating + status for this user's cards in this deck only
-        qs.update(
+        reset_count = qs.update(
             last_rating="",  # must be empty string, not None
             interval=0,
             ease_factor=2.5,
             repetitions=0,
-            due_date=timezone.now(),
+            due_date=now,
             status="new",  # ensure cards are learnable again
         )
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        stats.rebuild(
+            user_ids=[request.user.id],
+            deck_ids=[deck_id_int] if deck_id_int is not None else None,
+        )
+        result = {"deck": deck_id_int, "reset": reset_count, "created": created}
+        if request.query_params.get("rows") in ("1", "true"):
+            # opt-in: the first page of rows, with `next` pointing at the
+            # (GET) list endpoint so later pages don't reset again; the rows
+            # are the list's, ?status= and ?data= included
+            rows = projections.usercard_values(
+                self.get_queryset(), projections.front_only(request)
+            )
+            paginator = UserCardCursorPagination()
+            page = paginator.paginate_queryset(rows, request, view=self, force=True)
+            list_url = request.build_absolute_uri(reverse("usercard-list"))
+            paginator.base_url = replace_query_param(
+                list_url, "page_size", paginator.page_size
+            )
+            for name in ("deck", "status", "data"):
+                if request.query_params.get(name) is not None:
+                    paginator.base_url = replace_query_param(
+                        paginator.base_url, name, request.query_params[name]
+                    )
+            result["next"] = paginator.get_next_link()
+            result["results"] = projections.usercards(page)
+        return Response(result)
+
+    @action(detail=False, methods=["patch"])
+    def bulk_status(self, request):
+        """
+        PATCH /api/usercards/bulk_status/
+        { "status": "known", "ids": [1, 2, 3] }
+        or { "status": "known", "filter": {"deck": 4, "tags": "dp", "difficulties": "Easy"} }
+        → one UPDATE over the requesting user's matching UserCards.
+        """
+        status_val = request.data.get("status")
+        if status_val not in dict(UserCard.STATUS_CHOICES):
+            return Response({"error": "Invalid status"}, status=400)
+        ids = request.data.get("ids")
+        filters = request.data.get("filter")
+        if (ids is None) == (filters is None):
+            return Response(
+                {"error": "Provide exactly one of 'ids' or 'filter'."}, status=400
+            )
+
+        # cards of soft-deleted decks are on their way out
+        qs = UserCard.objects.filter(user=request.user, card__deck__deleted_at=None)
+        try:
+            if ids is not None:
+                if not isinstance(ids, list):
+                    raise ValueError
+                qs = qs.filter(id__in=[int(i) for i in ids])
+            else:
+                if not isinstance(filters, dict):
+                    raise ValueError
+                if not any(
+                    filters.get(key) not in (None, "")
+                    for key in ("deck", "tags", "difficulties", "difficulty")
+                ):
+                    # an empty filter would match every card the user has
+                    return Response(
+                        {"error": "'filter' needs a deck, tags or difficulties."},
+                        status=400,
+                    )
+                if filters.get("deck") is not None:
+                    qs = qs.filter(card__deck_id=int(filters["deck"]))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "'ids' must be a list of ids and 'filter' an object."},
+                status=400,
+            )
+        if filters is not None:
+            qs = qs.filter(
+                card_filter_q(
+                    tags=filters.get("tags"),
+                    difficulties=filters.get("difficulties", filters.get("difficulty")),
+                    prefix="card__",
+                    tag_mode=tag_mode(filters.get("tags_mode")),
+                )
+            )
+
+        deck_ids = list(qs.values_list("card__deck_id", flat=True).distinct())
+        updated = qs.exclude(status=status_val).update(status=status_val)
+        if updated:
+            stats.rebuild(user_ids=[request.user.id], deck_ids=deck_ids)
+        return Response({"status": status_val, "updated": updated})
 
     @action(detail=True, methods=["patch"])
     def set_status(self, request, pk=None):
@@ -286,8 +837,13 @@ class UserCardViewSet(viewsets.ModelViewSet):
         status_val = request.data.get("status")
         if status_val not in dict(UserCard.STATUS_CHOICES):
             return Response({"error": "Invalid status"}, status=400)
-        usercard.status = status_val
-        usercard.save()
+        before = scheduling.apply_review(usercard, status=status_val)
+        stats.record_transition(
+            usercard.user_id,
+            usercard.card.deck_id,
+            stats.state_of(before["status"], before["due_date"]),
+            stats.state_of(usercard.status, usercard.due_date),
+        )
         return Response({"status": usercard.status})
 
 
@@ -314,17 +870,27 @@ hould be a description of the solution and 'solution' should be the solution its
 Do **not** wrap it in markdown or include any commentary—just the raw JSON.
 """
         user_msg = f"Here is my input: '''{prompt_text}'''\n\nReturn the JSON."
+        model = "gpt-4.1-mini"
 
         try:
-            resp = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user_msg},
-                ],
-                temperature=0.2,
-                max_tokens=800,
-            )
+            started = perf_counter()
+            try:
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user_msg},
+                    ],
+                    temperature=0.2,
+                    max_tokens=800,
+                )
+            except Exception:
+                metrics.LLM_LATENCY.labels(model, "error").observe(
+                    perf_counter() - started
+                )
+                raise
+            metrics.LLM_LATENCY.labels(model, "ok").observe(perf_counter() - started)
+            metrics.record_llm_usage(model, getattr(resp, "usage", None))
             text = resp.choices[0].message.content
             # DEBUG:
             print("[DEBUG] LLM returned:", repr(text))
@@ -380,6 +946,83 @@ Do **not** wrap it in markdown or include any commentary—just the raw JSON.
         return Response(data, status=status.HTTP_200_OK)
 
 
+def metrics_view(request):
+    """Prometheus text exposition of the backend metrics, for scrapers only."""
+    if not metrics.scrape_allowed(request):
+        return HttpResponse("Forbidden.", status=403, content_type="text/plain")
+    body, content_type = metrics.render_latest()
+    return HttpResponse(body, content_type=content_type)
+
+
+class ProfileView(APIView):
+    """
+    GET /api/admin/profile/?seconds=10&hz=100 → sample this worker's stacks
+    and return them in collapsed format for flamegraph tools.
+    GET /api/admin/profile/?file=<name> → a profile saved by X-Profile.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        name = request.query_params.get("file")
+        if name:
+            body = profiling.read_profile(name)
+            if body is None:
+                return Response({"detail": "Not found."}, status=404)
+            return HttpResponse(body, content_type="text/plain; charset=utf-8")
+        max_seconds = profiling.profiling_setting("MAX_SECONDS")
+        try:
+            seconds = float(request.query_params.get("seconds", 10))
+            hz = int(request.query_params.get("hz", 0)) or None
+        except ValueError:
+            return Response({"error": "Invalid seconds or hz."}, status=400)
+        # NaN fails the comparison too
+        if not 0 < seconds <= max_seconds or (hz is not None and hz < 0):
+            return Response(
+                {"error": f"seconds must be in (0, {max_seconds}] and hz positive."},
+                status=400,
+            )
+        counts = profiling.sample_process(seconds, hz=hz)
+        return HttpResponse(
+            profiling.render_collapsed(counts),
+            content_type="text/plain; charset=utf-8",
+        )
+
+
+class DailyActivityView(APIView):
+    """
+    GET /api/activity/?start=YYYY-MM-DD&end=YYYY-MM-DD → the user's daily
+    review rollups, defaulting to the last 365 days. Days without reviews
+    are omitted.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        today = timezone.localdate()
+        try:
+            end = date.fromisoformat(request.query_params.get("end", today.isoformat()))
+            start = request.query_params.get("start")
+            start = date.fromisoformat(start) if start else end - timedelta(days=364)
+        except ValueError:
+            return Response({"error": "Dates must be YYYY-MM-DD."}, status=400)
+        if start > end or (end - start).days > 366 * 5:
+            return Response({"error": "Invalid date range."}, status=400)
+        days = activity.activity_range(request.user, start, end).values(
+            "date",
+            "reviews",
+            "again_count",
+            "hard_count",
+            "good_count",
+            "easy_count",
+            "new_introduced",
+            "time_spent_ms",
+        )
+        return Response(
+            {"start": start, "end": end, "days": list(days)},
+        )
+
+
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -393,7 +1036,7 @@ class MeView(APIView):
         )
 
 
-class CardTypeViewSet(viewsets.ModelViewSet):
+class CardTypeViewSet(VersionedListMixin, viewsets.ModelViewSet):
     serializer_class = CardTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = None
@@ -423,19 +1066,11 @@ class CardTypeViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         if instance.owner != request.user:
             return Response({"detail": "Not found."}, status=404)
-        response = super().update(request, *args, **kwargs)
-        # --- MIGRATION: update all cards of this type to match new fields ---
-        updated_instance = self.get_object()  # get updated CardType
-        new_fields = list(updated_instance.fields)
-        # For all decks using this CardType
-        for deck in updated_instance.decks.all():
-            for card in deck.cards.all():
-                data = card.data or {}
-                # Only keep fields in new_fields, add missing as empty, preserve order
-                new_data = {f: data.get(f, "") for f in new_fields}
-                if data != new_data:
-                    card.data = new_data
-                    card.save(update_fields=["data"])
+        with transaction.atomic():
+            response = super().update(request, *args, **kwargs)
+            # --- MIGRATION: update all cards of this type to match new fields ---
+            # Only keep fields in new fields, add missing as empty, preserve order
+            card_data.reshape_cards(self.get_object())
         return response
 
     def destroy(self, request, *args, **kwargs):
@@ -443,7 +1078,5 @@ class CardTypeViewSet(viewsets.ModelViewSet):
         if instance.owner != request.user:
             return Response({"detail": "Not found."}, status=404)
         # Custom: delete all decks using this card type (cascade to cards)
-        decks = instance.decks.all()
-        for deck in decks:
-            deck.delete()
-        return super().destroy(request, *args, **kwargs)
+        deletion.delete_card_types([instance.id])
+        return Response(status=status.HTTP_204_NO_CONTENT)
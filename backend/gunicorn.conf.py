@@ -0,0 +1,46 @@
+"""
+Gunicorn settings picked up automatically when gunicorn runs from backend/.
+
+Each worker writes its Prometheus samples to PROMETHEUS_MULTIPROC_DIR so
+/metrics can aggregate across workers (see flashcards/metrics.py), and
+relays deck count changes to the others' /api/live/ streams through
+LIVE_BROKER_DIR (see flashcards/live.py; ASGI workers only). The response
+cache is file-based so every worker sees the same collection versions.
+Deleted decks and card types are purged in the background (see
+flashcards/deletion.py).
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    str(Path(__file__).resolve().parent / "data" / "prometheus"),
+)
+# the response cache must be shared by all workers (see core/settings.py)
+os.environ.setdefault(
+    "RESPONSE_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+)
+os.environ.setdefault(
+    "RESPONSE_CACHE_LOCATION",
+    str(Path(__file__).resolve().parent / "data" / "cache" / "responses"),
+)
+os.environ.setdefault(
+    "LIVE_BROKER_DIR",
+    str(Path(__file__).resolve().parent / "data" / "live"),
+)
+os.environ.setdefault("DELETION_SOFT_DELETE", "True")
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be summed into this one.
+    path = Path(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -7,7 +7,7 @@ import {
   Link,
   useNavigate,
 } from 'react-router-dom';
-import fetchWithAuth from './api';
+import fetchWithAuth, { subscribeDeckStats } from './api';
 import { HiOutlineTrash, HiOutlinePencil, HiPlus } from 'react-icons/hi';
 
 import NavBar        from './NavBar';
@@ -114,6 +114,14 @@ function AppRoutes({ token, setToken, decks, setDecks, busyId, setBusyId, select
       .finally(() => setDeckLoading(false));
   }, [deckCursor, selectedDeckTags, deckSearch, reloadDecks, reloadTrigger, token]);
 
+  // Keep the grid's due/new counts current while reviews happen elsewhere
+  useEffect(() => {
+    if (!token || typeof token !== 'string' || token.length < 10) return;
+    return subscribeDeckStats(changed => {
+      setPagedDecks(prev => prev.map(d => (d.id in changed ? { ...d, stats: changed[d.id] } : d)));
+    });
+  }, [token]);
+
   // Reset pagination when filters/search change
   useEffect(() => {
     setDeckCursor(null);
@@ -265,6 +273,9 @@ function AppRoutes({ token, setToken, decks, setDecks, busyId, setBusyId, select
                                     <Link key={d.id} to={`/decks/${kebab}`} state={{ id: d.id }} className="group relative rounded-2xl border border-gray-200 bg-white p-6 shadow-card transition hover:shadow-card-hover block animate-card-pop">
                                       <h3 className="mb-1 truncate text-xl font-bold text-midnight">{d.name}</h3>
                                       <p className="mb-4 line-clamp-3 text-base text-gray-600">{d.description || 'No description'}</p>
+                                      {d.stats && (
+                                        <p className="mb-2 text-sm text-gray-500">{d.stats.due} due · {d.stats.new} new</p>
+                                      )}
                                       <div className="mb-2 flex flex-wrap gap-2">
                                         {(d.tags || '').split(',').filter(Boolean).map(tag => (
                                           <span key={tag} className="inline-block bg-sky/10 text-sky px-3 py-1 rounded-pill text-xs font-medium">{tag}</span>
@@ -21,6 +21,8 @@ export default function Learn() {
   })
 //   console.log("distribution is: ", distribution)
   const [isFlipped, setIsFlipped] = useState(false)
+  // queue cards carry their front only; backs are fetched on flip, by card id
+  const [backs, setBacks] = useState({})
   const [showConfirm, setShowConfirm] = useState(false)   // <-- new
   const navigate                = useNavigate()
   const API                     = import.meta.env.VITE_API_BASE_URL
@@ -130,6 +132,7 @@ export default function Learn() {
   // Helper to reset all state to initial values
   const resetLearnState = useCallback(() => {
     setQueue([]);
+    setBacks({});
     setDistribution({ none: 0, again: 0, hard: 0, good: 0, easy: 0 });
     setIsFlipped(false);
     setShowConfirm(false);
@@ -188,7 +191,11 @@ export default function Learn() {
   const safeIdx = Math.max(0, Math.min(currentIdx, queue.length - 1));
   const card = queue[safeIdx] || queue[0];
   const cardType = card?.deck?.card_type || card?.card_type || {};
-  const { front: frontFields, back: backFields } = getCardLayout(cardType, card?.data);
+  const layout = getCardLayout(cardType, card?.data);
+  // hidden fields aren't in the queue; they come with the back
+  const frontFields = layout.front.filter(f => !layout.hidden.includes(f));
+  const backFields = [...layout.back, ...layout.hidden.filter(f => !layout.back.includes(f))];
+  const backData = { ...card?.data, ...backs[card?.id] };
 
   // handle rating
   function handleRating(rating) {
@@ -220,6 +227,12 @@ export default function Learn() {
   }
 
   const handleFlip = () => {
+    if (!isFlipped && card && !backs[card.id]) {
+      fetchWithAuth(`${API}/cards/${card.id}/back/`)
+        .then(r => r.json())
+        .then(back => setBacks(b => ({ ...b, [card.id]: back.data || {} })))
+        .catch(() => {});
+    }
     setIsFlipped(f => !f);
   }
 
@@ -365,18 +378,18 @@ export default function Learn() {
                       <Editor
                         height="200px"
                         defaultLanguage="python"
-                        value={card.data?.[field] || ''}
+                        value={backData[field] || ''}
                         options={{ readOnly: true, minimap: { enabled: false }, wordWrap: 'on' }}
                       />
                     ) : field === 'pseudo' ? (
                       <Editor
                         height="200px"
                         defaultLanguage="python"
-                        value={card.data?.[field] || ''}
+                        value={backData[field] || ''}
                         options={{ readOnly: true, minimap: { enabled: false }, wordWrap: 'on' }}
                       />
                     ) : (
-                      <span>{card.data?.[field]}</span>
+                      <span>{backData[field]}</span>
                     )}
                   </div>
                 )) : <div className="text-gray-400 italic">No back fields defined.</div>}
@@ -73,3 +73,36 @@ export function generateCard(inputText) {
     body: JSON.stringify({ input: inputText }),
   });
 }
+
+// Live deck counts from the backend's /api/live/ event stream. Calls
+// onStats({ [deckId]: stats | null }) with the decks whose counts changed (all
+// of them on connect) and returns a function that closes the stream.
+// EventSource cannot set headers, so the access token goes in the query string.
+export function subscribeDeckStats(onStats) {
+  if (typeof EventSource === 'undefined') return () => {};
+  let source = null;
+  let retry = null;
+  let closed = false;
+
+  const connect = () => {
+    const access = localStorage.getItem('accessToken');
+    if (closed || !access) return;
+    source = new EventSource(`${API}/live/?token=${encodeURIComponent(access)}`);
+    source.addEventListener('stats', e => onStats(JSON.parse(e.data).decks));
+    source.onerror = () => {
+      // the browser retries dropped connections itself; a refused one (an
+      // expired token, or a server without the stream) is retried here with
+      // whatever token fetchWithAuth has refreshed to since
+      if (source.readyState === EventSource.CLOSED) {
+        retry = setTimeout(connect, 30000);
+      }
+    };
+  };
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+}
@@ -8,5 +8,7 @@ export function getPreviewFields(cardType, cardData) {
   if (fields.includes('problem') && fields.includes('difficulty')) {
     return ['problem', 'difficulty'];
   }
-  return fields.slice(0, 2); // fallback: first two fields
+  // list cards carry their front fields only, so prefer the ones present
+  const present = fields.filter(f => cardData && f in cardData);
+  return (present.length > 0 ? present : fields).slice(0, 2); // fallback: first two fields
 }